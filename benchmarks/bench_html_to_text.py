@@ -0,0 +1,111 @@
+"""
+Compare the streaming lxml text extractor against the BeautifulSoup path.
+
+    python benchmarks/bench_html_to_text.py [FILINGS_DIR] [--synthetic N]
+
+Without a directory, N synthetic 10-K filings with inline XBRL are generated
+in a temporary directory. For every filing the script reports parse time for
+both paths and whether extract_mda_section finds the same MD&A text.
+"""
+
+import argparse
+import random
+import re
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from llm_pipeline.edgar.extract import (
+    extract_mda_section,
+    fast_html_to_text,
+    soup_html_to_text,
+)
+
+WORDS = (
+    "revenue margin liquidity capital segment operating expenses increased "
+    "decreased compared prior year fiscal quarter customers demand pricing"
+).split()
+
+
+def _paragraph(rng: random.Random, n_words: int = 80) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def synthetic_filing(rng: random.Random, paragraphs: int = 400) -> str:
+    """A 10-K shaped HTML document with hidden XBRL facts and scripts."""
+    facts = "".join(
+        f'<ix:nonNumeric name="dei:Fact{i}" contextRef="c{i}">{rng.random()}'
+        "</ix:nonNumeric>"
+        for i in range(paragraphs * 5)
+    )
+
+    def section(heading: str, n: int) -> str:
+        body = "".join(f"<p>{_paragraph(rng)}</p>" for _ in range(n))
+        return f"<p><b>{heading}</b></p>{body}"
+
+    return (
+        "<html><head><style>p { margin: 0 }</style>"
+        "<script>var tracking = 1;</script></head><body>"
+        f'<div style="display:none"><ix:header><ix:hidden>{facts}</ix:hidden>'
+        "</ix:header></div>"
+        "<table><tr><td>ITEM 7.</td><td>Management&#8217;s Discussion</td>"
+        "<td>45</td></tr></table>"
+        + section("ITEM 1. BUSINESS", paragraphs // 4)
+        + section("ITEM 7. MANAGEMENT&#8217;S DISCUSSION AND ANALYSIS", paragraphs // 2)
+        + section("ITEM 7A. QUANTITATIVE AND QUALITATIVE DISCLOSURES", 5)
+        + section("ITEM 8. FINANCIAL STATEMENTS", paragraphs // 4)
+        + "</body></html>"
+    )
+
+
+def write_synthetic(directory: Path, count: int, seed: int = 0) -> list[Path]:
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        path = directory / f"synthetic_{i:04d}.txt"
+        path.write_text(synthetic_filing(rng), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def _normalize(text: str | None) -> str | None:
+    return re.sub(r"\s+", " ", text).strip() if text else text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("filings", nargs="?", type=Path)
+    parser.add_argument("--synthetic", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.filings:
+            files = sorted(args.filings.glob("*.txt*"))
+        else:
+            files = write_synthetic(Path(tmp), args.synthetic)
+
+        totals = {"soup": 0.0, "fast": 0.0}
+        mismatches = []
+
+        for path in files:
+            start = perf_counter()
+            soup_mda = extract_mda_section(soup_html_to_text(path))
+            totals["soup"] += perf_counter() - start
+
+            start = perf_counter()
+            fast_mda = extract_mda_section(fast_html_to_text(path))
+            totals["fast"] += perf_counter() - start
+
+            if _normalize(soup_mda) != _normalize(fast_mda):
+                mismatches.append(path.name)
+
+        size_mb = sum(p.stat().st_size for p in files) / 1_000_000
+        print(f"{len(files)} filing(s), {size_mb:.1f} MB")
+        for name, seconds in totals.items():
+            print(f"  {name:5s} {seconds:8.2f} s  {size_mb / seconds:8.1f} MB/s")
+        print(f"  speedup {totals['soup'] / totals['fast']:.1f}x")
+        print(f"  MD&A mismatches: {len(mismatches)} {mismatches[:10]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""
+End-to-end benchmarks of the pipeline's own overhead, against a fake Ollama.
+
+    python benchmarks/bench_pipeline.py [--only concurrency,edgar] [--quick]
+
+Scenarios:
+
+- concurrency: prompts/s through run_model_prompts (threads) and
+  arun_model_prompts (asyncio) as concurrency grows, with a simulated
+  per-request latency and token rate
+- streaming: per-prompt cost of stream=True over stream=False when the
+  server itself is instant
+- output: cost per result and bytes on disk of each output format
+- cli: cli.main on a generated config, including startup and manifest
+- edgar: MD&A extraction throughput on synthetic EDGAR submissions, serial
+  and with a process pool
+
+Every run is appended as one JSON line to ``--results`` (default
+``benchmarks/results.jsonl``) with the git commit and machine details, and
+compared against the previous run on the same host.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from unittest import mock
+
+# Run as a script from a checkout: the package is one directory up
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_html_to_text import synthetic_filing  # noqa: E402
+from fake_ollama import FakeOllamaServer  # noqa: E402
+
+from llm_pipeline import cli  # noqa: E402
+from llm_pipeline.backends.ollama_backend import OllamaBackend  # noqa: E402
+from llm_pipeline.edgar.cli import process_directory  # noqa: E402
+from llm_pipeline.metrics import RunMetrics  # noqa: E402
+from llm_pipeline.output import OUTPUT_FORMATS, make_sink  # noqa: E402
+from llm_pipeline.runner import arun_model_prompts, run_model_prompts  # noqa: E402
+
+MODEL = "fake:latest"
+DEFAULT_RESULTS = Path(__file__).with_name("results.jsonl")
+
+logger = logging.getLogger("bench")
+
+
+def _write_prompts(directory: Path, n: int) -> Path:
+    path = directory / "prompts.txt"
+    path.write_text(
+        "\n".join(f"Summarize filing number {i}." for i in range(n)),
+        encoding="utf-8",
+    )
+    return path
+
+
+@contextmanager
+def _timed():
+    elapsed = {}
+    start = perf_counter()
+    yield elapsed
+    elapsed["s"] = perf_counter() - start
+
+
+def _run(
+    backend,
+    prompt_file: Path,
+    output_dir: Path,
+    *,
+    concurrency: int = 1,
+    stream: bool = False,
+    async_mode: bool = False,
+    output_format: str = "txt",
+) -> float:
+    """Run every prompt in ``prompt_file`` once; returns elapsed seconds."""
+    sink = make_sink(output_format, output_dir)
+    kwargs = dict(
+        backend=backend,
+        model_cfg={"name": MODEL, "prompts": ["bench"]},
+        prompt_registry={"bench": {"prompt_file": str(prompt_file)}},
+        stream=stream,
+        output_dir=output_dir,
+        backend_name="ollama",
+        concurrency=concurrency,
+        sink=sink,
+        metrics=RunMetrics(),
+        logger=logger,
+    )
+
+    with _timed() as t:
+        if async_mode:
+
+            async def run():
+                try:
+                    await arun_model_prompts(**kwargs)
+                finally:
+                    await backend.aclose()
+
+            asyncio.run(run())
+        else:
+            run_model_prompts(**kwargs)
+        sink.close()
+
+    return t["s"]
+
+
+# =================================================
+# Scenarios
+# =================================================
+
+
+def bench_concurrency(tmp: Path, args) -> dict:
+    prompt_file = _write_prompts(tmp, args.prompts)
+    results = {}
+
+    with FakeOllamaServer(
+        latency_s=args.latency,
+        tokens_per_s=args.tokens_per_s,
+        response_tokens=args.tokens,
+        parallel=args.parallel,
+    ) as server:
+        for mode in ("threads", "async"):
+            for concurrency in args.concurrency:
+                seconds = _run(
+                    OllamaBackend(host=server.url),
+                    prompt_file,
+                    tmp / f"{mode}-{concurrency}",
+                    concurrency=concurrency,
+                    async_mode=mode == "async",
+                )
+                results[f"{mode}_c{concurrency}_prompts_per_s"] = (
+                    args.prompts / seconds
+                )
+                print(
+                    f"  {mode:7s} concurrency {concurrency:3d}: "
+                    f"{args.prompts / seconds:8.1f} prompts/s"
+                )
+
+    return results
+
+
+def bench_streaming(tmp: Path, args) -> dict:
+    prompt_file = _write_prompts(tmp, args.prompts)
+    results = {}
+
+    # No simulated latency: what is left is client/pipeline overhead
+    with FakeOllamaServer(response_tokens=args.tokens) as server:
+        for stream in (False, True):
+            seconds = _run(
+                OllamaBackend(host=server.url),
+                prompt_file,
+                tmp / f"stream-{stream}",
+                stream=stream,
+            )
+            name = "stream" if stream else "no_stream"
+            results[f"{name}_ms_per_prompt"] = seconds / args.prompts * 1000
+            print(
+                f"  {name:9s}: {seconds / args.prompts * 1000:7.2f} ms/prompt "
+                f"({args.tokens} tokens)"
+            )
+
+    results["stream_overhead_ms_per_prompt"] = (
+        results["stream_ms_per_prompt"] - results["no_stream_ms_per_prompt"]
+    )
+    return results
+
+
+def bench_output(tmp: Path, args) -> dict:
+    rng = random.Random(0)
+    text = " ".join(f"word{rng.randrange(1000)}" for _ in range(400))
+    result = {
+        "text": text,
+        "stats": {
+            "prompt_eval_count": 900,
+            "eval_count": 400,
+            "prompt_eval_duration": 120_000_000,
+            "eval_duration": 9_000_000_000,
+            "total_duration": 9_200_000_000,
+        },
+        "wall_time_s": 9.3,
+    }
+    results = {}
+
+    for output_format in sorted(OUTPUT_FORMATS):
+        output_dir = tmp / f"out-{output_format}"
+        try:
+            sink = make_sink(output_format, output_dir)
+        except ImportError as e:
+            print(f"  {output_format:7s}: skipped ({e})")
+            continue
+
+        with _timed() as t:
+            for i in range(args.writes):
+                sink.write(
+                    backend="ollama",
+                    model=MODEL,
+                    prompt_id=f"bench-{i}",
+                    prompt="Summarize the MD&A.",
+                    system=None,
+                    result=result,
+                )
+            sink.close()
+
+        size = sum(p.stat().st_size for p in output_dir.rglob("*") if p.is_file())
+        results[f"{output_format}_us_per_result"] = t["s"] / args.writes * 1e6
+        results[f"{output_format}_bytes_per_result"] = size / args.writes
+        print(
+            f"  {output_format:7s}: {t['s'] / args.writes * 1e6:8.1f} us/result, "
+            f"{size / args.writes:8.0f} bytes/result"
+        )
+
+    return results
+
+
+def bench_cli(tmp: Path, args) -> dict:
+    prompt_file = _write_prompts(tmp, args.prompts)
+    config = tmp / "bench.toml"
+    config.write_text(
+        f"""
+[llm]
+backend = "ollama"
+concurrency = {max(args.concurrency)}
+
+[prompts.bench]
+prompt_file = "{prompt_file.as_posix()}"
+
+[[models]]
+name = "{MODEL}"
+prompts = ["bench"]
+""",
+        encoding="utf-8",
+    )
+
+    with FakeOllamaServer(response_tokens=args.tokens) as server:
+        argv = [
+            "llm-pipeline",
+            str(config),
+            "--server-url",
+            server.url,
+            "--output-dir",
+            str(tmp / "out"),
+            "--output-format",
+            "jsonl",
+            "--no-cache",
+        ]
+        with mock.patch.object(sys, "argv", argv), _timed() as t:
+            cli.main()
+
+    print(f"  cli.main: {t['s']:.2f} s for {args.prompts} prompts")
+    return {"cli_s": t["s"], "cli_prompts_per_s": args.prompts / t["s"]}
+
+
+def synthetic_submission(rng: random.Random) -> str:
+    """An EDGAR full-submission file: the 10-K followed by XBRL and an image."""
+
+    def document(doc_type: str, sequence: int, filename: str, body: str) -> str:
+        return (
+            f"<DOCUMENT>\n<TYPE>{doc_type}\n<SEQUENCE>{sequence}\n"
+            f"<FILENAME>{filename}\n<TEXT>\n{body}\n</TEXT>\n</DOCUMENT>\n"
+        )
+
+    xbrl = "".join(
+        f'<us-gaap:Revenue contextRef="c{i}">{rng.randrange(10**9)}</us-gaap:Revenue>'
+        for i in range(20_000)
+    )
+    image = "begin 644 logo.jpg\n" + ("M" * 61 + "\n") * 5_000 + "end\n"
+
+    return (
+        "<SEC-DOCUMENT>0000000000-26-000001.txt\n<SEC-HEADER>\n"
+        "CONFORMED SUBMISSION TYPE:\t10-K\n</SEC-HEADER>\n"
+        + document("10-K", 1, "form10-k.htm", synthetic_filing(rng))
+        + document("EX-101.INS", 2, "inst.xml", f"<xbrl>{xbrl}</xbrl>")
+        + document("GRAPHIC", 3, "logo.jpg", image)
+        + "</SEC-DOCUMENT>\n"
+    )
+
+
+def bench_edgar(tmp: Path, args) -> dict:
+    input_dir = tmp / "filings"
+    input_dir.mkdir()
+    rng = random.Random(0)
+    for i in range(args.filings):
+        (input_dir / f"synthetic_{i:04d}.txt").write_text(
+            synthetic_submission(rng), encoding="utf-8"
+        )
+    size_mb = sum(p.stat().st_size for p in input_dir.iterdir()) / 1_000_000
+
+    results = {}
+    for workers in sorted({1, args.workers}):
+        with _timed() as t:
+            summary = process_directory(
+                input_dir, tmp / f"mda-{workers}", model=MODEL, workers=workers
+            )
+        results[f"edgar_w{workers}_mb_per_s"] = size_mb / t["s"]
+        results[f"edgar_w{workers}_filings_per_s"] = args.filings / t["s"]
+        print(
+            f"  workers {workers:2d}: {args.filings / t['s']:6.1f} filings/s, "
+            f"{size_mb / t['s']:6.1f} MB/s ({dict(summary)})"
+        )
+
+    return results
+
+
+SCENARIOS = {
+    "concurrency": bench_concurrency,
+    "streaming": bench_streaming,
+    "output": bench_output,
+    "cli": bench_cli,
+    "edgar": bench_edgar,
+}
+
+
+# =================================================
+# Result history
+# =================================================
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _previous_run(path: Path, host: str) -> dict | None:
+    if not path.exists():
+        return None
+    previous = None
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                run = json.loads(line)
+                if run.get("host") == host:
+                    previous = run
+    return previous
+
+
+def _compare(current: dict, previous: dict) -> None:
+    print(
+        f"\nCompared with {previous.get('commit')} "
+        f"({previous.get('timestamp')}):"
+    )
+    for scenario, values in current["results"].items():
+        before = previous.get("results", {}).get(scenario, {})
+        for key, value in values.items():
+            if before.get(key):
+                change = (value - before[key]) / before[key] * 100
+                print(f"  {scenario}.{key}: {before[key]:.4g} -> {value:.4g} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--only",
+        help=f"Comma-separated scenarios to run ({', '.join(SCENARIOS)})",
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Small sizes, for checking the harness itself",
+    )
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=128)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-s", type=float, default=2000)
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=8,
+        help="Simulated OLLAMA_NUM_PARALLEL of the fake server",
+    )
+    parser.add_argument(
+        "--concurrency", type=lambda s: [int(c) for c in s.split(",")],
+        default=[1, 2, 4, 8, 16],
+    )
+    parser.add_argument("--writes", type=int, default=5000)
+    parser.add_argument("--filings", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS)
+    parser.add_argument(
+        "--no-save", action="store_true", help="Do not append to --results"
+    )
+    args = parser.parse_args()
+
+    if args.quick:
+        args.prompts, args.writes, args.filings = 20, 200, 2
+        args.concurrency = [1, 4]
+
+    # The pipeline logs every prompt and result at INFO
+    logging.disable(logging.INFO)
+
+    selected = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "params": {
+            k: v for k, v in vars(args).items() if k not in ("results", "only")
+        },
+        "results": {},
+    }
+
+    for name in selected:
+        print(f"{name}:")
+        with tempfile.TemporaryDirectory() as tmp:
+            run["results"][name] = SCENARIOS[name](Path(tmp), args)
+
+    previous = _previous_run(args.results, run["host"])
+    if previous is not None:
+        _compare(run, previous)
+
+    if not args.no_save:
+        with args.results.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"\nSaved to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+In-process stand-in for an Ollama server.
+
+Implements just enough of the REST API for the pipeline to run against it:
+``POST /api/generate`` (streamed or not), ``GET /api/tags`` and
+``POST /api/pull``. Generation is simulated: each request waits
+``latency_s`` (load + prompt evaluation), then produces ``response_tokens``
+tokens at ``tokens_per_s``, streamed ``chunk_tokens`` tokens per NDJSON
+line. ``parallel`` bounds how many generations run at once, like
+OLLAMA_NUM_PARALLEL, so concurrency scaling flattens where a real server
+would. Setting ``down`` makes it drop every connection without answering,
+like a host that has stopped responding, and stall_next() holds up the
+next request for a prompt, like a stuck generation.
+
+    with FakeOllamaServer(tokens_per_s=200) as server:
+        backend = OllamaBackend(host=server.url)
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaServer:
+    def __init__(
+        self,
+        *,
+        models: tuple[str, ...] = ("fake:latest",),
+        latency_s: float = 0.0,
+        tokens_per_s: float | None = None,
+        response_tokens: int = 64,
+        chunk_tokens: int = 1,
+        parallel: int | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.models = set(models)
+        self.latency_s = latency_s
+        self.tokens_per_s = tokens_per_s
+        self.response_tokens = response_tokens
+        self.chunk_tokens = max(chunk_tokens, 1)
+        self._slots = threading.BoundedSemaphore(parallel) if parallel else None
+
+        self.down = False
+        self.requests = 0
+        self._stalls: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        self._httpd = _HTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="fake-ollama", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # -------------------------
+    # Simulated generation
+    # -------------------------
+    def stall_next(self, prompt: str, seconds: float) -> None:
+        """Delay the next request for ``prompt`` by ``seconds``."""
+        with self._lock:
+            self._stalls[prompt] = seconds
+
+    def generate(self, body: dict):
+        """Yield Ollama generate chunks; the last one carries the stats."""
+        with self._lock:
+            self.requests += 1
+            stall_s = self._stalls.pop(body.get("prompt", ""), 0.0)
+        if stall_s:
+            time.sleep(stall_s)
+
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            yield from self._generate(body)
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    def _generate(self, body: dict):
+        model = body.get("model", "")
+        prompt = body.get("prompt", "")
+        options = body.get("options") or {}
+        if not prompt:
+            # An empty prompt only loads the model, as with Ollama
+            yield {
+                "model": model,
+                "created_at": _now(),
+                "response": "",
+                "done": True,
+                "done_reason": "load",
+            }
+            return
+
+        n_tokens = options.get("num_predict") or self.response_tokens
+        if n_tokens < 0:
+            n_tokens = self.response_tokens
+
+        start = time.perf_counter()
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        prefill_ns = int((time.perf_counter() - start) * 1e9)
+
+        gen_start = time.perf_counter()
+        for first in range(0, n_tokens, self.chunk_tokens):
+            count = min(self.chunk_tokens, n_tokens - first)
+            if self.tokens_per_s:
+                # Sleep until this chunk is due, so the rate holds overall
+                due = gen_start + (first + count) / self.tokens_per_s
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield {
+                "model": model,
+                "created_at": _now(),
+                "response": "".join(f"tok{first + i} " for i in range(count)),
+                "done": False,
+            }
+        end = time.perf_counter()
+
+        yield {
+            "model": model,
+            "created_at": _now(),
+            "response": "",
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((end - start) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": prefill_ns,
+            "eval_count": n_tokens,
+            "eval_duration": int((end - gen_start) * 1e9),
+        }
+
+    def tags(self) -> dict:
+        return {
+            "models": [
+                {
+                    "name": name,
+                    "model": name,
+                    "modified_at": _now(),
+                    "size": 0,
+                    "digest": hashlib.sha256(name.encode()).hexdigest(),
+                    "details": {},
+                }
+                for name in sorted(self.models)
+            ]
+        }
+
+    def pull(self, body: dict) -> list[dict]:
+        self.models.add(body.get("model") or body.get("name"))
+        return [{"status": "pulling manifest"}, {"status": "success"}]
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients hang up on abandoned (hedged or timed-out) requests
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _make_handler(server: FakeOllamaServer):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, so client connection pooling behaves as with Ollama
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; with Nagle on, every
+        # response would stall ~40 ms on the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _body(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _send_json(self, payload: dict, status: int = 200) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, chunks) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in chunks:
+                line = json.dumps(chunk).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _hang_up(self) -> bool:
+            if server.down:
+                self.close_connection = True
+            return server.down
+
+        def do_GET(self):
+            if self._hang_up():
+                return
+            if self.path == "/api/tags":
+                self._send_json(server.tags())
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            body = self._body()
+            if self._hang_up():
+                return
+            stream = body.get("stream", True)
+
+            if self.path == "/api/generate":
+                if body.get("model") not in server.models:
+                    self._send_json(
+                        {"error": f"model '{body.get('model')}' not found"},
+                        status=404,
+                    )
+                elif stream:
+                    self._send_stream(server.generate(body))
+                else:
+                    *chunks, final = server.generate(body)
+                    final["response"] = "".join(c["response"] for c in chunks)
+                    self._send_json(final)
+            elif self.path == "/api/pull":
+                statuses = server.pull(body)
+                if stream:
+                    self._send_stream(statuses)
+                else:
+                    self._send_json(statuses[-1])
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+    return Handler
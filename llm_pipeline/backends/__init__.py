@@ -1,11 +1,59 @@
-from .ollama_backend import OllamaBackend
-from .hf_backend import HuggingFaceBackend
+"""
+Backend registry.
 
+Backends are imported only when selected, so ``--backend ollama`` (or just
+``--help``) never pays for importing torch/transformers. Third-party
+packages can add backends through the ``llm_pipeline.backends`` entry-point
+group, e.g. in their pyproject.toml::
+
+    [project.entry-points."llm_pipeline.backends"]
+    vllm = "my_package.vllm_backend:VLLMBackend"
+"""
+
+from importlib import import_module
+from importlib.metadata import entry_points
+
+from .base import LLMBackend
+
+ENTRY_POINT_GROUP = "llm_pipeline.backends"
+
+# name -> "module:attribute", relative to this package when starting with "."
+BUILTIN_BACKENDS = {
+    "ollama": ".ollama_backend:OllamaBackend",
+    "huggingface": ".hf_backend:HuggingFaceBackend",
+    "hf": ".hf_backend:HuggingFaceBackend",
+}
+
+
+def _plugin_backends() -> dict:
+    return {ep.name: ep for ep in entry_points(group=ENTRY_POINT_GROUP)}
+
+
+def available_backends() -> list[str]:
+    names = set(BUILTIN_BACKENDS) | set(_plugin_backends())
+    return sorted(names - {"hf"})
+
+
+def get_backend_class(kind: str) -> type[LLMBackend]:
+    if kind in BUILTIN_BACKENDS:
+        module_name, attr = BUILTIN_BACKENDS[kind].split(":")
+        return getattr(import_module(module_name, __name__), attr)
+
+    plugins = _plugin_backends()
+    if kind in plugins:
+        return plugins[kind].load()
 
-def get_backend(kind: str, **kwargs):
-    if kind == "ollama":
-        return OllamaBackend(**kwargs)
-    if kind in {"hf", "huggingface"}:
-        return HuggingFaceBackend(**kwargs)
     raise ValueError(f"Unknown backend: {kind}")
 
+
+def get_backend(kind: str, **kwargs):
+    return get_backend_class(kind)(**kwargs)
+
+
+def __getattr__(name: str):
+    # Keep `from llm_pipeline.backends import OllamaBackend` working lazily
+    for spec in BUILTIN_BACKENDS.values():
+        module_name, attr = spec.split(":")
+        if attr == name:
+            return getattr(import_module(module_name, __name__), attr)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,55 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Any, Dict, Iterator
+
+from ..chunking import estimate_tokens
 
 
 class LLMBackend(ABC):
+    # Backends that set this implement run_prompts_batch(prompts=[...])
+    supports_batching = False
+    # ...and accept seeds=[...] there, to draw one sample of each prompt per
+    # seed (of a sweep) in the same call
+    supports_samples = False
+    # Backends whose prefetch_model checks memory itself may be asked to
+    # prefetch the next model as soon as the current one starts
+    prefetch_ahead = False
+
     @abstractmethod
     def ensure_model(self, model: str) -> None:
         pass
 
+    def prefetch_model(self, model: str) -> None:
+        """Optionally start loading ``model`` ahead of its first prompt."""
+
+    def warm_model(self, model: str) -> Dict[str, float]:
+        """
+        Block until ``model`` is loaded and ready to generate.
+
+        Waits for a pending prefetch_model of the same model. Returns
+        timings in seconds: ``warm_s`` (time spent warming, including in
+        the background) and, where the server reports it, ``load_s``.
+        """
+        return {}
+
+    def model_fingerprint(self, model: str) -> str:
+        """
+        Identifier that changes whenever the model weights, or the way
+        they are run, change.
+
+        Used to key cached responses; defaults to the model name.
+        """
+        return model
+
+    def count_tokens(self, model: str, text: str) -> int:
+        """
+        Number of tokens ``text`` takes for ``model``.
+
+        Backends without a local tokenizer return a character-based
+        estimate.
+        """
+        return estimate_tokens(text)
+
     @abstractmethod
     def run_prompt(
         self,
@@ -27,3 +70,56 @@ class LLMBackend(ABC):
         }
         """
 
+    def stream_prompt(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        system: str | None = None,
+        temperature: float | None = None,
+        options: dict | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield Ollama-style chunks: ``{"response": str, "done": bool, ...}``.
+
+        The last chunk has ``done`` set and carries the stats. Backends
+        without incremental generation yield the whole response at once.
+        """
+        result = self.run_prompt(
+            model=model,
+            prompt=prompt,
+            system=system,
+            temperature=temperature,
+            options=options,
+            stream=False,
+        )
+        yield {**result["stats"], "response": result["text"], "done": True}
+
+    async def arun_prompt(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        system: str | None,
+        temperature: float | None,
+        options: dict | None,
+        stream: bool,
+    ) -> Dict[str, Any]:
+        """
+        Async variant of run_prompt with the same return shape.
+
+        Backends without a native async client fall back to running
+        run_prompt in a worker thread.
+        """
+        return await asyncio.to_thread(
+            self.run_prompt,
+            model=model,
+            prompt=prompt,
+            system=system,
+            temperature=temperature,
+            options=options,
+            stream=stream,
+        )
+
+    async def aclose(self) -> None:
+        pass
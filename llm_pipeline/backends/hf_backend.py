@@ -1,50 +1,416 @@
-from time import perf_counter
+import contextlib
+import hashlib
+import json
 import logging
+import os
+from pathlib import Path
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Any, Dict, Iterator
+
+import torch
+from huggingface_hub import list_repo_files, snapshot_download
 from transformers import (
-    AutoTokenizer,
     AutoModelForCausalLM,
-    pipeline,
+    AutoTokenizer,
     GenerationConfig,
+    LogitsProcessor,
+    LogitsProcessorList,
+    MinPLogitsWarper,
+    TemperatureLogitsWarper,
+    TextIteratorStreamer,
+    TopKLogitsWarper,
+    TopPLogitsWarper,
+    pipeline,
     set_seed,
 )
-import torch
+from transformers.generation.streamers import BaseStreamer
 
 from .base import LLMBackend
+from .hf_profile import PerformanceProfile
+from .residency import GB, ModelResidency
 
 logger = logging.getLogger(__name__)
 
+# Repository files ensure_model never needs (original checkpoints, other
+# frameworks' weights)
+IGNORE_PATTERNS = ["original/*", "*.pth", "*.gguf", "*.onnx", "*.msgpack", "*.h5"]
+# PyTorch weights, which transformers only loads when there are no
+# safetensors
+PYTORCH_WEIGHTS = "pytorch_model*.bin"
+WEIGHT_SUFFIXES = {".safetensors", ".bin"}
+
+# Share of device memory models may occupy when no budget is configured
+DEFAULT_MEMORY_FRACTION = 0.8
+
+
+def _device_memory_bytes(device: str) -> int | None:
+    if device.startswith("cuda"):
+        return torch.cuda.get_device_properties(0).total_memory
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+class _FirstToken(BaseStreamer):
+    """
+    Splits a generate() call that is not streamed into prefill and decode
+    time: generate() hands the prompt to put() first and then the tokens of
+    each step, so the second put() marks the first generated token.
+    """
+
+    def __init__(self):
+        self.puts = 0
+        self.at = None
+
+    def put(self, value):
+        self.puts += 1
+        if self.puts == 2:
+            self.at = perf_counter()
+
+    def end(self):
+        pass
+
+    def kwargs(self, gen_config) -> dict:
+        # generate() rejects streamers with beam search
+        return {"streamer": self} if gen_config.num_beams == 1 else {}
+
+    def durations(self, start: float, end: float) -> Dict[str, int]:
+        """Ollama-style ``prompt_eval_duration``/``eval_duration`` (ns)."""
+        first = self.at or end
+        return {
+            "prompt_eval_duration": int((first - start) * 1e9),
+            "eval_duration": int((end - first) * 1e9),
+        }
+
+
+class _RowSampler(LogitsProcessor):
+    """
+    Draws each row's next token from a generator of its own, seeded with
+    ``seeds[row]``, so a sample depends on its seed and prompt only, not on
+    the rows generated alongside it. The scores returned leave generate()'s
+    own sampling a single choice.
+
+    generate() may apply temperature/top-k/top-p/min-p after custom
+    processors, so take_warpers() moves them from the generation config to
+    the sampler. Other sampling cutoffs (typical_p, epsilon/eta) are not
+    applied to per-seed samples.
+    """
+
+    def __init__(self, seeds: list[int], warpers: list):
+        self.seeds = seeds
+        self.warpers = warpers
+        self._generators = None
+
+    @staticmethod
+    def take_warpers(gen_config) -> list:
+        warpers = []
+        if gen_config.temperature not in (None, 1.0):
+            warpers.append(TemperatureLogitsWarper(gen_config.temperature))
+            gen_config.temperature = 1.0
+        if gen_config.top_k:
+            warpers.append(TopKLogitsWarper(gen_config.top_k))
+            gen_config.top_k = 0
+        if gen_config.top_p is not None and gen_config.top_p < 1.0:
+            warpers.append(TopPLogitsWarper(gen_config.top_p))
+            gen_config.top_p = 1.0
+        if getattr(gen_config, "min_p", None):
+            warpers.append(MinPLogitsWarper(gen_config.min_p))
+            gen_config.min_p = None
+        return warpers
+
+    def __call__(self, input_ids, scores):
+        if self._generators is None:
+            self._generators = [
+                torch.Generator(device=scores.device).manual_seed(seed)
+                for seed in self.seeds
+            ]
+        for warper in self.warpers:
+            scores = warper(input_ids, scores)
+        probs = scores.softmax(dim=-1)
+        tokens = torch.stack(
+            [
+                torch.multinomial(row, 1, generator=generator)
+                for row, generator in zip(probs, self._generators)
+            ]
+        )
+        return torch.full_like(scores, -float("inf")).scatter_(1, tokens, 0.0)
+
+
+class _DraftStats:
+    """
+    Forward passes of the main and the draft model during one assisted
+    generate() call.
+
+    Each main-model pass verifies a run of drafted tokens and keeps the
+    accepted ones plus one token of its own, so ``generated - main passes``
+    drafted tokens were accepted. The speedup is estimated against the
+    main model generating alone: its first (prefill) pass plus one decode
+    pass per remaining token, at the cost measured for its passes here.
+
+    The hooks see every pass of the models, so ``lock`` (one per model)
+    keeps assisted generate() calls on them from running concurrently.
+    """
+
+    def __init__(self, model, assistant, lock: Lock):
+        self.model = model
+        self.assistant = assistant
+        self.lock = lock
+        self.passes = {"model": 0, "assistant": 0}
+        self.pass_s: list[float] = []
+        self._started = None
+        self._hooks = []
+
+    def _count(self, name):
+        def hook(*_):
+            self.passes[name] += 1
+        return hook
+
+    def _start(self, *_):
+        self._started = perf_counter()
+
+    def _stop(self, *_):
+        self.pass_s.append(perf_counter() - self._started)
+
+    def __enter__(self):
+        self.lock.acquire()
+        self._hooks = [
+            self.model.register_forward_pre_hook(self._count("model")),
+            self.model.register_forward_pre_hook(self._start),
+            self.model.register_forward_hook(self._stop),
+            self.assistant.register_forward_pre_hook(self._count("assistant")),
+        ]
+        return self
+
+    def __exit__(self, *exc):
+        for hook in self._hooks:
+            hook.remove()
+        self.lock.release()
+
+    def stats(self, generated: int, elapsed: float) -> Dict[str, Any]:
+        drafted = self.passes["assistant"]
+        accepted = max(generated - self.passes["model"], 0)
+
+        speedup = None
+        if generated and len(self.pass_s) > 1 and elapsed > 0:
+            prefill_s, *decode_s = self.pass_s
+            alone_s = prefill_s + (generated - 1) * sum(decode_s) / len(decode_s)
+            speedup = alone_s / elapsed
+
+        return {
+            "assistant_model": self.assistant.name_or_path,
+            "draft_tokens": drafted,
+            "accepted_tokens": accepted,
+            "acceptance_rate": accepted / drafted if drafted else None,
+            "model_passes": self.passes["model"],
+            "speedup_estimate": speedup,
+        }
+
 
 class HuggingFaceBackend(LLMBackend):
+    supports_batching = True
+    supports_samples = True
+    # Prefetches only load what fits the memory budget
+    prefetch_ahead = True
+
     def __init__(
         self,
         device: str | None = None,
         dtype: str | None = None,
+        batch_size: int | None = None,
+        max_memory_gb: float | None = None,
+        profile: str | None = None,
+        quantize: str | None = None,
+        compile: bool | None = None,
+        attn_implementation: str | None = None,
+        cache_implementation: str | None = None,
+        num_threads: int | None = None,
+        num_interop_threads: int | None = None,
+        cpu_affinity: str | list[int] | None = None,
+        assistant_models: dict[str, str] | None = None,
         **_ignored,
     ):
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        self.dtype = dtype
-        self._pipelines = {}
+        self.batch_size = batch_size or 8
+        # Draft model for assisted decoding, by main model
+        self.assistant_models = dict(assistant_models or {})
+
+        # Speed settings; see hf_profile
+        self.performance = PerformanceProfile(
+            device=self.device,
+            profile=profile,
+            dtype=dtype,
+            quantize=quantize,
+            compile=compile,
+            attn_implementation=attn_implementation,
+            cache_implementation=cache_implementation,
+            num_threads=num_threads,
+            num_interop_threads=num_interop_threads,
+            cpu_affinity=cpu_affinity,
+        )
+        self.performance.apply_threads()
+
+        if max_memory_gb is not None:
+            budget = int(max_memory_gb * GB)
+        else:
+            total = _device_memory_bytes(self.device)
+            budget = int(total * DEFAULT_MEMORY_FRACTION) if total else None
+
+        self._residency = ModelResidency(
+            loader=self._load_pipeline,
+            footprint=self._footprint,
+            estimate=self._estimate_bytes,
+            budget_bytes=budget,
+            on_evict=self._release_memory,
+        )
+
+    def _with_assistant(self, model: str) -> list[str]:
+        assistant = self.assistant_models.get(model)
+        return [model] if assistant is None else [model, assistant]
 
     def ensure_model(self, model: str) -> None:
-        AutoTokenizer.from_pretrained(model)
-        AutoModelForCausalLM.from_pretrained(model)
+        # Fetch the files only; weights are loaded once, by _get_pipeline
+        for name in self._with_assistant(model):
+            if not Path(name).is_dir():
+                snapshot_download(name, ignore_patterns=self._ignore_patterns(name))
+
+    def _estimate_bytes(self, model: str) -> int:
+        return sum(self._weights_bytes(name) for name in self._with_assistant(model))
+
+    @staticmethod
+    def _footprint(pipe) -> int:
+        total = pipe.model.get_memory_footprint()
+        if pipe.assistant_model is not None:
+            total += pipe.assistant_model.get_memory_footprint()
+        return total
+
+    @staticmethod
+    def _ignore_patterns(model: str) -> list[str]:
+        try:
+            files = list_repo_files(model)
+        except Exception:
+            # Offline: snapshot_download falls back to the cached files
+            return IGNORE_PATTERNS
+        if any(f.endswith(".safetensors") for f in files):
+            return IGNORE_PATTERNS + [PYTORCH_WEIGHTS]
+        return IGNORE_PATTERNS
+
+    @staticmethod
+    def _weights_bytes(model: str) -> int:
+        """Size of the weight files on disk, as a proxy for loaded size."""
+        try:
+            path = (
+                Path(model)
+                if Path(model).is_dir()
+                else Path(
+                    snapshot_download(
+                        model,
+                        ignore_patterns=IGNORE_PATTERNS,
+                        local_files_only=True,
+                    )
+                )
+            )
+        except Exception:
+            return 0
+
+        sizes = dict.fromkeys(WEIGHT_SUFFIXES, 0)
+        for f in path.iterdir():
+            if f.suffix in WEIGHT_SUFFIXES:
+                sizes[f.suffix] += f.stat().st_size
+        # Only one format is loaded, safetensors where both are present
+        return sizes[".safetensors"] or sizes[".bin"]
+
+    def _release_memory(self) -> None:
+        if self.device.startswith("cuda"):
+            torch.cuda.empty_cache()
+
+    def _load_pipeline(self, model: str):
+        tokenizer = AutoTokenizer.from_pretrained(model)
+        # Decoder-only models must be padded on the left for batching
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        model_obj = AutoModelForCausalLM.from_pretrained(
+            model, **self.performance.load_kwargs()
+        ).to(self.device)
+        model_obj = self.performance.optimize(model_obj)
+        logger.info(
+            "Loaded %s with %s", model, self.performance.settings(model_obj)
+        )
+
+        pipe = pipeline(
+            "text-generation",
+            model=model_obj,
+            tokenizer=tokenizer,
+            device=0 if self.device == "cuda" else -1,
+        )
+
+        # Loaded, cached and evicted together with the main model
+        pipe.assistant_model = None
+        pipe.assisted_lock = Lock()
+        assistant = self.assistant_models.get(model)
+        if assistant is not None:
+            pipe.assistant_model = self._load_assistant(assistant, model, tokenizer)
+        return pipe
+
+    def _load_assistant(self, assistant: str, model: str, tokenizer):
+        """
+        Load the draft model for ``model``. Drafted token ids are checked by
+        the main model as they are, so both must share the tokenizer.
+        """
+        draft_tokenizer = AutoTokenizer.from_pretrained(assistant)
+        if draft_tokenizer.get_vocab() != tokenizer.get_vocab():
+            raise ValueError(
+                f"Assistant model {assistant} does not share the tokenizer "
+                f"of {model}"
+            )
+
+        draft = AutoModelForCausalLM.from_pretrained(
+            assistant, **self.performance.load_kwargs()
+        ).to(self.device)
+        logger.info("Loaded %s as assistant model of %s", assistant, model)
+        return draft
 
     def _get_pipeline(self, model: str):
-        if model not in self._pipelines:
-            tokenizer = AutoTokenizer.from_pretrained(model)
-            model_obj = AutoModelForCausalLM.from_pretrained(
-                model,
-                torch_dtype=getattr(torch, self.dtype) if self.dtype else None,
-            ).to(self.device)
-
-            self._pipelines[model] = pipeline(
-                "text-generation",
-                model=model_obj,
-                tokenizer=tokenizer,
-                device=0 if self.device == "cuda" else -1,
+        return self._residency.get(model)
+
+    def count_tokens(self, model: str, text: str) -> int:
+        tokenizer = self._get_pipeline(model).tokenizer
+        return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def prefetch_model(self, model: str) -> None:
+        """Load ``model`` in the background if it fits the memory budget."""
+        self._residency.prefetch(model)
+
+    def warm_model(self, model: str) -> dict:
+        start = perf_counter()
+        self._get_pipeline(model)
+        if self.performance.compile:
+            # Compile the decode step now rather than during the first prompt
+            self._generate(
+                model=model,
+                prompt="Hello",
+                system=None,
+                temperature=None,
+                options={"max_new_tokens": 2},
             )
+        return {"warm_s": perf_counter() - start}
 
-        return self._pipelines[model]
+    def model_fingerprint(self, model: str) -> str:
+        # The same weights give different text in another dtype, quantized
+        # or with an assistant, so all of it goes into cache keys
+        model_obj = self._get_pipeline(model).model
+        identity = {
+            "revision": getattr(model_obj.config, "_commit_hash", None),
+            "assistant_model": self.assistant_models.get(model),
+            "performance": self.performance.settings(model_obj),
+        }
+        digest = hashlib.sha256(
+            json.dumps(identity, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"{model}@{digest[:16]}"
 
     def _make_generation_config(
         self,
@@ -96,24 +462,31 @@ class HuggingFaceBackend(LLMBackend):
 
         return gen_config, overrides, defaults, seed
 
-    def run_prompt(
-        self,
-        *,
-        model: str,
-        prompt: str,
-        system: str | None = None,
-        temperature: float | None = None,
-        options: dict | None = None,
-        stream: bool = False,
-    ):
-        pipe = self._get_pipeline(model)
-        model_obj = pipe.model
+    @staticmethod
+    def _assisted(pipe, gen_config) -> dict:
+        """Extra generate() arguments for assisted decoding, if configured."""
+        if pipe.assistant_model is None:
+            return {}
+        # Rejected drafts are rolled back, which needs a dynamic cache
+        gen_config.cache_implementation = None
+        return {"assistant_model": pipe.assistant_model}
+
+    @staticmethod
+    def _draft_stats(pipe, assisted: dict):
+        if not assisted:
+            return contextlib.nullcontext()
+        return _DraftStats(pipe.model, pipe.assistant_model, pipe.assisted_lock)
 
-        full_prompt = f"{system}\n\n{prompt}" if system else prompt
+    @staticmethod
+    def _full_prompt(prompt: str, system: str | None) -> str:
+        return f"{system}\n\n{prompt}" if system else prompt
 
+    def _prepare_generation(self, model_obj, tokenizer, options, temperature):
         gen_config, overrides, defaults, seed = self._make_generation_config(
             model_obj, options, temperature
         )
+        if gen_config.pad_token_id is None:
+            gen_config.pad_token_id = tokenizer.pad_token_id
 
         if seed is not None:
             set_seed(seed)
@@ -122,25 +495,325 @@ class HuggingFaceBackend(LLMBackend):
         logger.info("Generation config overrides (user-specified): %s", overrides)
         logger.info("Generation config defaults (model): %s", defaults)
 
-        start = perf_counter()
+        return gen_config, {
+            "backend": "huggingface",
+            "device": self.device,
+            "performance": self.performance.settings(model_obj),
+            "generation_options_overrides": overrides,
+            "generation_options_defaults": defaults,
+            "seed": seed,
+        }
+
+    def stream_prompt(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        system: str | None = None,
+        temperature: float | None = None,
+        options: dict | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield generated text incrementally, Ollama-style.
 
-        out = pipe(
-            full_prompt,
-            generation_config=gen_config,
+        Generation runs on a worker thread feeding a TextIteratorStreamer.
+        Every chunk is ``{"response": str, "done": False}``; the final chunk
+        has ``done: True`` and the timing/token stats under the same keys
+        Ollama uses (durations in nanoseconds), plus time-to-first-token and
+        mean inter-token latency in seconds.
+        """
+        pipe = self._get_pipeline(model)
+        model_obj, tokenizer = pipe.model, pipe.tokenizer
+
+        gen_config, stats = self._prepare_generation(
+            model_obj, tokenizer, options, temperature
         )
+        inputs = tokenizer(
+            self._full_prompt(prompt, system), return_tensors="pt"
+        ).to(model_obj.device)
+        prompt_tokens = inputs["input_ids"].shape[1]
+
+        streamer = TextIteratorStreamer(
+            tokenizer, skip_prompt=True, skip_special_tokens=True
+        )
+        output = {}
+        assisted = self._assisted(pipe, gen_config)
+        draft = self._draft_stats(pipe, assisted)
+
+        def generate():
+            try:
+                with torch.no_grad(), draft:
+                    output["sequences"] = model_obj.generate(
+                        **inputs,
+                        generation_config=gen_config,
+                        streamer=streamer,
+                        **assisted,
+                    )
+            except BaseException as e:
+                output["error"] = e
+                streamer.end()
+
+        start = perf_counter()
+        first_token = None
+
+        thread = Thread(target=generate, name="hf-generate", daemon=True)
+        thread.start()
+
+        for text in streamer:
+            if not text:
+                continue
+            if first_token is None:
+                first_token = perf_counter()
+            yield {"response": text, "done": False}
+
+        thread.join()
+        end = perf_counter()
+
+        if "error" in output:
+            raise output["error"]
+
+        eval_count = int(output["sequences"].shape[1] - prompt_tokens)
+        first_token = first_token or end
+        eval_s = end - first_token
+        if assisted:
+            stats["assisted"] = draft.stats(eval_count, end - start)
+
+        yield {
+            "response": "",
+            "done": True,
+            **stats,
+            "model": model,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": eval_count,
+            # Prefill ends when the first token is decoded
+            "prompt_eval_duration": int((first_token - start) * 1e9),
+            "eval_duration": int(eval_s * 1e9),
+            "total_duration": int((end - start) * 1e9),
+            "time_to_first_token_s": first_token - start,
+            "inter_token_latency_s": eval_s / max(eval_count - 1, 1),
+            "tokens_per_s": eval_count / (end - start),
+        }
+
+    def run_prompt(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        system: str | None = None,
+        temperature: float | None = None,
+        options: dict | None = None,
+        stream: bool = False,
+    ):
+        start = perf_counter()
 
-        text = out[0]["generated_text"][len(full_prompt):]
+        if stream:
+            chunks, stats = [], {}
+            for chunk in self.stream_prompt(
+                model=model,
+                prompt=prompt,
+                system=system,
+                temperature=temperature,
+                options=options,
+            ):
+                chunks.append(chunk.get("response", ""))
+                stats = chunk
+            text = "".join(chunks)
+        else:
+            text, stats = self._generate(
+                model=model,
+                prompt=prompt,
+                system=system,
+                temperature=temperature,
+                options=options,
+            )
 
         return {
             "text": text.strip(),
-            "stats": {
-                "backend": "huggingface",
-                "model": model,
-                "device": self.device,
-                "generation_options_overrides": overrides,
-                "generation_options_defaults": defaults,
-                "seed": seed,
-            },
+            "stats": stats,
             "wall_time_s": perf_counter() - start,
         }
 
+    def _generate(self, *, model, prompt, system, temperature, options):
+        pipe = self._get_pipeline(model)
+        model_obj, tokenizer = pipe.model, pipe.tokenizer
+
+        gen_config, stats = self._prepare_generation(
+            model_obj, tokenizer, options, temperature
+        )
+        inputs = tokenizer(
+            self._full_prompt(prompt, system), return_tensors="pt"
+        ).to(model_obj.device)
+        prompt_tokens = inputs["input_ids"].shape[1]
+        assisted = self._assisted(pipe, gen_config)
+        draft = self._draft_stats(pipe, assisted)
+        timer = _FirstToken()
+
+        start = perf_counter()
+        with torch.no_grad(), draft:
+            out = model_obj.generate(
+                **inputs,
+                generation_config=gen_config,
+                **timer.kwargs(gen_config),
+                **assisted,
+            )
+        end = perf_counter()
+        elapsed = end - start
+
+        new_tokens = out[0, prompt_tokens:]
+        text = tokenizer.decode(new_tokens, skip_special_tokens=True)
+        if assisted:
+            stats["assisted"] = draft.stats(int(new_tokens.shape[0]), elapsed)
+
+        return text, {
+            **stats,
+            "model": model,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": int(new_tokens.shape[0]),
+            **timer.durations(start, end),
+            "total_duration": int(elapsed * 1e9),
+            "tokens_per_s": new_tokens.shape[0] / elapsed,
+        }
+
+    def run_prompts_batch(
+        self,
+        *,
+        model: str,
+        prompts: list[str],
+        system: str | None = None,
+        temperature: float | None = None,
+        options: dict | None = None,
+        stream: bool = False,
+        seeds: list[int] | None = None,
+    ) -> list[dict]:
+        """
+        Generate completions for many prompts sharing one configuration.
+
+        Prompts are sorted by token length and generated in left-padded
+        batches of ``self.batch_size`` so similarly sized prompts share a
+        forward pass. Results are returned in the order of ``prompts``.
+
+        With ``seeds``, each prompt is tokenized once and sampled once per
+        seed in the same ``generate`` call (``num_return_sequences``), each
+        sample drawn from its own seed (see _RowSampler); the results are
+        then prompt-major, all samples of a prompt in a row. Greedy decoding
+        would return identical samples, so it generates one and repeats it.
+        """
+        samples = len(seeds) if seeds else 1
+        pipe = self._get_pipeline(model)
+        model_obj, tokenizer = pipe.model, pipe.tokenizer
+
+        if pipe.assistant_model is not None:
+            return self._run_assisted_batch(
+                model=model,
+                prompts=prompts,
+                system=system,
+                temperature=temperature,
+                options=options,
+                seeds=seeds,
+            )
+
+        gen_config, stats = self._prepare_generation(
+            model_obj, tokenizer, options, temperature
+        )
+        # Sequences generated per prompt; batch_size bounds the rows
+        rows = samples if samples > 1 and gen_config.do_sample else 1
+        gen_config.num_return_sequences = rows
+        per_batch = max(self.batch_size // rows, 1)
+        warpers = _RowSampler.take_warpers(gen_config) if rows > 1 else []
+        sampled = {}
+
+        encoded = tokenizer(
+            [self._full_prompt(p, system) for p in prompts]
+        )["input_ids"]
+        order = sorted(range(len(prompts)), key=lambda i: len(encoded[i]))
+
+        results: list[dict | None] = [None] * (len(prompts) * samples)
+
+        for offset in range(0, len(order), per_batch):
+            idxs = order[offset:offset + per_batch]
+
+            start = perf_counter()
+
+            batch = tokenizer.pad(
+                {"input_ids": [encoded[i] for i in idxs]},
+                return_tensors="pt",
+            ).to(model_obj.device)
+            input_len = batch["input_ids"].shape[1]
+            timer = _FirstToken()
+            if rows > 1:
+                sampled["logits_processor"] = LogitsProcessorList(
+                    [_RowSampler(seeds * len(idxs), warpers)]
+                )
+
+            with torch.no_grad():
+                out = model_obj.generate(
+                    **batch,
+                    generation_config=gen_config,
+                    **timer.kwargs(gen_config),
+                    **sampled,
+                )
+            end = perf_counter()
+
+            new_tokens = out[:, input_len:]
+            texts = tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+            elapsed = perf_counter() - start
+            durations = timer.durations(start, end)
+            generated = (new_tokens != gen_config.pad_token_id).sum(dim=1).tolist()
+
+            logger.info(
+                "Generated batch of %d prompt(s) x %d sample(s) "
+                "(padded length %d) in %.1f s, %.1f tokens/s",
+                len(idxs),
+                rows,
+                input_len,
+                elapsed,
+                sum(generated) / elapsed,
+            )
+
+            for n, i in enumerate(idxs):
+                for sample in range(samples):
+                    row = n * rows + (sample if rows > 1 else 0)
+                    result = {
+                        "text": texts[row].strip(),
+                        "stats": {
+                            **stats,
+                            "model": model,
+                            "batch_size": len(idxs),
+                            "prompt_eval_count": len(encoded[i]),
+                            "eval_count": generated[row],
+                            **durations,
+                            "total_duration": int(elapsed * 1e9),
+                            "tokens_per_s": generated[row] / elapsed,
+                            "batch_tokens_per_s": sum(generated) / elapsed,
+                        },
+                        "wall_time_s": elapsed,
+                    }
+                    if samples > 1:
+                        result["stats"].update(
+                            sample=sample + 1, samples=samples, seed=seeds[sample]
+                        )
+                    results[i * samples + sample] = result
+
+        return results
+
+    def _run_assisted_batch(
+        self, *, model, prompts, system, temperature, options, seeds
+    ) -> list[dict]:
+        """
+        run_prompts_batch for models with an assistant: assisted decoding
+        generates one sequence at a time, each sample seeded with its seed.
+        """
+        results = []
+        for prompt in prompts:
+            for sample, seed in enumerate(seeds or [None]):
+                result = self.run_prompt(
+                    model=model,
+                    prompt=prompt,
+                    system=system,
+                    temperature=temperature,
+                    options={**(options or {}), "seed": seed} if seeds else options,
+                )
+                if seeds:
+                    result["stats"].update(sample=sample + 1, samples=len(seeds))
+                results.append(result)
+        return results
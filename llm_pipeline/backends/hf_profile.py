@@ -0,0 +1,214 @@
+"""
+Performance profile for the Hugging Face backend.
+
+A profile collects the settings that trade model load time for generation
+speed, mostly on CPU:
+
+- ``dtype``: e.g. ``"bfloat16"``, which halves memory traffic on CPUs with
+  native bf16 (AVX512-BF16/AMX)
+- ``quantize = "int8"``: dynamic int8 quantization of the linear layers
+  (CPU only; the weights are loaded as float32 first)
+- ``compile``: ``torch.compile`` the model's forward pass, i.e. the decode
+  step; the first generation pays for compilation
+- ``attn_implementation``: ``"sdpa"``, ``"eager"``, ``"flash_attention_2"``
+- ``cache_implementation``: ``"static"`` preallocates the KV cache, giving
+  the compiled decode step fixed shapes
+- ``num_threads``/``num_interop_threads``: torch intra-op/inter-op threads
+- ``cpu_affinity``: CPUs to pin the process to, e.g. ``"0-31"``
+
+``profile = "cpu"`` starts from the CPU_PRESET defaults, which individual
+settings override. torch is only imported once the profile is applied, so
+the settings can be resolved without it.
+"""
+
+import logging
+import os
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+CPU_PRESET = {
+    # bf16 only pays off where the CPU computes it natively; see _dtype
+    "dtype": "auto",
+    "attn_implementation": "sdpa",
+    "cache_implementation": "static",
+    "compile": True,
+}
+PRESETS = {"cpu": CPU_PRESET}
+
+QUANTIZE_MODES = {"int8"}
+
+
+def parse_cpu_list(spec: str | list[int]) -> list[int]:
+    """``"0-3,8"`` or ``[0, 1, 2, 3, 8]`` as a sorted list of CPU numbers."""
+    if isinstance(spec, list):
+        return sorted(set(spec))
+
+    cpus: set[int] = set()
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        try:
+            cpus.update(range(int(first), int(last or first) + 1))
+        except ValueError:
+            raise ValueError(f"Invalid CPU list: {spec!r}") from None
+    if not cpus:
+        raise ValueError(f"Invalid CPU list: {spec!r}")
+    return sorted(cpus)
+
+
+class PerformanceProfile:
+    def __init__(
+        self,
+        *,
+        device: str,
+        profile: str | None = None,
+        dtype: str | None = None,
+        quantize: str | None = None,
+        compile: bool | None = None,
+        attn_implementation: str | None = None,
+        cache_implementation: str | None = None,
+        num_threads: int | None = None,
+        num_interop_threads: int | None = None,
+        cpu_affinity: str | list[int] | None = None,
+    ):
+        if profile is not None and profile not in PRESETS:
+            raise ValueError(
+                f"Unknown performance profile {profile!r} "
+                f"(expected one of {sorted(PRESETS)})"
+            )
+        preset = PRESETS.get(profile, {})
+
+        def pick(name, value):
+            return value if value is not None else preset.get(name)
+
+        self.device = device
+        self.profile = profile
+        self.dtype = pick("dtype", dtype)
+        self.quantize = pick("quantize", quantize)
+        self.compile = bool(pick("compile", compile))
+        self.attn_implementation = pick("attn_implementation", attn_implementation)
+        self.cache_implementation = pick(
+            "cache_implementation", cache_implementation
+        )
+        self.num_threads = num_threads
+        self.num_interop_threads = num_interop_threads
+        self.cpu_affinity = (
+            parse_cpu_list(cpu_affinity) if cpu_affinity is not None else None
+        )
+
+        if self.quantize is not None:
+            if self.quantize not in QUANTIZE_MODES:
+                raise ValueError(
+                    f"Unknown quantize mode {self.quantize!r} "
+                    f"(expected one of {sorted(QUANTIZE_MODES)})"
+                )
+            if not device.startswith("cpu"):
+                raise ValueError("Dynamic int8 quantization runs on CPU only")
+            if self.dtype not in (None, "auto", "float32"):
+                logger.warning(
+                    "Ignoring dtype %s: int8 quantization loads float32 weights",
+                    self.dtype,
+                )
+            self.dtype = "float32"
+
+    # -------------------------
+    # Process-wide settings
+    # -------------------------
+    def apply_threads(self) -> None:
+        """Pin the process and size torch's thread pools (once, at startup)."""
+        import torch
+
+        if self.cpu_affinity is not None:
+            if hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, self.cpu_affinity)
+            else:
+                logger.warning("cpu_affinity is not supported on this platform")
+
+        num_threads = self.num_threads
+        if num_threads is None and self.cpu_affinity is not None:
+            # One intra-op thread per pinned CPU
+            num_threads = len(self.cpu_affinity)
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+
+        if self.num_interop_threads is not None:
+            try:
+                torch.set_num_interop_threads(self.num_interop_threads)
+            except RuntimeError as e:
+                # Only possible before any inter-op parallel work has run
+                logger.warning("Could not set inter-op threads: %s", e)
+
+        logger.info(
+            "torch threads: %d intra-op, %d inter-op",
+            torch.get_num_threads(),
+            torch.get_num_interop_threads(),
+        )
+
+    # -------------------------
+    # Per-model settings
+    # -------------------------
+    def _dtype(self):
+        import torch
+
+        if self.dtype != "auto":
+            return getattr(torch, self.dtype) if self.dtype else None
+        if self.device.startswith("cpu"):
+            return torch.bfloat16 if _cpu_has_native_bf16() else torch.float32
+        return None
+
+    def load_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments for ``from_pretrained``."""
+        kwargs: Dict[str, Any] = {"torch_dtype": self._dtype()}
+        if self.attn_implementation is not None:
+            kwargs["attn_implementation"] = self.attn_implementation
+        return kwargs
+
+    def optimize(self, model):
+        """Quantize/compile a loaded model; returns the model to use."""
+        import torch
+
+        if self.quantize == "int8":
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+        if self.cache_implementation is not None:
+            model.generation_config.cache_implementation = (
+                self.cache_implementation
+            )
+
+        if self.compile:
+            # CUDA graphs ("reduce-overhead") only exist on GPU
+            mode = None if self.device.startswith("cpu") else "reduce-overhead"
+            model.forward = torch.compile(model.forward, mode=mode)
+
+        return model
+
+    def settings(self, model) -> Dict[str, Any]:
+        """The settings in effect for ``model``, as recorded in result stats."""
+        import torch
+
+        return {
+            "profile": self.profile,
+            "dtype": str(model.dtype).removeprefix("torch."),
+            "quantize": self.quantize,
+            "compile": self.compile,
+            "attn_implementation": getattr(
+                model.config, "_attn_implementation", self.attn_implementation
+            ),
+            "cache_implementation": model.generation_config.cache_implementation,
+            "num_threads": torch.get_num_threads(),
+            "num_interop_threads": torch.get_num_interop_threads(),
+        }
+
+
+def _cpu_has_native_bf16() -> bool:
+    import torch
+
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
@@ -1,16 +1,480 @@
+import asyncio
+import logging
+import math
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import count
+from time import monotonic, perf_counter, sleep
+
+import httpx
 import ollama
-from time import perf_counter
+
+from ..deadlines import DeadlineExceeded, RequestPolicy, next_wakeup
+from ..limiter import AdaptiveLimiter
+from ..output import plain_stats
 from .base import LLMBackend
 
+logger = logging.getLogger(__name__)
+
+# httpx defaults, kept explicit so a partial override does not turn the
+# other limit into "unlimited".
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# A host that already serves a model is preferred until it has this many
+# more requests in flight than the least loaded host, since sending the
+# model elsewhere costs a load there
+AFFINITY_REQUESTS = 4
+HEALTH_CHECK_TIMEOUT_S = 5.0
+# How long a host that stopped responding is left out before it is probed
+RECHECK_INTERVAL_S = 30.0
+
+# Errors meaning the host, not the request, is at fault; the request is
+# retried on another host
+FAILOVER_ERRORS = (ConnectionError, httpx.TransportError)
+# Returned by Ollama when its request queue (OLLAMA_MAX_QUEUE) is full
+OVERLOADED_STATUS = 503
+
+
+class _Abandoned(Exception):
+    """A hedged attempt stopped because another one answered first."""
+
+
+def _in_background(fn, *args) -> Future:
+    """
+    Run ``fn(*args)`` on a daemon thread. Unlike an executor's workers, an
+    abandoned attempt still waiting on its server does not hold up
+    interpreter exit.
+    """
+    future: Future = Future()
+
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="ollama-attempt", daemon=True).start()
+    return future
+
+
+def parse_hosts(host: str | list[str] | tuple[str, ...]) -> list[str]:
+    """Host URLs from a list or a comma-separated string."""
+    if isinstance(host, str):
+        host = host.split(",")
+    hosts = [h.strip() for h in host if h and h.strip()]
+    if not hosts:
+        raise ValueError("No Ollama host given")
+    return list(dict.fromkeys(hosts))
+
+
+class _Host:
+    """One Ollama server and what the balancer knows about it."""
+
+    def __init__(self, url: str, *, timeout: float | None, async_kwargs: dict):
+        self.url = url
+        self.timeout = timeout
+        self.client = ollama.Client(host=url, timeout=timeout)
+        self.probe = ollama.Client(host=url, timeout=HEALTH_CHECK_TIMEOUT_S)
+        self._async_kwargs = async_kwargs
+        self._async_client = None
+        # Clients for attempts under a deadline, by read timeout
+        self._timed_clients: dict[float, ollama.Client] = {}
+        self._timed_lock = threading.Lock()
+
+        self.outstanding = 0
+        self.healthy = True
+        self.retry_at = 0.0
+        # Models sent to this host, which it is likely to have loaded
+        self.models: set[str] = set()
+        self.digests: dict[str, str] = {}
+
+    @property
+    def async_client(self) -> ollama.AsyncClient:
+        if self._async_client is None:
+            self._async_client = ollama.AsyncClient(
+                host=self.url, **self._async_kwargs
+            )
+        return self._async_client
+
+    def client_for(self, read_timeout: float | None) -> ollama.Client:
+        """
+        A client whose reads give up after ``read_timeout``, rounded up to a
+        power of two seconds so that few clients are made; ``client`` when
+        there is no read timeout.
+        """
+        if read_timeout is None:
+            return self.client
+        timeout = 2.0 ** math.ceil(math.log2(max(read_timeout, 1.0)))
+        if self.timeout is not None:
+            timeout = min(timeout, self.timeout)
+        with self._timed_lock:
+            client = self._timed_clients.get(timeout)
+            if client is None:
+                client = ollama.Client(host=self.url, timeout=timeout)
+                self._timed_clients[timeout] = client
+        return client
+
+    def list_models(self) -> list[str]:
+        models = self.probe.list().models
+        self.digests = {m.model: m.digest for m in models}
+        return [m.model for m in models]
+
 
 class OllamaBackend(LLMBackend):
-    def __init__(self, host: str):
-        self.client = ollama.Client(host=host)
+    """
+    Ollama backend over one or more servers.
+
+    With several hosts, each request goes to the healthy host with the
+    fewest requests in flight, preferring hosts that already serve the
+    model (see AFFINITY_REQUESTS). A host that fails with a connection
+    error is taken out of rotation, its request retried elsewhere, and it
+    is probed again after RECHECK_INTERVAL_S. Results carry the ``host``
+    that produced them, for per-host throughput in RunMetrics.
+
+    With ``adaptive_concurrency``, requests in flight per host and model
+    are bounded by an AdaptiveLimiter fed with each response's
+    ``total_duration``, so the runner's concurrency becomes an upper
+    bound rather than the level used.
+
+    With ``deadline_factor``, requests get a deadline and, with
+    ``hedge_percentile``, a duplicate on another host once past that
+    latency, both learned per model and prompt length (see RequestPolicy).
+    Failures and missed deadlines are retried up to
+    ``max_retries`` times with jittered backoff. The stats of each result
+    record the ``attempt`` that won, whether it was ``hedged`` and the
+    number of ``retries``.
+    """
+
+    def __init__(
+        self,
+        host: str | list[str],
+        max_connections: int | None = None,
+        max_keepalive_connections: int | None = None,
+        timeout: float | None = None,
+        keep_alive: str | float | None = None,
+        adaptive_concurrency: bool = False,
+        hedge_percentile: float | None = None,
+        deadline_factor: float | None = None,
+        min_deadline_s: float = 10.0,
+        max_retries: int = 2,
+        retry_backoff_s: float = 1.0,
+        **_ignored,
+    ):
+        # Shared connection pool limits for each host's async client; the
+        # clients are created lazily so they bind to the event loop that
+        # actually uses them.
+        async_kwargs = {
+            "timeout": timeout,
+            "limits": httpx.Limits(
+                max_connections=max_connections or DEFAULT_MAX_CONNECTIONS,
+                max_keepalive_connections=(
+                    max_keepalive_connections
+                    or DEFAULT_MAX_KEEPALIVE_CONNECTIONS
+                ),
+            ),
+        }
+        self.hosts = [
+            _Host(url, timeout=timeout, async_kwargs=async_kwargs)
+            for url in parse_hosts(host)
+        ]
+        self.host = self.hosts[0].url
+        self._hosts_lock = threading.Lock()
 
+        self.adaptive_concurrency = adaptive_concurrency
+        self._limiters: dict[tuple[str, str], AdaptiveLimiter] = {}
+
+        self.policy = RequestPolicy(
+            hedge_percentile=hedge_percentile,
+            deadline_factor=deadline_factor,
+            min_deadline_s=min_deadline_s,
+            max_retries=max_retries,
+            retry_backoff_s=retry_backoff_s,
+        )
+        # How long the server keeps a model loaded after each request
+        # (e.g. "30m"); None leaves the server default (5 minutes)
+        self.keep_alive = keep_alive
+        self._warming: dict[str, Future] = {}
+        self._warming_lock = threading.Lock()
+        self._prefetcher = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="ollama-warm"
+        )
+
+    # -------------------------
+    # Host selection
+    # -------------------------
+    def _mark_down(self, host: _Host, error: Exception) -> None:
+        with self._hosts_lock:
+            if host.healthy:
+                logger.warning(
+                    "Ollama host %s stopped responding, retrying elsewhere: %s",
+                    host.url,
+                    error,
+                )
+            host.healthy = False
+            host.retry_at = monotonic() + RECHECK_INTERVAL_S
+
+    def _check(self, host: _Host) -> bool:
+        try:
+            host.list_models()
+        except FAILOVER_ERRORS as e:
+            self._mark_down(host, e)
+            return False
+        with self._hosts_lock:
+            if not host.healthy:
+                logger.info("Ollama host %s is back", host.url)
+            host.healthy = True
+        return True
+
+    def _due_for_recheck(self) -> list[_Host]:
+        """
+        Down hosts to probe now; each is claimed by one caller. When no
+        host is up, all are probed rather than failing every request until
+        the recheck interval has passed.
+        """
+        now = monotonic()
+        with self._hosts_lock:
+            any_up = any(h.healthy for h in self.hosts)
+            due = [
+                h
+                for h in self.hosts
+                if not h.healthy and (h.retry_at <= now or not any_up)
+            ]
+            for h in due:
+                h.retry_at = now + RECHECK_INTERVAL_S
+        return due
+
+    def _limiter(self, host: _Host, model: str) -> AdaptiveLimiter | None:
+        if not self.adaptive_concurrency:
+            return None
+        key = (host.url, model)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            name = model if len(self.hosts) == 1 else f"{model} on {host.url}"
+            limiter = self._limiters.setdefault(
+                key, AdaptiveLimiter(name, logger=logger)
+            )
+        return limiter
+
+    def _acquire(self, model: str, tried: list[_Host]) -> _Host | None:
+        def load(h: _Host):
+            limiter = self._limiter(h, model)
+            return (
+                # Hosts whose adaptive limit is reached come last
+                limiter is not None and not limiter.has_room(),
+                h.outstanding + (0 if model in h.models else AFFINITY_REQUESTS),
+            )
+
+        with self._hosts_lock:
+            candidates = [h for h in self.hosts if h.healthy and h not in tried]
+            if not candidates:
+                return None
+            host = min(candidates, key=load)
+            host.outstanding += 1
+            host.models.add(model)
+            return host
+
+    def _release(self, host: _Host) -> None:
+        with self._hosts_lock:
+            host.outstanding -= 1
+
+    @staticmethod
+    def _feedback(limiter, start: float, result=None, error=None) -> None:
+        """Release an adaptive slot, reporting the request's timing."""
+        if limiter is None:
+            return
+        if result is not None:
+            stats = result["stats"]
+            limiter.release(
+                tokens=stats.get("eval_count") or 0,
+                wall_s=perf_counter() - start,
+                server_s=(stats.get("total_duration") or 0) / 1e9,
+            )
+        else:
+            overloaded = isinstance(error, FAILOVER_ERRORS) or (
+                isinstance(error, ollama.ResponseError)
+                and error.status_code == OVERLOADED_STATUS
+            )
+            limiter.release(overloaded=overloaded)
+
+    def _on_host(
+        self, model: str, call, *, limited: bool = False, used: list | None = None
+    ):
+        """
+        Run ``call(host)`` on the best host, failing over to the others.
+
+        With ``limited``, ``call`` returns a result dict and waits for an
+        adaptive slot on the host first. Hosts already in ``used`` are
+        skipped, and each host tried is added to it.
+        """
+        for host in self._due_for_recheck():
+            self._check(host)
+
+        tried: list[_Host] = list(used or ())
+        error: Exception | None = None
+        while (host := self._acquire(model, tried)) is not None:
+            if used is not None:
+                used.append(host)
+            limiter = self._limiter(host, model) if limited else None
+            try:
+                if limiter is not None:
+                    limiter.acquire()
+                start = perf_counter()
+                try:
+                    result = call(host)
+                except BaseException as e:
+                    self._feedback(limiter, start, error=e)
+                    raise
+                self._feedback(limiter, start, result)
+                return result
+            except FAILOVER_ERRORS as e:
+                self._mark_down(host, e)
+                tried.append(host)
+                error = e
+            finally:
+                self._release(host)
+        raise error or ConnectionError("No Ollama host is responding")
+
+    async def _aon_host(
+        self, model: str, call, *, limited: bool = False, used: list | None = None
+    ):
+        """Asyncio counterpart of _on_host, ``call`` returning an awaitable."""
+        due = self._due_for_recheck()
+        if due:
+            await asyncio.gather(*(asyncio.to_thread(self._check, h) for h in due))
+
+        tried: list[_Host] = list(used or ())
+        error: Exception | None = None
+        while (host := self._acquire(model, tried)) is not None:
+            if used is not None:
+                used.append(host)
+            limiter = self._limiter(host, model) if limited else None
+            try:
+                if limiter is not None:
+                    await limiter.aacquire()
+                start = perf_counter()
+                try:
+                    result = await call(host)
+                except BaseException as e:
+                    self._feedback(limiter, start, error=e)
+                    raise
+                self._feedback(limiter, start, result)
+                return result
+            except FAILOVER_ERRORS as e:
+                self._mark_down(host, e)
+                tried.append(host)
+                error = e
+            finally:
+                self._release(host)
+        raise error or ConnectionError("No Ollama host is responding")
+
+    # -------------------------
+    # Models
+    # -------------------------
     def ensure_model(self, model: str) -> None:
-        available = [m.model for m in self.client.list().models]
-        if model not in available:
-            self.client.pull(model)
+        """Health-check every host and pull ``model`` where it is missing."""
+        error = None
+        for host in self.hosts:
+            try:
+                available = host.list_models()
+                if model not in available:
+                    host.client.pull(model)
+            except FAILOVER_ERRORS as e:
+                self._mark_down(host, e)
+                error = e
+                continue
+            with self._hosts_lock:
+                host.healthy = True
+
+        if not any(h.healthy for h in self.hosts):
+            raise error
+
+    def _warm(self, model: str) -> dict:
+        # An empty prompt makes the server load the model and return
+        start = perf_counter()
+        response = self._on_host(
+            model,
+            lambda host: host.client.generate(
+                model=model, prompt="", keep_alive=self.keep_alive
+            ),
+        )
+        return {
+            "load_s": (response.get("load_duration") or 0) / 1e9,
+            "warm_s": perf_counter() - start,
+        }
+
+    def _prefetch(self, model: str) -> dict:
+        self.ensure_model(model)
+        return self._warm(model)
+
+    def prefetch_model(self, model: str) -> None:
+        """Pull (if needed) and load ``model`` on a background thread."""
+        with self._warming_lock:
+            if model not in self._warming:
+                self._warming[model] = self._prefetcher.submit(self._prefetch, model)
+
+    def warm_model(self, model: str) -> dict:
+        with self._warming_lock:
+            future = self._warming.pop(model, None)
+        if future is not None:
+            return future.result()
+        return self._warm(model)
+
+    def model_fingerprint(self, model: str) -> str:
+        digest = next((h.digests[model] for h in self.hosts if model in h.digests), None)
+        if digest is None:
+            for host in self.hosts:
+                try:
+                    host.list_models()
+                except FAILOVER_ERRORS:
+                    continue
+                digest = host.digests.get(model)
+                break
+        return f"{model}@{digest}" if digest else model
+
+    # -------------------------
+    # Generation
+    # -------------------------
+    @staticmethod
+    def _merge_options(options: dict | None, temperature: float | None):
+        opts = options.copy() if options else {}
+        if temperature is not None:
+            opts["temperature"] = temperature
+        return opts or None
+
+    def stream_prompt(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        system: str | None = None,
+        temperature: float | None = None,
+        options: dict | None = None,
+    ):
+        # Fails over only until the first chunk; after that the partial
+        # response is already with the caller
+        def start(host):
+            chunks = host.client.generate(
+                model=model,
+                prompt=prompt,
+                system=system,
+                options=self._merge_options(options, temperature),
+                stream=True,
+                keep_alive=self.keep_alive,
+            )
+            return host, chunks, next(chunks, None)
+
+        host, chunks, first = self._on_host(model, start)
+        if first is None:
+            return
+        with self._hosts_lock:
+            host.outstanding += 1
+        try:
+            yield first
+            yield from chunks
+        finally:
+            self._release(host)
 
     def run_prompt(
         self,
@@ -22,32 +486,289 @@ class OllamaBackend(LLMBackend):
         options: dict | None,
         stream: bool,
     ):
-        opts = options.copy() if options else {}
-        if temperature is not None:
-            opts["temperature"] = temperature
+        def generate(host, cancel, read_timeout):
+            if cancel is not None and cancel.is_set():
+                # Decided while this attempt waited for a slot
+                raise _Abandoned
+            start = perf_counter()
+            # Attempts that may be abandoned are streamed, so that a losing
+            # one stops at its next chunk and gives its slots back rather
+            # than generating to the end; one stalled before its first
+            # chunk gives up after ``read_timeout``.
+            client = host.client_for(read_timeout)
+            if stream or cancel is not None:
+                response = client.generate(
+                    model=model,
+                    prompt=prompt,
+                    system=system,
+                    options=self._merge_options(options, temperature),
+                    stream=True,
+                    keep_alive=self.keep_alive,
+                )
+                chunks, stats = [], {}
+                try:
+                    for chunk in response:
+                        if cancel is not None and cancel.is_set():
+                            raise _Abandoned
+                        chunks.append(chunk.get("response", ""))
+                        stats = chunk
+                finally:
+                    response.close()
+                text = "".join(chunks)
+            else:
+                response = client.generate(
+                    model=model,
+                    prompt=prompt,
+                    system=system,
+                    options=self._merge_options(options, temperature),
+                    stream=False,
+                    keep_alive=self.keep_alive,
+                )
+                text = response.get("response", "")
+                stats = response
 
-        start = perf_counter()
+            return {
+                "text": text,
+                "stats": stats,
+                "wall_time_s": perf_counter() - start,
+                "host": host.url,
+            }
 
-        response = self.client.generate(
-            model=model,
-            prompt=prompt,
-            system=system,
-            options=opts or None,
-            stream=stream,
+        def attempt(cancel, read_timeout, used):
+            def call(host):
+                try:
+                    return generate(host, cancel, read_timeout)
+                except httpx.TimeoutException as e:
+                    if read_timeout is None:
+                        raise
+                    # The request outlived its deadline; not a host failure
+                    raise DeadlineExceeded(
+                        f"No response from '{model}' within {read_timeout:.1f} s"
+                    ) from e
+
+            return self._on_host(model, call, limited=True, used=used)
+
+        return self._resilient(
+            model, self.policy.prompt_tokens(prompt, system), attempt
         )
 
-        if stream:
-            chunks, stats = [], {}
-            for chunk in response:
-                chunks.append(chunk.get("response", ""))
-                stats = chunk
-            text = "".join(chunks)
-        else:
-            text = response.get("response", "")
-            stats = response
+    async def arun_prompt(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        system: str | None,
+        temperature: float | None,
+        options: dict | None,
+        stream: bool,
+    ):
+        async def generate(host):
+            start = perf_counter()
+            response = await host.async_client.generate(
+                model=model,
+                prompt=prompt,
+                system=system,
+                options=self._merge_options(options, temperature),
+                stream=stream,
+                keep_alive=self.keep_alive,
+            )
 
-        return {
-            "text": text,
-            "stats": stats,
-            "wall_time_s": perf_counter() - start,
+            if stream:
+                chunks, stats = [], {}
+                async for chunk in response:
+                    chunks.append(chunk.get("response", ""))
+                    stats = chunk
+                text = "".join(chunks)
+            else:
+                text = response.get("response", "")
+                stats = response
+
+            return {
+                "text": text,
+                "stats": stats,
+                "wall_time_s": perf_counter() - start,
+                "host": host.url,
+            }
+
+        def attempt(used):
+            return self._aon_host(model, generate, limited=True, used=used)
+
+        return await self._aresilient(
+            model, self.policy.prompt_tokens(prompt, system), attempt
+        )
+
+    # -------------------------
+    # Deadlines, hedging and retries
+    # -------------------------
+    def _retryable(self, error: BaseException) -> bool:
+        return isinstance(error, FAILOVER_ERRORS + (DeadlineExceeded,)) or (
+            isinstance(error, ollama.ResponseError) and error.status_code >= 500
+        )
+
+    def _finish(self, model, prompt_tokens, result, start, attempt, hedged, retries):
+        """Learn from the winning attempt and record it in the stats."""
+        self.policy.observe(model, prompt_tokens, result["wall_time_s"])
+        result["stats"] = {
+            **plain_stats(result["stats"]),
+            "attempt": attempt,
+            "hedged": hedged,
+            "retries": retries,
         }
+        # Latency includes time lost on failed and abandoned attempts
+        result["wall_time_s"] = perf_counter() - start
+        return result
+
+    def _retry_delay(self, model: str, retry: int, error: BaseException) -> float:
+        if retry >= self.policy.max_retries or not self._retryable(error):
+            raise error
+        delay = self.policy.backoff(retry)
+        logger.warning(
+            "Request to '%s' failed (%s); retry %d of %d in %.1f s",
+            model,
+            str(error) or type(error).__name__,
+            retry + 1,
+            self.policy.max_retries,
+            delay,
+        )
+        return delay
+
+    def _spare_host(self, used: list[_Host]) -> bool:
+        with self._hosts_lock:
+            return any(h.healthy and h not in used for h in self.hosts)
+
+    def _hedged(self, model: str, prompt_tokens: int, attempt, numbers):
+        """
+        Run ``attempt(cancel, read_timeout, used)``, duplicated on another
+        host once past the hedge time.
+
+        Returns ``(result, attempt number, hedged)`` of the first attempt to
+        succeed; raises DeadlineExceeded once the deadline passes. Attempts
+        are given the deadline as their read timeout, so that one left
+        behind does not wait on a stalled server indefinitely.
+        """
+        hedge_after = self.policy.hedge_after(model, prompt_tokens)
+        deadline = self.policy.deadline(model, prompt_tokens)
+        if hedge_after is None and deadline is None:
+            return attempt(None, None, None), next(numbers), False
+
+        # Make the clients before the clock starts, so the first attempt is
+        # not hedged for the time that takes
+        for host in self.hosts:
+            host.client_for(deadline)
+        cancel = threading.Event()
+        used: list[_Host] = []
+        pending = {_in_background(attempt, cancel, deadline, used): next(numbers)}
+        hedged = False
+        start = perf_counter()
+        try:
+            while pending:
+                timeout = next_wakeup(
+                    perf_counter() - start, None if hedged else hedge_after, deadline
+                )
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    number = pending.pop(future)
+                    if future.exception() is None:
+                        return future.result(), number, hedged
+                    if not pending:
+                        raise future.exception()
+
+                elapsed = perf_counter() - start
+                if deadline is not None and elapsed >= deadline:
+                    raise DeadlineExceeded(
+                        f"No response from '{model}' within {deadline:.1f} s"
+                    )
+                if not hedged and hedge_after is not None and elapsed >= hedge_after:
+                    if not self._spare_host(used):
+                        # A duplicate on the same server only adds to its load
+                        hedge_after = None
+                        continue
+                    logger.info("Hedging request to '%s' after %.1f s", model, elapsed)
+                    pending[_in_background(attempt, cancel, deadline, used)] = next(
+                        numbers
+                    )
+                    hedged = True
+        finally:
+            cancel.set()
+
+    def _resilient(self, model: str, prompt_tokens: int, attempt) -> dict:
+        start = perf_counter()
+        numbers = count(1)
+        retry = 0
+        while True:
+            try:
+                result, number, hedged = self._hedged(
+                    model, prompt_tokens, attempt, numbers
+                )
+            except Exception as e:
+                sleep(self._retry_delay(model, retry, e))
+                retry += 1
+                continue
+            return self._finish(
+                model, prompt_tokens, result, start, number, hedged, retry
+            )
+
+    async def _ahedged(self, model: str, prompt_tokens: int, attempt, numbers):
+        """Asyncio counterpart of _hedged; losing attempts are cancelled."""
+        hedge_after = self.policy.hedge_after(model, prompt_tokens)
+        deadline = self.policy.deadline(model, prompt_tokens)
+        if hedge_after is None and deadline is None:
+            return await attempt(None), next(numbers), False
+
+        used: list[_Host] = []
+        pending = {asyncio.ensure_future(attempt(used)): next(numbers)}
+        hedged = False
+        start = perf_counter()
+        try:
+            while pending:
+                timeout = next_wakeup(
+                    perf_counter() - start, None if hedged else hedge_after, deadline
+                )
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    number = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result(), number, hedged
+                    if not pending:
+                        raise task.exception()
+
+                elapsed = perf_counter() - start
+                if deadline is not None and elapsed >= deadline:
+                    raise DeadlineExceeded(
+                        f"No response from '{model}' within {deadline:.1f} s"
+                    )
+                if not hedged and hedge_after is not None and elapsed >= hedge_after:
+                    if not self._spare_host(used):
+                        hedge_after = None
+                        continue
+                    logger.info("Hedging request to '%s' after %.1f s", model, elapsed)
+                    pending[asyncio.ensure_future(attempt(used))] = next(numbers)
+                    hedged = True
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _aresilient(self, model: str, prompt_tokens: int, attempt) -> dict:
+        start = perf_counter()
+        numbers = count(1)
+        retry = 0
+        while True:
+            try:
+                result, number, hedged = await self._ahedged(
+                    model, prompt_tokens, attempt, numbers
+                )
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(model, retry, e))
+                retry += 1
+                continue
+            return self._finish(
+                model, prompt_tokens, result, start, number, hedged, retry
+            )
+
+    async def aclose(self) -> None:
+        for host in self.hosts:
+            if host._async_client is not None:
+                await host._async_client.close()
+                host._async_client = None
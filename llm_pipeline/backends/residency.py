@@ -0,0 +1,159 @@
+import gc
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+GB = 1024**3
+
+
+class ModelResidency:
+    """
+    LRU cache of loaded models bounded by a memory budget.
+
+    ``loader(name)`` builds the resident object, ``footprint(obj)`` reports
+    its size in bytes once loaded and ``estimate(name)`` guesses that size
+    beforehand so room can be made before the load starts. Models are
+    evicted least-recently-used first; the model being returned is never
+    evicted, even if it alone exceeds the budget.
+
+    ``prefetch(name)`` loads a model on a background thread when it fits
+    next to what is already resident, so the next model's weights can be
+    read while the current one generates.
+    """
+
+    def __init__(
+        self,
+        *,
+        loader: Callable[[str], Any],
+        footprint: Callable[[Any], int],
+        estimate: Callable[[str], int] | None = None,
+        budget_bytes: int | None = None,
+        on_evict: Callable[[], None] | None = None,
+    ):
+        self.loader = loader
+        self.footprint = footprint
+        self.estimate = estimate or (lambda name: 0)
+        self.budget_bytes = budget_bytes
+        self.on_evict = on_evict
+
+        self._resident: "OrderedDict[str, tuple[Any, int]]" = OrderedDict()
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.RLock()
+        self._prefetcher = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="model-prefetch"
+        )
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(size for _, size in self._resident.values())
+
+    def _over_budget(self, extra: int = 0) -> bool:
+        return (
+            self.budget_bytes is not None
+            and self.resident_bytes + extra > self.budget_bytes
+        )
+
+    def _evict_for(self, extra: int, keep: str | None = None) -> None:
+        evicted = False
+        for name in list(self._resident):
+            if not self._over_budget(extra):
+                break
+            if name == keep:
+                continue
+            _, size = self._resident.pop(name)
+            evicted = True
+            logger.info(
+                "Evicted model '%s' (%.1f GB) to stay within %.1f GB budget",
+                name,
+                size / GB,
+                self.budget_bytes / GB,
+            )
+
+        if evicted:
+            gc.collect()
+            if self.on_evict is not None:
+                self.on_evict()
+
+    def _load(self, name: str, future: Future) -> Any:
+        """Load ``name`` and resolve ``future``; the caller owns the load."""
+        try:
+            with self._lock:
+                self._evict_for(self.estimate(name))
+
+            obj = self.loader(name)
+            size = self.footprint(obj)
+        except BaseException as e:
+            with self._lock:
+                self._pending.pop(name, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._resident[name] = (obj, size)
+            self._pending.pop(name, None)
+            logger.info(
+                "Loaded model '%s' (%.1f GB, %.1f GB resident)",
+                name,
+                size / GB,
+                self.resident_bytes / GB,
+            )
+            self._evict_for(0, keep=name)
+
+        future.set_result(obj)
+        return obj
+
+    def get(self, name: str) -> Any:
+        """Return the loaded model, loading (or awaiting a prefetch) once."""
+        with self._lock:
+            if name in self._resident:
+                self._resident.move_to_end(name)
+                return self._resident[name][0]
+
+            pending = self._pending.get(name)
+            if pending is None:
+                future = self._pending[name] = Future()
+
+        if pending is not None:
+            logger.info("Waiting for load of model '%s'", name)
+            return pending.result()
+
+        return self._load(name, future)
+
+    def prefetch(self, name: str) -> bool:
+        """Start loading ``name`` in the background if it fits the budget."""
+        with self._lock:
+            if name in self._resident or name in self._pending:
+                return True
+
+            # Loads already queued will be resident before this one
+            queued = sum(self.estimate(n) for n in self._pending)
+            if self._over_budget(queued + self.estimate(name)):
+                logger.info(
+                    "Not prefetching model '%s': it does not fit next to the "
+                    "resident models",
+                    name,
+                )
+                return False
+
+            logger.info("Prefetching model '%s' in the background", name)
+            future = self._pending[name] = Future()
+
+        def load():
+            try:
+                self._load(name, future)
+            except Exception as e:
+                logger.warning("Prefetch of model '%s' failed: %s", name, e)
+
+        self._prefetcher.submit(load)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._resident.clear()
+        gc.collect()
+        if self.on_evict is not None:
+            self.on_evict()
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict
+
+from .output import to_jsonable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+# Eviction frees space down to this share of max_bytes, so the directory
+# is scanned once per that much new data rather than on every put
+EVICT_TO_FRACTION = 0.9
+
+
+def cache_key(
+    *,
+    backend: str,
+    model: str,
+    prompt: str,
+    system: str | None,
+    temperature: float | None,
+    options: dict | None,
+) -> str:
+    """
+    Content hash identifying one generation request.
+
+    Temperature is folded into the options the same way the backends do, so
+    ``temperature = 0.2`` and ``options.temperature = 0.2`` share a key.
+    """
+    opts = dict(options or {})
+    if temperature is not None:
+        opts["temperature"] = temperature
+
+    payload = json.dumps(
+        {
+            "backend": backend,
+            "model": model,
+            "prompt": prompt,
+            "system": system,
+            "options": opts,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk cache of backend results, one JSON file per key.
+
+    Entries are evicted least-recently-used first (by file mtime, which is
+    refreshed on every hit) once the cache grows beyond ``max_bytes``, down
+    to EVICT_TO_FRACTION of it.
+    ``refresh=True`` ignores existing entries but still stores new results.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        refresh: bool = False,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._size = sum(p.stat().st_size for p in self._entries())
+
+    def _entries(self):
+        return self.directory.glob("*/*.json")
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        path = self._path(key)
+
+        if self.refresh or not path.exists():
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            result = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable cache entry %s: %s", path, e)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+
+        result["stats"]["cached"] = True
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data = json.dumps(result, ensure_ascii=False, default=to_jsonable)
+            tmp.write_text(data, encoding="utf-8")
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Could not cache result %s: %s", key, e)
+            tmp.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+            self._size += path.stat().st_size - old_size
+
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for p in self._entries():
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+
+        entries.sort()
+        evicted = 0
+        target = self.max_bytes * EVICT_TO_FRACTION
+
+        for _, size, p in entries:
+            if self._size <= target:
+                break
+            p.unlink(missing_ok=True)
+            self._size -= size
+            evicted += 1
+
+        logger.info(
+            "Evicted %d cache entries (%.1f MB in use)",
+            evicted,
+            self._size / 1_000_000,
+        )
+
+    def log_stats(self, log=logger) -> None:
+        total = self.hits + self.misses
+        log.info(
+            "Response cache: %d hit(s), %d miss(es) (%.0f%% hit rate), %s",
+            self.hits,
+            self.misses,
+            100 * self.hits / total if total else 0,
+            self.directory,
+        )
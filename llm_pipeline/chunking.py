@@ -0,0 +1,130 @@
+"""
+Token-budgeted splitting of long documents for map-reduce prompting.
+
+Text is split on paragraph boundaries and paragraphs are packed greedily
+into chunks of at most ``max_tokens``. A paragraph that alone exceeds the
+budget is split on sentences, a sentence that does on words (and a word
+that does into slices), so no chunk is ever over budget. EDGAR text is
+often whitespace-normalized into one line, in which case sentences are
+the natural unit.
+"""
+
+import math
+import re
+from typing import Callable, Iterator, List
+
+# English text averages about four characters per token across the
+# tokenizers of the models we run; used when no tokenizer is at hand
+CHARS_PER_TOKEN = 4
+
+# Context Ollama gives a model unless num_ctx is set
+DEFAULT_NUM_CTX = 2048
+# Room kept for the response when num_predict/max_new_tokens is unset
+DEFAULT_RESPONSE_TOKENS = 512
+MIN_CHUNK_TOKENS = 128
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def chunk_budget(options: dict | None, overhead_tokens: int = 0) -> int:
+    """
+    Largest chunk that leaves room for the prompt template, system prompt
+    (``overhead_tokens``) and the response within the context window.
+    """
+    options = options or {}
+    num_ctx = options.get("num_ctx") or DEFAULT_NUM_CTX
+    response = (
+        options.get("num_predict")
+        or options.get("max_new_tokens")
+        or DEFAULT_RESPONSE_TOKENS
+    )
+    if response < 0:
+        response = DEFAULT_RESPONSE_TOKENS
+    return max(num_ctx - response - overhead_tokens, MIN_CHUNK_TOKENS)
+
+
+def _split_long_words(
+    words: List[str], max_tokens: int, count: Callable[[str], int]
+) -> Iterator[str]:
+    for word in words:
+        tokens = count(word)
+        if tokens <= max_tokens:
+            yield word
+            continue
+        # e.g. an embedded table flattened without spaces
+        step = max(len(word) * max_tokens // (2 * tokens), 1)
+        for i in range(0, len(word), step):
+            yield word[i:i + step]
+
+
+def _pieces(
+    text: str, max_tokens: int, count: Callable[[str], int]
+) -> Iterator[tuple[int, str]]:
+    """``(paragraph number, text)`` of paragraphs, split further if over budget."""
+    for number, paragraph in enumerate(_PARAGRAPH.split(text)):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count(paragraph) <= max_tokens:
+            yield number, paragraph
+            continue
+
+        for sentence in _SENTENCE.split(paragraph):
+            if count(sentence) <= max_tokens:
+                yield number, sentence
+                continue
+            # Run-on text without sentence breaks: pack words, counting
+            # each on its own (an upper bound on the joined count)
+            words: List[str] = []
+            used = 0
+            for word in _split_long_words(sentence.split(), max_tokens, count):
+                tokens = count(word) + (1 if words else 0)
+                if words and used + tokens > max_tokens:
+                    yield number, " ".join(words)
+                    words, used = [], 0
+                    tokens -= 1
+                words.append(word)
+                used += tokens
+            if words:
+                yield number, " ".join(words)
+
+
+def split_into_chunks(
+    text: str,
+    max_tokens: int,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> List[str]:
+    """
+    Split ``text`` into chunks of at most ``max_tokens`` tokens.
+
+    Within a chunk, pieces of one paragraph are joined by a space and
+    paragraphs by a blank line, so the document's structure is kept.
+    """
+    chunks: List[str] = []
+    current = ""
+    current_tokens = 0
+    current_paragraph = None
+
+    for paragraph, piece in _pieces(text, max_tokens, count_tokens):
+        tokens = count_tokens(piece)
+        # +1 for the separator joining it to the previous piece
+        if current and current_tokens + 1 + tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = "", 0
+
+        if current:
+            current += " " if paragraph == current_paragraph else "\n\n"
+            current_tokens += 1
+        current += piece
+        current_tokens += tokens
+        current_paragraph = paragraph
+
+    if current:
+        chunks.append(current)
+
+    return chunks
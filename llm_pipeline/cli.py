@@ -1,11 +1,16 @@
 import argparse
-import sys
+import asyncio
 import logging
+import sys
 from pathlib import Path
 
+from .backends import available_backends, get_backend
+from .cache import DEFAULT_MAX_BYTES, ResponseCache
 from .config import load_config
-from .runner import run_model_prompts
-from .backends import get_backend
+from .manifest import MANIFEST_NAME, RunManifest
+from .metrics import RunMetrics
+from .output import OUTPUT_FORMATS, make_sink
+from .scheduler import ModelScheduler
 
 
 def setup_logger():
@@ -32,14 +37,15 @@ def main():
 
     parser.add_argument(
         "--backend",
-        choices=["ollama", "huggingface"],
-        help="Override LLM backend (ollama or huggingface)",
+        choices=available_backends(),
+        help="Override LLM backend (%(choices)s)",
     )
 
     parser.add_argument(
         "--server-url",
-        default="http://localhost:11434",
-        help="Ollama server URL (ollama backend only)",
+        nargs="+",
+        help="Ollama server URL(s); requests are balanced across several "
+        "(ollama backend only, default: http://localhost:11434)",
     )
 
     parser.add_argument(
@@ -49,12 +55,77 @@ def main():
         help="Output directory",
     )
 
+    parser.add_argument(
+        "--output-format",
+        choices=sorted(OUTPUT_FORMATS),
+        help="Result format: one .txt per prompt (default), or one "
+        "jsonl/parquet file per backend/model",
+    )
+
     parser.add_argument(
         "--stream",
         action="store_true",
         help="Force streaming mode",
     )
 
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Number of prompts to run in parallel per model (default: 1)",
+    )
+
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action="store_true",
+        help="Adjust requests in flight per model and host to the observed "
+        "throughput and queueing delay, up to --concurrency (ollama backend only)",
+    )
+
+    parser.add_argument(
+        "--parallel-models",
+        type=int,
+        help="Number of models to run at once; memory is not checked, so the "
+        "server must have room to keep that many loaded (default: 1)",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        help="Prompts per generate() call (huggingface backend only)",
+    )
+
+    parser.add_argument(
+        "--async",
+        dest="async_mode",
+        action="store_true",
+        help="Dispatch prompts from a single asyncio event loop",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the on-disk response cache",
+    )
+
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached responses but store fresh ones",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="Response cache directory (default: <output-dir>/.cache)",
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip prompts already completed with identical inputs "
+        "(tracked in <output-dir>/manifest.jsonl)",
+    )
+
     parser.add_argument(
         "--filter-model",
         type=str,
@@ -84,10 +155,55 @@ def main():
         or "ollama"
     )
 
+    ollama_cfg = config.get("ollama", {})
+    hf_cfg = config.get("huggingface", {})
+
     try:
         backend = get_backend(
             backend_name,
-            host=args.server_url,
+            host=(
+                args.server_url
+                or ollama_cfg.get("hosts")
+                or "http://localhost:11434"
+            ),
+            max_connections=ollama_cfg.get("max_connections"),
+            max_keepalive_connections=ollama_cfg.get("max_keepalive_connections"),
+            timeout=ollama_cfg.get("timeout"),
+            keep_alive=ollama_cfg.get("keep_alive"),
+            adaptive_concurrency=(
+                args.adaptive_concurrency
+                or ollama_cfg.get("adaptive_concurrency", False)
+            ),
+            **{
+                k: ollama_cfg[k]
+                for k in (
+                    "hedge_percentile",
+                    "deadline_factor",
+                    "min_deadline_s",
+                    "max_retries",
+                    "retry_backoff_s",
+                )
+                if k in ollama_cfg
+            },
+            batch_size=args.batch_size or hf_cfg.get("batch_size"),
+            max_memory_gb=hf_cfg.get("max_memory_gb"),
+            assistant_models=_assistant_models(config.get("models", [])),
+            **{
+                k: hf_cfg[k]
+                for k in (
+                    "device",
+                    "dtype",
+                    "profile",
+                    "quantize",
+                    "compile",
+                    "attn_implementation",
+                    "cache_implementation",
+                    "num_threads",
+                    "num_interop_threads",
+                    "cpu_affinity",
+                )
+                if k in hf_cfg
+            },
         )
         logger.info("Using backend: %s", backend_name)
     except Exception as e:
@@ -99,9 +215,70 @@ def main():
     # -------------------------
     stream_mode = (
         args.stream
-        or config.get("ollama", {}).get("stream", False)
+        or ollama_cfg.get("stream", False)
+    )
+
+    async_mode = (
+        args.async_mode
+        or config.get("llm", {}).get("async", False)
+    )
+
+    # [huggingface] prefetch is the older name of [llm] prewarm
+    prewarm = config.get("llm", {}).get("prewarm", hf_cfg.get("prefetch", True))
+
+    parallel_models = (
+        args.parallel_models
+        or config.get("llm", {}).get("parallel_models")
+        or 1
     )
 
+    concurrency = (
+        args.concurrency
+        or config.get("llm", {}).get("concurrency")
+        or 1
+    )
+    if concurrency < 1:
+        logger.error("Concurrency must be at least 1 (got %s)", concurrency)
+        sys.exit(1)
+    if parallel_models < 1:
+        logger.error("parallel_models must be at least 1 (got %s)", parallel_models)
+        sys.exit(1)
+
+    cache_cfg = config.get("cache", {})
+    cache = None
+    if not args.no_cache and cache_cfg.get("enabled", True):
+        max_size_mb = cache_cfg.get("max_size_mb")
+        cache = ResponseCache(
+            args.cache_dir
+            or Path(cache_cfg.get("dir", args.output_dir / ".cache")),
+            max_bytes=(
+                int(max_size_mb * 1_000_000) if max_size_mb else DEFAULT_MAX_BYTES
+            ),
+            refresh=args.refresh,
+        )
+        logger.info("Using response cache: %s", cache.directory)
+
+    output_cfg = config.get("output", {})
+    output_format = args.output_format or output_cfg.get("format", "txt")
+    try:
+        sink = make_sink(
+            output_format,
+            args.output_dir,
+            **{
+                k: output_cfg[k]
+                for k in ("flush_every", "flush_interval_s")
+                if k in output_cfg
+            },
+        )
+    except (ImportError, ValueError) as e:
+        logger.error("Failed to initialize output format '%s': %s", output_format, e)
+        sys.exit(1)
+
+    manifest = RunManifest(args.output_dir / MANIFEST_NAME, resume=args.resume)
+
+    metrics_cfg = config.get("metrics", {})
+    metrics = RunMetrics()
+
     prompt_registry = config.get("prompts", {})
     models = config.get("models", [])
 
@@ -112,20 +289,89 @@ def main():
     # -------------------------
     # Run models
     # -------------------------
+    selected = [
+        model_cfg
+        for model_cfg in models
+        if not args.filter_model or args.filter_model in model_cfg["name"]
+    ]
+    run_kwargs = dict(
+        backend=backend,
+        prompt_registry=prompt_registry,
+        stream=stream_mode,
+        output_dir=args.output_dir,
+        backend_name=backend_name,
+        filter_prompt=args.filter_prompt,
+        concurrency=concurrency,
+        cache=cache,
+        manifest=manifest,
+        sink=sink,
+        metrics=metrics,
+        logger=logger,
+    )
+
+    scheduler = ModelScheduler(
+        selected,
+        backend=backend,
+        backend_name=backend_name,
+        prewarm=prewarm,
+        parallel_models=parallel_models,
+        metrics=metrics,
+        logger=logger,
+    )
+
+    try:
+        if async_mode:
+            asyncio.run(_run_async(scheduler, backend, run_kwargs))
+        else:
+            scheduler.run(run_kwargs)
+    finally:
+        # Flush buffered results before the manifest marks them complete
+        sink.close()
+        manifest.close()
+        # Written even for interrupted runs, covering what did complete
+        _write_metrics(metrics, metrics_cfg, args.output_dir, logger)
+
+    if cache is not None:
+        cache.log_stats(logger)
+
+
+def _write_metrics(metrics: RunMetrics, metrics_cfg: dict, output_dir: Path, logger):
+    """Log per-model percentiles and write the JSON and Prometheus reports."""
+    metrics.log_summary(logger)
+
+    for key, default, write in (
+        ("summary_file", "metrics.json", metrics.write_json),
+        ("prometheus_file", "metrics.prom", metrics.write_prometheus),
+    ):
+        path = Path(metrics_cfg.get(key, output_dir / default))
+        try:
+            write(path)
+            logger.info("Wrote run metrics: %s", path)
+        except OSError as e:
+            logger.warning("Could not write run metrics %s: %s", path, e)
+
+
+def _assistant_models(models: list[dict]) -> dict[str, str]:
+    """Draft model of each model whose [[models]] entries set assistant_model."""
+    assistants: dict[str, str] = {}
     for model_cfg in models:
-        if args.filter_model and args.filter_model not in model_cfg["name"]:
+        assistant = model_cfg.get("assistant_model")
+        if assistant is None:
             continue
+        name = model_cfg["name"]
+        if assistants.setdefault(name, assistant) != assistant:
+            raise ValueError(
+                f"Conflicting assistant_model for '{name}': "
+                f"{assistants[name]} and {assistant}"
+            )
+    return assistants
 
-        run_model_prompts(
-            backend=backend,
-            model_cfg=model_cfg,
-            prompt_registry=prompt_registry,
-            stream=stream_mode,
-            output_dir=args.output_dir,
-            backend_name=backend_name,
-            filter_prompt=args.filter_prompt,
-            logger=logger,
-        )
+
+async def _run_async(scheduler: ModelScheduler, backend, run_kwargs: dict):
+    try:
+        await scheduler.arun(run_kwargs)
+    finally:
+        await backend.aclose()
 
 
 if __name__ == "__main__":
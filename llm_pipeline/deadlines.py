@@ -0,0 +1,99 @@
+"""
+Latency-derived hedging deadlines and retry backoff.
+
+RequestPolicy learns the latency distribution of each model, separately
+for prompts of similar length (power-of-two token buckets). Once a bucket
+has MIN_SAMPLES observations it sets two times for new requests:
+
+- hedge_after: a request still running at the ``hedge_percentile``
+  latency gets a duplicate, and the first response wins.
+- deadline: ``deadline_factor`` times the p99 latency, after which every
+  attempt is abandoned and the request is retried.
+
+Retries wait a jittered exponential backoff ("full jitter": uniform
+between zero and the exponential step), so requests that failed together
+do not come back together.
+"""
+
+import random
+import threading
+from typing import Dict
+
+from .chunking import estimate_tokens
+from .metrics import Histogram
+
+# Observations needed before a bucket's percentiles are trusted
+MIN_SAMPLES = 20
+DEADLINE_PERCENTILE = 0.99
+
+
+class DeadlineExceeded(TimeoutError):
+    """No attempt of a request answered before its deadline."""
+
+
+def _bucket(prompt_tokens: int) -> int:
+    return max(prompt_tokens, 1).bit_length()
+
+
+class RequestPolicy:
+    def __init__(
+        self,
+        *,
+        hedge_percentile: float | None = None,
+        deadline_factor: float | None = None,
+        min_deadline_s: float = 10.0,
+        max_retries: int = 2,
+        retry_backoff_s: float = 1.0,
+        max_backoff_s: float = 60.0,
+    ):
+        self.hedge_quantile = hedge_percentile / 100 if hedge_percentile else None
+        self.deadline_factor = deadline_factor or None
+        self.min_deadline_s = min_deadline_s
+        self.max_retries = max(max_retries, 0)
+        self.retry_backoff_s = retry_backoff_s
+        self.max_backoff_s = max_backoff_s
+
+        self._latency: Dict[tuple[str, int | None], Histogram] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def prompt_tokens(prompt: str, system: str | None = None) -> int:
+        return estimate_tokens(prompt) + estimate_tokens(system or "")
+
+    def observe(self, model: str, prompt_tokens: int, seconds: float) -> None:
+        with self._lock:
+            for key in ((model, _bucket(prompt_tokens)), (model, None)):
+                self._latency.setdefault(key, Histogram()).observe(seconds)
+
+    def _quantile(self, model: str, prompt_tokens: int, q: float) -> float | None:
+        """``q`` latency of the prompt's bucket, else of all the model's prompts."""
+        with self._lock:
+            for key in ((model, _bucket(prompt_tokens)), (model, None)):
+                histogram = self._latency.get(key)
+                if histogram is not None and histogram.count >= MIN_SAMPLES:
+                    return histogram.quantile(q)
+        return None
+
+    def hedge_after(self, model: str, prompt_tokens: int) -> float | None:
+        if self.hedge_quantile is None:
+            return None
+        return self._quantile(model, prompt_tokens, self.hedge_quantile)
+
+    def deadline(self, model: str, prompt_tokens: int) -> float | None:
+        if self.deadline_factor is None:
+            return None
+        p99 = self._quantile(model, prompt_tokens, DEADLINE_PERCENTILE)
+        if p99 is None:
+            return None
+        return max(self.deadline_factor * p99, self.min_deadline_s)
+
+    def backoff(self, retry: int) -> float:
+        """Seconds to wait before retry number ``retry`` (0-based)."""
+        cap = min(self.retry_backoff_s * 2**retry, self.max_backoff_s)
+        return random.uniform(0, cap)
+
+
+def next_wakeup(elapsed: float, *times: float | None) -> float | None:
+    """Seconds until the earliest of ``times`` still ahead, if any."""
+    ahead = [t - elapsed for t in times if t is not None and t > elapsed]
+    return min(ahead) if ahead else None
@@ -1,15 +1,25 @@
 import argparse
 import logging
+import logging.handlers
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
 from .extract import extract_mda_from_file
+from .submission import PRIMARY_TYPES
 
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
+    format="%(asctime)s | %(levelname)s | %(processName)s | %(message)s",
 )
 logger = logging.getLogger(__name__)
 
+EXTRACTED = "extracted"
+MISSING = "missing"
+FAILED = "failed"
+
 
 def write_toml(
     *,
@@ -23,6 +33,11 @@ def write_toml(
 prompt_file = "{mda_file.as_posix()}"
 system = "You are a financial analyst. Analyze the following MD&A section."
 
+# MD&A sections often exceed the context window: analyze them in chunks
+# and combine the partial analyses
+[prompts.{prompt_id}.long_document]
+map_prompt = "Part {{part}} of {{parts}} of the MD&A section:\\n\\n{{text}}"
+
 [[models]]
 name = "{model}"
 prompts = ["{prompt_id}"]
@@ -38,13 +53,14 @@ def process_file(
     *,
     emit_toml: Path | None,
     model: str,
-):
+    document_types: tuple[str, ...] = PRIMARY_TYPES,
+) -> str:
     logger.info("Parsing file: %s", input_file)
 
-    mda = extract_mda_from_file(input_file)
+    mda = extract_mda_from_file(input_file, document_types)
     if not mda:
         logger.warning("MD&A not found in %s", input_file)
-        return
+        return MISSING
 
     output_file.write_text(mda, encoding="utf-8")
     logger.info("MD&A written to: %s", output_file)
@@ -58,6 +74,163 @@ def process_file(
             prompt_id=prompt_id,
         )
 
+    return EXTRACTED
+
+
+def _init_worker(log_queue):
+    # Route worker log records through the parent so lines never interleave
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+
+
+def _process_one(
+    input_file: Path,
+    output_file: Path,
+    model: str,
+    document_types: tuple[str, ...],
+):
+    try:
+        status = process_file(
+            input_file,
+            output_file,
+            emit_toml=None,
+            model=model,
+            document_types=document_types,
+        )
+    except Exception as e:
+        logger.error("Failed to process %s: %s", input_file, e)
+        status = FAILED
+    return input_file, status
+
+
+def _parse_in_pool(
+    pending: deque,
+    record,
+    *,
+    workers: int,
+    log_queue,
+    model: str,
+    document_types: tuple[str, ...],
+) -> list:
+    """
+    Parse the filings in ``pending`` in a new process pool, at most
+    ``workers`` at a time, calling ``record`` as each one completes.
+
+    A worker that dies (e.g. killed for running out of memory) breaks the
+    pool: the filings in flight are then returned, and those not yet
+    started are left in ``pending``. Returns an empty list otherwise.
+    """
+    in_flight = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(log_queue,),
+    ) as pool:
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < workers:
+                    html_file, out_file = pending[0]
+                    future = pool.submit(
+                        _process_one, html_file, out_file, model, document_types
+                    )
+                    in_flight[future] = pending.popleft()
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    input_file = in_flight[future][0]
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        logger.error("Failed to process %s: %s", input_file, e)
+                        result = input_file, FAILED
+                    del in_flight[future]
+                    record(*result)
+        except BrokenProcessPool:
+            return list(in_flight.values())
+    return []
+
+
+def process_directory(
+    input_dir: Path,
+    output_dir: Path,
+    *,
+    model: str,
+    workers: int = 1,
+    document_types: tuple[str, ...] = PRIMARY_TYPES,
+) -> Counter:
+    """
+    Extract MD&A from every ``*.txt*`` filing in ``input_dir``.
+
+    With ``workers > 1`` filings are parsed in a process pool and results
+    are reported as they complete. If a worker dies, the filings it may
+    have been parsing are retried one at a time, the one that kills its
+    worker again counting as failed, and the rest go to a new pool.
+    Returns a count per status.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = [
+        (html_file, output_dir / f"{html_file.stem}_MD-and-A.txt")
+        for html_file in input_dir.glob("*.txt*")
+    ]
+
+    summary = Counter()
+    failed = []
+
+    def record(input_file, status):
+        summary[status] += 1
+        if status == FAILED:
+            failed.append(input_file)
+        done = sum(summary.values())
+        if workers > 1 and done % 100 == 0:
+            logger.info("Processed %d / %d filings", done, len(jobs))
+
+    try:
+        if workers <= 1:
+            for html_file, out_file in jobs:
+                record(*_process_one(html_file, out_file, model, document_types))
+        else:
+            log_queue = multiprocessing.Queue()
+            listener = logging.handlers.QueueListener(
+                log_queue, *logging.getLogger().handlers, respect_handler_level=True
+            )
+            listener.start()
+            parse = dict(log_queue=log_queue, model=model, document_types=document_types)
+
+            try:
+                pending = deque(jobs)
+                while pending:
+                    suspects = _parse_in_pool(pending, record, workers=workers, **parse)
+                    if suspects:
+                        logger.error(
+                            "A worker process died; retrying the %d filing(s) "
+                            "in flight one at a time",
+                            len(suspects),
+                        )
+                    for job in suspects:
+                        if _parse_in_pool(deque([job]), record, workers=1, **parse):
+                            logger.error(
+                                "Failed to process %s: the worker process died",
+                                job[0],
+                            )
+                            record(job[0], FAILED)
+            finally:
+                listener.stop()
+    finally:
+        logger.info(
+            "Summary: %d filing(s), %d extracted, %d missing MD&A, %d failed",
+            len(jobs),
+            summary[EXTRACTED],
+            summary[MISSING],
+            summary[FAILED],
+        )
+        for path in failed:
+            logger.info("  failed: %s", path)
+
+    return summary
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -76,6 +249,20 @@ def main():
         default="llama3",
         help="Ollama model name for generated TOML",
     )
+    parser.add_argument(
+        "--document-types",
+        nargs="+",
+        default=list(PRIMARY_TYPES),
+        metavar="TYPE",
+        help="Submission <TYPE>s to parse, e.g. 10-K EX-13 (a trailing * "
+        "matches a prefix, e.g. EX-*). Default: %(default)s",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to parse filings (directory mode)",
+    )
 
     args = parser.parse_args()
 
@@ -88,19 +275,18 @@ def main():
             output_path,
             emit_toml=args.emit_toml,
             model=args.model,
+            document_types=tuple(args.document_types),
         )
 
     elif input_path.is_dir():
-        output_path.mkdir(parents=True, exist_ok=True)
-
-        for html_file in input_path.glob("*.txt*"):
-            out_file = output_path / f"{html_file.stem}_MD-and-A.txt"
-            process_file(
-                html_file,
-                out_file,
-                emit_toml=None,  # avoid clobbering
-                model=args.model,
-            )
+        # emit_toml is not used here to avoid clobbering one TOML per filing
+        process_directory(
+            input_path,
+            output_path,
+            model=args.model,
+            workers=args.workers,
+            document_types=tuple(args.document_types),
+        )
     else:
         logger.error("Invalid input path provided.")
 
@@ -1,17 +1,105 @@
-import re
+import codecs
 import logging
 from pathlib import Path
+from typing import Iterable, Iterator
+
 from bs4 import BeautifulSoup
 
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml is a declared dependency
+    etree = None
+
+from .sections import SectionIndex
+from .submission import (
+    PRIMARY_TYPES,
+    SubmissionDocument,
+    index_documents,
+    open_submission,
+    select_documents,
+)
+
 logger = logging.getLogger(__name__)
 
 PARSERS = ["lxml", "html5lib", "html.parser"]
 
+# Subtrees whose text never belongs in the extracted document. ix:header
+# holds the hidden inline-XBRL facts, often megabytes per 10-K.
+SKIP_TAGS = frozenset({"script", "style", "ix:header"})
+
+CHUNK_SIZE = 1 << 20
+
+
+class _TextCollector:
+    """
+    lxml parser target that collects text without building a tree.
+
+    Text runs between two tags are joined first (lxml may split one text
+    node across several ``data`` calls) and runs are separated by a space,
+    matching ``BeautifulSoup.get_text(separator=" ")``.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self._run = []
+        self._skip_depth = 0
+
+    def _flush_run(self):
+        if self._run:
+            self.parts.append("".join(self._run))
+            self._run = []
+
+    def start(self, tag, attrib):
+        self._flush_run()
+        if self._skip_depth or tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self._flush_run()
+        if self._skip_depth:
+            self._skip_depth -= 1
 
-def html_to_text(file_path: Path) -> str:
+    def data(self, data):
+        if not self._skip_depth:
+            self._run.append(data)
+
+    def close(self):
+        self._flush_run()
+        return " ".join(self.parts)
+
+
+def _collect_text(chunks: Iterable[str]) -> str:
+    if etree is None:
+        raise RuntimeError("lxml is not installed")
+
+    parser = etree.HTMLParser(target=_TextCollector(), recover=True)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def _file_chunks(file_path: Path) -> Iterator[str]:
     with file_path.open("r", encoding="utf-8", errors="ignore") as f:
-        html = f.read()
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+def _range_chunks(data, start: int, end: int) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    for pos in range(start, end, CHUNK_SIZE):
+        yield decoder.decode(data[pos:min(pos + CHUNK_SIZE, end)])
+    yield decoder.decode(b"", final=True)
+
+
+def fast_html_to_text(file_path: Path) -> str:
+    """
+    Stream ``file_path`` through lxml's HTML parser and return its text,
+    skipping script/style/ix:header content.
+    """
+    return _collect_text(_file_chunks(file_path))
 
+
+def _soup_text(html: str, source) -> str:
     last_exception = None
 
     for parser in PARSERS:
@@ -30,35 +118,100 @@ def html_to_text(file_path: Path) -> str:
             logger.warning(
                 "Parser '%s' failed for %s: %s",
                 parser,
-                file_path,
+                source,
                 e,
             )
 
     raise RuntimeError(
-        f"All HTML parsers failed for {file_path}"
+        f"All HTML parsers failed for {source}"
     ) from last_exception
 
 
-def extract_mda_section(text: str) -> str | None:
-    clean_text = re.sub(r"\s+", " ", text)
-    upper = clean_text.upper()
+def soup_html_to_text(file_path: Path) -> str:
+    with file_path.open("r", encoding="utf-8", errors="ignore") as f:
+        html = f.read()
+
+    return _soup_text(html, file_path)
 
-    item7_match = re.search(r"\bITEM\s+7\b", upper)
-    if not item7_match:
-        return None
 
-    item7_end_match = re.search(
-        r"\bITEM\s+7A\b|\bITEM\s+8\b",
-        upper[item7_match.end():],
+def _text_with_fallback(fast, soup, source) -> str:
+    try:
+        text = fast()
+        if text.strip():
+            return text
+        logger.warning("Fast extractor found no text in %s", source)
+    except Exception as e:
+        logger.warning("Fast extractor failed for %s: %s", source, e)
+
+    return soup()
+
+
+def _document_text(data, doc: SubmissionDocument, file_path: Path) -> str:
+    source = f"{file_path} [{doc.type} {doc.filename or doc.sequence}]"
+    return _text_with_fallback(
+        lambda: _collect_text(_range_chunks(data, doc.start, doc.end)),
+        lambda: _soup_text(
+            bytes(data[doc.start:doc.end]).decode("utf-8", errors="ignore"),
+            source,
+        ),
+        source,
     )
 
-    if not item7_end_match:
-        return None
 
-    start = item7_match.start()
-    end = item7_match.end() + item7_end_match.start()
+def html_to_text(
+    file_path: Path,
+    document_types: tuple[str, ...] = PRIMARY_TYPES,
+) -> str:
+    """
+    Extract the visible text of an HTML filing.
+
+    For EDGAR full-submission files only the documents whose ``<TYPE>`` is
+    in ``document_types`` (the 10-K itself by default) are parsed; exhibits,
+    XBRL and uuencoded attachments are never read. Plain HTML files are
+    parsed whole.
+
+    Uses the streaming lxml extractor and falls back to the BeautifulSoup
+    parser chain only when it fails or finds no text.
+    """
+    with open_submission(file_path) as data:
+        documents = index_documents(data)
+        selected = select_documents(documents, document_types)
+
+        if selected:
+            logger.info(
+                "Parsing %s of %d document(s) in %s",
+                ", ".join(doc.type for doc in selected),
+                len(documents),
+                file_path,
+            )
+            return " ".join(_document_text(data, doc, file_path) for doc in selected)
+
+        if documents:
+            logger.warning(
+                "No %s document in %s; parsing the whole submission",
+                "/".join(document_types),
+                file_path,
+            )
 
-    candidate = clean_text[start:end].strip()
+    return _text_with_fallback(
+        lambda: fast_html_to_text(file_path),
+        lambda: soup_html_to_text(file_path),
+        file_path,
+    )
+
+
+def extract_mda_section(
+    text: str, index: SectionIndex | None = None
+) -> str | None:
+    """
+    Return the MD&A (Item 7) section of a 10-K's text.
+
+    Pass a prebuilt ``index`` to pull several items from one filing without
+    re-scanning it.
+    """
+    candidate = (index or SectionIndex(text)).section("7")
+    if candidate is None:
+        return None
 
     if len(candidate) < 500:
         logger.warning("Extracted MD&A is unusually short")
@@ -66,7 +219,10 @@ def extract_mda_section(text: str) -> str | None:
     return candidate
 
 
-def extract_mda_from_file(input_file: Path) -> str | None:
-    text = html_to_text(input_file)
+def extract_mda_from_file(
+    input_file: Path,
+    document_types: tuple[str, ...] = PRIMARY_TYPES,
+) -> str | None:
+    text = html_to_text(input_file, document_types)
     return extract_mda_section(text)
 
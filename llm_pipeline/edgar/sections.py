@@ -0,0 +1,77 @@
+import re
+from typing import List, Tuple
+
+_ITEM_HEADING = re.compile(r"\bITEM\s+(\d{1,2})([A-C])?\b", re.IGNORECASE)
+
+# Words that mark "see Item 8" style cross-references rather than headings
+_CROSS_REFERENCE = re.compile(
+    r"\b(?:see|in|under|and|to|of|within|refer)\s+$", re.IGNORECASE
+)
+_LOOKBEHIND = 12
+
+# The whitespace-normalized text keeps no line breaks, so a heading-like
+# position is read from its neighbours: a heading never continues a list
+# or parenthesis ("see Part II, Item 7", "(Item 8)") and is never followed
+# by running text ("Item 7 of this report", "Item 1A, Risk Factors, ...")
+_MID_SENTENCE_BEFORE = re.compile(r"[,(]\s*$")
+_MID_SENTENCE_AFTER = re.compile(r"\s*[a-z,)]")
+
+
+def _item_key(number: str, letter: str | None) -> Tuple[int, str]:
+    return int(number), (letter or "").upper()
+
+
+class SectionIndex:
+    """
+    Offsets of every ``ITEM n`` heading in a 10-K, found in one pass.
+
+    The text is whitespace-normalized once and scanned with a single
+    case-insensitive pattern; only matches in a heading-like position
+    count. A section runs from one of its headings to the next heading of
+    any item (the last one to the end of the text). The table of contents
+    repeats every heading a few characters apart, so the longest such span
+    is taken as the real section.
+    """
+
+    def __init__(self, text: str):
+        # str.split() collapses the same whitespace as re's \s, several
+        # times faster than re.sub on multi-MB filings
+        self.text = " ".join(text.split())
+        self.headings: List[Tuple[Tuple[int, str], int]] = []
+
+        for match in _ITEM_HEADING.finditer(self.text):
+            before = self.text[max(0, match.start() - _LOOKBEHIND):match.start()]
+            if (
+                _CROSS_REFERENCE.search(before)
+                or _MID_SENTENCE_BEFORE.search(before)
+                or _MID_SENTENCE_AFTER.match(self.text, match.end())
+            ):
+                continue
+            self.headings.append((_item_key(*match.groups()), match.start()))
+
+    def span(self, item: str) -> Tuple[int, int] | None:
+        """Start/end offsets of ``item`` (e.g. ``"7"``, ``"1A"``), or None."""
+        match = re.fullmatch(r"(\d{1,2})([A-C])?", item.strip(), re.IGNORECASE)
+        if not match:
+            raise ValueError(f"Not a 10-K item: {item!r}")
+        key = _item_key(*match.groups())
+
+        best = None
+        for i, (heading_key, start) in enumerate(self.headings):
+            if heading_key != key:
+                continue
+            end = (
+                self.headings[i + 1][1]
+                if i + 1 < len(self.headings)
+                else len(self.text)
+            )
+            if best is None or end - start > best[1] - best[0]:
+                best = (start, end)
+
+        return best
+
+    def section(self, item: str) -> str | None:
+        span = self.span(item)
+        if span is None:
+            return None
+        return self.text[span[0]:span[1]].strip()
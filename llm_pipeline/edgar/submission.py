@@ -0,0 +1,121 @@
+"""
+Reader for EDGAR full-submission ``.txt`` files.
+
+A submission wraps every filed document in SGML::
+
+    <DOCUMENT>
+    <TYPE>10-K
+    <SEQUENCE>1
+    <FILENAME>form10-k.htm
+    <DESCRIPTION>ANNUAL REPORT
+    <TEXT>
+    ... html ...
+    </TEXT>
+    </DOCUMENT>
+
+Exhibits, XBRL instances and uuencoded images/PDFs follow as further
+documents. The file is memory-mapped and only the ``<DOCUMENT>`` headers
+are scanned, so the caller can hand just the documents it needs to the
+HTML extractor.
+"""
+
+import mmap
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List
+
+PRIMARY_TYPES = ("10-K", "10-K405", "10-KT")
+
+_DOC_OPEN = b"<DOCUMENT>"
+_DOC_CLOSE = b"</DOCUMENT>"
+_TEXT_OPEN = b"<TEXT>"
+_TEXT_CLOSE = b"</TEXT>"
+
+# Only the first few hundred bytes of a document hold its header fields
+_HEADER_SCAN = 4096
+_HEADER_FIELD = re.compile(rb"<(TYPE|SEQUENCE|FILENAME|DESCRIPTION)>([^\r\n<]*)")
+
+
+@dataclass(frozen=True)
+class SubmissionDocument:
+    type: str
+    sequence: str | None
+    filename: str | None
+    description: str | None
+    # Byte offsets of the content between <TEXT> and </TEXT>
+    start: int
+    end: int
+
+
+@contextmanager
+def open_submission(path: Path) -> Iterator[mmap.mmap | bytes]:
+    """Memory-map ``path`` read-only (empty files yield ``b""``)."""
+    with path.open("rb") as f:
+        if path.stat().st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            yield m
+
+
+def index_documents(data: mmap.mmap | bytes) -> List[SubmissionDocument]:
+    """Locate every ``<DOCUMENT>`` block without copying document bodies."""
+    documents = []
+    pos = data.find(_DOC_OPEN)
+
+    while pos != -1:
+        doc_end = data.find(_DOC_CLOSE, pos)
+        if doc_end == -1:
+            doc_end = len(data)
+
+        header_end = min(pos + _HEADER_SCAN, doc_end)
+        fields = {
+            name.decode(): value.decode("latin-1").strip()
+            for name, value in _HEADER_FIELD.findall(data[pos:header_end])
+        }
+
+        text_start = data.find(_TEXT_OPEN, pos, doc_end)
+        if text_start == -1:
+            start = pos + len(_DOC_OPEN)
+            end = doc_end
+        else:
+            start = text_start + len(_TEXT_OPEN)
+            end = data.rfind(_TEXT_CLOSE, start, doc_end)
+            if end == -1:
+                end = doc_end
+
+        documents.append(
+            SubmissionDocument(
+                type=fields.get("TYPE", "").upper(),
+                sequence=fields.get("SEQUENCE"),
+                filename=fields.get("FILENAME"),
+                description=fields.get("DESCRIPTION"),
+                start=start,
+                end=end,
+            )
+        )
+
+        pos = data.find(_DOC_OPEN, doc_end)
+
+    return documents
+
+
+def select_documents(
+    documents: List[SubmissionDocument],
+    document_types: tuple[str, ...] = PRIMARY_TYPES,
+) -> List[SubmissionDocument]:
+    """
+    Documents whose type is in ``document_types``, in filing order.
+
+    A type ending in ``*`` matches as a prefix, e.g. ``EX-13*``.
+    """
+    wanted = {t.upper() for t in document_types}
+    prefixes = tuple(t[:-1] for t in wanted if t.endswith("*"))
+
+    return [
+        doc
+        for doc in documents
+        if doc.type in wanted or (prefixes and doc.type.startswith(prefixes))
+    ]
@@ -0,0 +1,221 @@
+"""
+Adaptive (AIMD) limit on requests in flight.
+
+The limiter looks at completed requests in windows of a few requests each.
+For every window it computes:
+
+- throughput: tokens generated per second
+- queueing delay: client wall time minus the time the server reports
+  spending on the request
+
+The limit then changes as follows:
+
+- While throughput keeps improving and the limit is actually reached, the
+  limit grows: doubling at first (slow start), then by one per window.
+- Queueing delay that grows beyond the smallest seen, or an overload error
+  (timeout, 503 from a full server queue), cuts the limit by BACKOFF.
+  Requests already in flight at that point are not sampled, since they
+  were admitted under the old limit.
+- A flat window holds the limit. The throughput to beat decays a little
+  each such window, so the limit is probed again now and then.
+
+Threads wait in acquire() and asyncio tasks in aacquire(). A freed slot
+is handed to the longest waiter of either kind.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+from collections import deque
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_LIMIT = 64
+# Completed requests per decision, at least
+MIN_WINDOW = 4
+# Throughput must improve by this fraction to count as better
+GAIN = 0.05
+BACKOFF = 0.75
+PROBE_DECAY = 0.98
+# Queueing delay above the baseline tolerated before backing off: the
+# larger of a fixed floor and a fraction of the server's own time
+MIN_QUEUE_DELAY_S = 0.02
+QUEUE_TOLERANCE = 0.25
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        name: str,
+        *,
+        initial: int = 1,
+        min_limit: int = 1,
+        max_limit: int = DEFAULT_MAX_LIMIT,
+        logger=logger,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = min(max(initial, min_limit), self.max_limit)
+        self.in_flight = 0
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._waiters: deque[_Waiter] = deque()
+        self._slow_start = True
+        self._best = 0.0
+        self._min_queue_s = math.inf
+        self._settling = 0
+        self._reset_window(perf_counter())
+
+    # -------------------------
+    # Slots
+    # -------------------------
+    def has_room(self) -> bool:
+        return self.in_flight < self.limit and not self._waiters
+
+    def _try_acquire(self) -> bool:
+        if self.has_room():
+            self.in_flight += 1
+            if self.in_flight >= self.limit:
+                self._saturated = True
+            return True
+        self._saturated = True
+        return False
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.wake()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._try_acquire():
+                return
+            event = threading.Event()
+            self._waiters.append(_Waiter(event.set))
+        event.wait()
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(
+                lambda: future.done() or future.set_result(None)
+            )
+
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = _Waiter(wake)
+            self._waiters.append(waiter)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self.in_flight -= 1
+                    self._wake_waiters()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+
+    def release(
+        self,
+        *,
+        tokens: int = 0,
+        wall_s: float | None = None,
+        server_s: float | None = None,
+        overloaded: bool = False,
+    ) -> None:
+        """
+        Free a slot and feed back how the request went.
+
+        ``wall_s`` is the client-side time of the request and ``server_s``
+        the time the server reports for it; both are left out for requests
+        that failed for reasons unrelated to load.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            now = perf_counter()
+            if overloaded:
+                if not self._decreased:
+                    self._decrease("server overloaded")
+            elif self._settling:
+                self._settling -= 1
+            elif wall_s is not None and server_s is not None:
+                self._n += 1
+                self._tokens += tokens or 1
+                self._queue_s += max(wall_s - server_s, 0.0)
+                self._server_s += server_s
+                if self._n >= max(self.limit, MIN_WINDOW):
+                    self._decide(now)
+            self._wake_waiters()
+
+    # -------------------------
+    # AIMD
+    # -------------------------
+    def _reset_window(self, now: float) -> None:
+        self._window_start = now
+        self._n = 0
+        self._tokens = 0
+        self._queue_s = 0.0
+        self._server_s = 0.0
+        self._saturated = self.in_flight >= self.limit
+        self._decreased = False
+
+    def _set_limit(self, limit: int, reason: str) -> None:
+        limit = min(max(limit, self.min_limit), self.max_limit)
+        if limit != self.limit:
+            self.logger.info(
+                "Concurrency for %s: %d -> %d (%s)",
+                self.name,
+                self.limit,
+                limit,
+                reason,
+            )
+        self.limit = limit
+
+    def _decrease(self, reason: str) -> None:
+        self._slow_start = False
+        self._decreased = True
+        self._settling = self.in_flight
+        self._set_limit(math.floor(self.limit * BACKOFF), reason)
+
+    def _decide(self, now: float) -> None:
+        elapsed = now - self._window_start
+        throughput = self._tokens / elapsed if elapsed > 0 else 0.0
+        queue_s = self._queue_s / self._n
+        server_s = self._server_s / self._n
+        self._min_queue_s = min(self._min_queue_s, queue_s)
+        delay = queue_s - self._min_queue_s
+
+        if delay > max(MIN_QUEUE_DELAY_S, QUEUE_TOLERANCE * server_s):
+            self._decrease(f"queueing delay {delay:.2f} s")
+        elif self._saturated and throughput > self._best * (1 + GAIN):
+            self._best = throughput
+            self._set_limit(
+                self.limit * 2 if self._slow_start else self.limit + 1,
+                f"throughput up to {throughput:.1f} tokens/s",
+            )
+        else:
+            if self._saturated:
+                # More requests in flight stopped paying off
+                self._slow_start = False
+            self._best *= PROBE_DECAY
+
+        self._reset_window(now)
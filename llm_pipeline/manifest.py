@@ -0,0 +1,87 @@
+import json
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+class RunManifest:
+    """
+    Append-only record of completed generations.
+
+    Each line holds ``backend``, ``model``, ``run_id`` and the ``input_hash``
+    of the prompt/system/options that produced it. The file is read once into
+    a dict so completion checks are O(1); a later line for the same run_id
+    supersedes earlier ones. With ``resume=True`` the runner skips jobs whose
+    recorded hash matches the current inputs.
+    """
+
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = Path(path)
+        self.resume = resume
+        self._done: dict[tuple[str, str, str], str] = {}
+        self._lock = threading.Lock()
+
+        partial = self._load() if self.path.exists() else False
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = self.path.open("a", encoding="utf-8")
+        if partial:
+            # Start the next record on a line of its own
+            self._fh.write("\n")
+            self._fh.flush()
+
+    def _load(self) -> bool:
+        """Read the completed runs; returns whether the last line is partial."""
+        line = ""
+        with self.path.open("r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, start=1):
+                try:
+                    entry = json.loads(line)
+                    key = (entry["backend"], entry["model"], entry["run_id"])
+                    self._done[key] = entry["input_hash"]
+                except (ValueError, KeyError):
+                    # A job killed mid-write can leave a partial last line
+                    logger.warning(
+                        "Skipping malformed manifest line %d in %s",
+                        lineno,
+                        self.path,
+                    )
+
+        logger.info(
+            "Loaded %d completed run(s) from %s", len(self._done), self.path
+        )
+        return bool(line) and not line.endswith("\n")
+
+    def is_complete(
+        self, backend: str, model: str, run_id: str, input_hash: str
+    ) -> bool:
+        return self._done.get((backend, model, run_id)) == input_hash
+
+    def should_skip(
+        self, backend: str, model: str, run_id: str, input_hash: str
+    ) -> bool:
+        return self.resume and self.is_complete(backend, model, run_id, input_hash)
+
+    def record(
+        self, backend: str, model: str, run_id: str, input_hash: str
+    ) -> None:
+        line = json.dumps(
+            {
+                "backend": backend,
+                "model": model,
+                "run_id": run_id,
+                "input_hash": input_hash,
+            }
+        )
+        with self._lock:
+            self._fh.write(line + "\n")
+            self._fh.flush()
+            self._done[(backend, model, run_id)] = input_hash
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
@@ -0,0 +1,412 @@
+"""
+Backend-independent performance metrics for a run.
+
+Every saved result is reduced to the same handful of numbers (queue wait,
+time to first token, prompt/generation throughput, latency, bytes written)
+whichever backend produced it. RunMetrics aggregates them per backend/model
+into streaming histograms, so percentiles are available without keeping
+every observation, and writes them out at the end of the run as a JSON
+summary and a Prometheus textfile-collector file. Results that name the
+``host`` that served them (the Ollama backend over several servers) are
+also totalled per host.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from .output import plain_stats
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Histograms of these per-result values are kept for every model
+LATENCY_METRICS = ("latency_s", "ttft_s", "queue_wait_s")
+THROUGHPUT_METRICS = ("prompt_tokens_per_s", "generation_tokens_per_s")
+
+
+class Histogram:
+    """
+    Log-bucketed streaming histogram.
+
+    Bucket bounds grow geometrically from ``low``, ``buckets_per_doubling``
+    per factor of two, so quantile estimates are within about 9% (the width
+    of one bucket) whatever the scale. Values above the last bound are
+    counted in an overflow bucket.
+    """
+
+    def __init__(
+        self,
+        low: float = 1e-3,
+        high: float = 1e5,
+        buckets_per_doubling: int = 4,
+    ):
+        self.buckets_per_doubling = buckets_per_doubling
+        n = math.ceil(math.log2(high / low) * buckets_per_doubling)
+        self.bounds = [low * 2 ** (i / buckets_per_doubling) for i in range(n + 1)]
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _bucket(self, value: float) -> int:
+        if value <= self.bounds[0]:
+            return 0
+        i = math.ceil(
+            math.log2(value / self.bounds[0]) * self.buckets_per_doubling - 1e-9
+        )
+        return min(i, len(self.bounds))
+
+    def observe(self, value: float) -> None:
+        self.counts[self._bucket(value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.bounds):
+                    return self.max
+                lower = self.bounds[i - 1] if i else 0.0
+                value = lower + (self.bounds[i] - lower) * (rank - seen) / n
+                return min(max(value, self.min), self.max)
+            seen += n
+
+        return self.max
+
+    def cumulative(self, every: int = 1):
+        """``(upper bound, cumulative count)`` for every ``every``-th bound."""
+        total = 0
+        for i, bound in enumerate(self.bounds):
+            total += self.counts[i]
+            if i % every == 0:
+                yield bound, total
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count,
+            "min": self.min,
+            "max": self.max,
+            **{f"p{round(q * 100)}": self.quantile(q) for q in QUANTILES},
+        }
+
+
+def _rate(tokens, duration_ns) -> float | None:
+    if not tokens or not duration_ns:
+        return None
+    return tokens / (duration_ns / 1e9)
+
+
+def result_metrics(
+    result: Dict[str, Any],
+    *,
+    queue_wait_s: float | None = None,
+    bytes_written: int | None = None,
+) -> Dict[str, Any]:
+    """
+    Normalize one backend result into the shared metric names.
+
+    Ollama reports load/prompt-eval/eval durations; the Hugging Face backend
+    reports the same keys plus an exact ``time_to_first_token_s`` when
+    streaming. Without a measured TTFT it is approximated as model load
+    plus prompt evaluation, which is when the first token can be sampled.
+    """
+    stats = plain_stats(result.get("stats"))
+
+    ttft_s = stats.get("time_to_first_token_s")
+    if ttft_s is None and stats.get("prompt_eval_duration"):
+        ttft_s = (
+            (stats.get("load_duration") or 0) + stats["prompt_eval_duration"]
+        ) / 1e9
+
+    return {
+        "queue_wait_s": queue_wait_s,
+        "ttft_s": ttft_s,
+        "latency_s": result.get("wall_time_s"),
+        "prompt_tokens": stats.get("prompt_eval_count") or 0,
+        "generated_tokens": stats.get("eval_count") or 0,
+        "prompt_tokens_per_s": _rate(
+            stats.get("prompt_eval_count"), stats.get("prompt_eval_duration")
+        ),
+        "generation_tokens_per_s": _rate(
+            stats.get("eval_count"),
+            stats.get("eval_duration") or stats.get("total_duration"),
+        ),
+        "bytes_written": bytes_written or 0,
+        "cached": bool(stats.get("cached")),
+        "host": result.get("host"),
+    }
+
+
+class _ModelMetrics:
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.cached = 0
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+        self.bytes_written = 0
+        # Seconds per scheduling phase, e.g. model warm-up
+        self.phases: Dict[str, float] = {}
+        self.histograms = {
+            name: Histogram() for name in LATENCY_METRICS + THROUGHPUT_METRICS
+        }
+
+
+class _HostMetrics:
+    def __init__(self):
+        self.completed = 0
+        self.generated_tokens = 0
+        # Sum of request latencies, i.e. request-seconds served
+        self.busy_s = 0.0
+
+
+class RunMetrics:
+    """
+    Thread-safe per-backend/model aggregation of result_metrics.
+
+    Cached results count towards ``cached`` and bytes written but are left
+    out of the latency and throughput histograms, which would otherwise
+    report cache reads as generations.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._models: Dict[tuple[str, str], _ModelMetrics] = {}
+        self._hosts: Dict[tuple[str, str], _HostMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _model(self, backend: str, model: str) -> _ModelMetrics:
+        return self._models.setdefault((backend, model), _ModelMetrics())
+
+    def record(self, backend: str, model: str, metrics: Dict[str, Any]) -> None:
+        with self._lock:
+            m = self._model(backend, model)
+            m.completed += 1
+            m.bytes_written += metrics["bytes_written"]
+
+            if metrics["cached"]:
+                m.cached += 1
+                return
+
+            m.prompt_tokens += metrics["prompt_tokens"]
+            m.generated_tokens += metrics["generated_tokens"]
+            for name, histogram in m.histograms.items():
+                if metrics.get(name) is not None:
+                    histogram.observe(metrics[name])
+
+            if metrics.get("host"):
+                h = self._hosts.setdefault((backend, metrics["host"]), _HostMetrics())
+                h.completed += 1
+                h.generated_tokens += metrics["generated_tokens"]
+                h.busy_s += metrics.get("latency_s") or 0.0
+
+    def record_failure(self, backend: str, model: str) -> None:
+        with self._lock:
+            self._model(backend, model).failed += 1
+
+    def record_phase(self, backend: str, model: str, **seconds: float) -> None:
+        """Add time spent in scheduling phases, e.g. ``warm_s=3.2``."""
+        with self._lock:
+            phases = self._model(backend, model).phases
+            for name, value in seconds.items():
+                phases[name] = phases.get(name, 0.0) + value
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            finished_at = time.time()
+            return {
+                "started_at": self.started_at,
+                "finished_at": finished_at,
+                "duration_s": finished_at - self.started_at,
+                "models": [
+                    {
+                        "backend": backend,
+                        "model": model,
+                        "completed": m.completed,
+                        "failed": m.failed,
+                        "cached": m.cached,
+                        "prompt_tokens": m.prompt_tokens,
+                        "generated_tokens": m.generated_tokens,
+                        "bytes_written": m.bytes_written,
+                        "phases_s": dict(m.phases),
+                        **{
+                            name: histogram.summary()
+                            for name, histogram in m.histograms.items()
+                        },
+                    }
+                    for (backend, model), m in sorted(self._models.items())
+                ],
+                "hosts": [
+                    {
+                        "backend": backend,
+                        "host": host,
+                        "completed": h.completed,
+                        "generated_tokens": h.generated_tokens,
+                        "busy_s": h.busy_s,
+                        "generation_tokens_per_s": (
+                            h.generated_tokens / (finished_at - self.started_at)
+                        ),
+                    }
+                    for (backend, host), h in sorted(self._hosts.items())
+                ],
+            }
+
+    def log_summary(self, log=logger) -> None:
+        summary = self.summary()
+        for entry in summary["models"]:
+            latency = entry["latency_s"]
+            if not latency["count"]:
+                continue
+            log.info(
+                "Latency '%s': p50 %.2f s, p95 %.2f s, p99 %.2f s "
+                "over %d prompt(s); %d token(s) generated",
+                entry["model"],
+                latency["p50"],
+                latency["p95"],
+                latency["p99"],
+                latency["count"],
+                entry["generated_tokens"],
+            )
+        for entry in summary["hosts"]:
+            log.info(
+                "Host %s: %d prompt(s), %.1f token(s)/s",
+                entry["host"],
+                entry["completed"],
+                entry["generation_tokens_per_s"],
+            )
+
+    def write_json(self, path: Path) -> None:
+        _write_atomic(path, json.dumps(self.summary(), indent=2) + "\n")
+
+    def write_prometheus(self, path: Path) -> None:
+        """
+        Write the node_exporter textfile-collector format.
+
+        The file is replaced atomically so the collector never scrapes a
+        partial write.
+        """
+        _write_atomic(path, self.prometheus_text())
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            models = sorted(self._models.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f"# HELP llm_pipeline_{name} {help_text}")
+                lines.append(f"# TYPE llm_pipeline_{name} {kind}")
+
+            family("prompts_total", "counter", "Prompts finished, by status.")
+            for (backend, model), m in models:
+                for status, value in (
+                    ("completed", m.completed - m.cached),
+                    ("cached", m.cached),
+                    ("failed", m.failed),
+                ):
+                    labels = _labels(backend=backend, model=model, status=status)
+                    lines.append(f"llm_pipeline_prompts_total{labels} {value}")
+
+            for name, attr, help_text in (
+                ("prompt_tokens_total", "prompt_tokens", "Prompt tokens evaluated."),
+                ("generated_tokens_total", "generated_tokens", "Tokens generated."),
+                ("output_bytes_total", "bytes_written", "Result bytes written."),
+            ):
+                family(name, "counter", help_text)
+                for (backend, model), m in models:
+                    labels = _labels(backend=backend, model=model)
+                    lines.append(f"llm_pipeline_{name}{labels} {getattr(m, attr)}")
+
+            for metric in LATENCY_METRICS:
+                name = metric.removesuffix("_s") + "_seconds"
+                family(name, "histogram", f"Per-prompt {metric} in seconds.")
+                for (backend, model), m in models:
+                    h = m.histograms[metric]
+                    # Every power-of-two bound keeps the exposition small
+                    for bound, count in h.cumulative(every=h.buckets_per_doubling):
+                        labels = _labels(backend=backend, model=model, le=f"{bound:g}")
+                        lines.append(f"llm_pipeline_{name}_bucket{labels} {count}")
+                    labels = _labels(backend=backend, model=model, le="+Inf")
+                    lines.append(f"llm_pipeline_{name}_bucket{labels} {h.count}")
+                    labels = _labels(backend=backend, model=model)
+                    lines.append(f"llm_pipeline_{name}_sum{labels} {h.sum}")
+                    lines.append(f"llm_pipeline_{name}_count{labels} {h.count}")
+
+            for name in THROUGHPUT_METRICS:
+                family(name, "summary", f"Per-prompt {name.replace('_', ' ')}.")
+                for (backend, model), m in models:
+                    h = m.histograms[name]
+                    for q in QUANTILES:
+                        value = h.quantile(q)
+                        labels = _labels(backend=backend, model=model, quantile=f"{q:g}")
+                        lines.append(
+                            f"llm_pipeline_{name}{labels} "
+                            f"{'NaN' if value is None else value}"
+                        )
+                    labels = _labels(backend=backend, model=model)
+                    lines.append(f"llm_pipeline_{name}_sum{labels} {h.sum}")
+                    lines.append(f"llm_pipeline_{name}_count{labels} {h.count}")
+
+            family(
+                "model_phase_seconds",
+                "gauge",
+                "Time spent per model by phase (load, warm-up, run).",
+            )
+            for (backend, model), m in models:
+                for phase, value in sorted(m.phases.items()):
+                    labels = _labels(
+                        backend=backend, model=model, phase=phase.removesuffix("_s")
+                    )
+                    lines.append(f"llm_pipeline_model_phase_seconds{labels} {value}")
+
+            hosts = sorted(self._hosts.items())
+            for name, attr, help_text in (
+                ("host_prompts_total", "completed", "Prompts served, by host."),
+                (
+                    "host_generated_tokens_total",
+                    "generated_tokens",
+                    "Tokens generated, by host.",
+                ),
+            ):
+                family(name, "counter", help_text)
+                for (backend, host), h in hosts:
+                    labels = _labels(backend=backend, host=host)
+                    lines.append(f"llm_pipeline_{name}{labels} {getattr(h, attr)}")
+
+            family("last_run_timestamp_seconds", "gauge", "When the run finished.")
+            lines.append(f"llm_pipeline_last_run_timestamp_seconds {time.time()}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    def escape(value: str) -> str:
+        return (
+            value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        )
+
+    return "{" + ",".join(f'{k}="{escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
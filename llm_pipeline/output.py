@@ -1,5 +1,10 @@
+import json
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any
+from time import monotonic
+from typing import Any, Callable, Dict
 
 
 def save_result(
@@ -45,9 +50,287 @@ def save_result(
         f"- Total tokens: {(stats.get('prompt_eval_count') or 0) + (stats.get('eval_count') or 0)}",
         f"- Prompt eval time: {ns_to_ms(stats.get('prompt_eval_duration'))}",
         f"- Generation time: {ns_to_ms(stats.get('eval_duration'))}",
-        f"- Total Ollama time: {ns_to_ms(stats.get('total_duration'))}",
+        f"- Total {backend} time: {ns_to_ms(stats.get('total_duration'))}",
         f"- Wall time: {result['wall_time_s'] * 1000:.1f} ms",
     ])
 
-    path.write_text("\n".join(content_lines) + "\n", encoding="utf-8")
+    # Only streamed generations can measure per-token timings
+    if stats.get("time_to_first_token_s") is not None:
+        content_lines.extend([
+            f"- Time to first token: {stats['time_to_first_token_s'] * 1000:.1f} ms",
+            f"- Per-token latency: {stats['inter_token_latency_s'] * 1000:.1f} ms",
+        ])
 
+    data = ("\n".join(content_lines) + "\n").encode("utf-8")
+    path.write_bytes(data)
+    return len(data)
+
+
+
+# =================================================
+# Result sinks
+# =================================================
+
+# Raw stats fields that duplicate the response or are too large to keep
+_DROPPED_STATS = {"response", "context"}
+
+
+def to_jsonable(obj):
+    """json.dumps ``default`` hook; Ollama responses are pydantic models."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return str(obj)
+
+
+def plain_stats(stats) -> Dict[str, Any]:
+    """Backend stats as a plain dict (Ollama responses are pydantic models)."""
+    if hasattr(stats, "model_dump"):
+        stats = stats.model_dump()
+    return dict(stats or {})
+
+
+def _stat(stats, key):
+    value = stats.get(key) if stats is not None else None
+    return int(value) if value is not None else None
+
+
+def result_record(
+    *,
+    backend: str,
+    model: str,
+    prompt_id: str,
+    prompt: str,
+    system: str | None,
+    result: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Flatten one result into a row with typed performance columns."""
+    stats = plain_stats(result["stats"])
+
+    return {
+        "run_id": prompt_id,
+        "backend": backend,
+        "model": model,
+        "prompt": prompt,
+        "system": system,
+        "response": result["text"],
+        "prompt_tokens": _stat(stats, "prompt_eval_count"),
+        "response_tokens": _stat(stats, "eval_count"),
+        "prompt_eval_duration_ns": _stat(stats, "prompt_eval_duration"),
+        "eval_duration_ns": _stat(stats, "eval_duration"),
+        "load_duration_ns": _stat(stats, "load_duration"),
+        "total_duration_ns": _stat(stats, "total_duration"),
+        "wall_time_s": float(result["wall_time_s"]),
+        "stats_json": json.dumps(
+            {k: v for k, v in stats.items() if k not in _DROPPED_STATS},
+            default=to_jsonable,
+        ),
+    }
+
+
+class ResultSink(ABC):
+    """
+    Destination for generation results.
+
+    ``write`` may buffer; ``on_commit`` is called once the result is durably
+    written, which is when the run manifest may record it as complete.
+    ``write`` returns the number of bytes the result takes in the output
+    (uncompressed, for parquet).
+    """
+
+    @abstractmethod
+    def write(
+        self,
+        *,
+        backend: str,
+        model: str,
+        prompt_id: str,
+        prompt: str,
+        system: str | None,
+        result: Dict[str, Any],
+        on_commit: Callable[[], None] | None = None,
+    ) -> int:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class TextResultSink(ResultSink):
+    """One human-readable ``.txt`` report per result (see save_result)."""
+
+    def __init__(self, output_dir: Path, **_ignored):
+        self.output_dir = output_dir
+
+    def write(self, *, on_commit=None, **kwargs) -> int:
+        size = save_result(output_dir=self.output_dir, **kwargs)
+        if on_commit is not None:
+            on_commit()
+        return size
+
+
+class _BufferedShardSink(ResultSink):
+    """
+    Buffers rows per backend/model shard and writes them out every
+    ``flush_every`` rows or ``flush_interval_s`` seconds, whichever is first.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        flush_every: int = 100,
+        flush_interval_s: float = 30.0,
+    ):
+        self.output_dir = output_dir
+        self.flush_every = flush_every
+        self.flush_interval_s = flush_interval_s
+
+        self._lock = threading.Lock()
+        self._buffers: Dict[tuple[str, str], list] = {}
+        self._callbacks: list[Callable[[], None]] = []
+        self._pending = 0
+        self._last_flush = monotonic()
+
+    def _shard_path(self, backend: str, model: str) -> Path:
+        shard_dir = self.output_dir / backend / model
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        return shard_dir / f"results.{self.suffix}"
+
+    def write(self, *, on_commit=None, **kwargs) -> int:
+        row, size = self._encode(result_record(**kwargs))
+
+        with self._lock:
+            shard = (kwargs["backend"], kwargs["model"])
+            self._buffers.setdefault(shard, []).append(row)
+            if on_commit is not None:
+                self._callbacks.append(on_commit)
+            self._pending += 1
+
+            due = (
+                self._pending >= self.flush_every
+                or monotonic() - self._last_flush >= self.flush_interval_s
+            )
+            if due:
+                self._flush_locked()
+
+        return size
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        for (backend, model), rows in self._buffers.items():
+            if rows:
+                self._write_rows(self._shard_path(backend, model), rows)
+                rows.clear()
+
+        for callback in self._callbacks:
+            callback()
+        self._callbacks.clear()
+
+        self._pending = 0
+        self._last_flush = monotonic()
+
+    @abstractmethod
+    def _encode(self, record: Dict[str, Any]) -> tuple[Any, int]:
+        """Buffered form of ``record`` and its size in bytes."""
+
+    @abstractmethod
+    def _write_rows(self, path: Path, rows: list) -> None:
+        """Append buffered ``rows`` to the shard at ``path``."""
+
+
+class JsonlResultSink(_BufferedShardSink):
+    """Append-only ``results.jsonl`` per backend/model."""
+
+    suffix = "jsonl"
+
+    def _encode(self, record):
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        return data, len(data)
+
+    def _write_rows(self, path, rows):
+        with path.open("ab") as f:
+            f.writelines(rows)
+
+
+class ParquetResultSink(_BufferedShardSink):
+    """
+    ``results-<timestamp>.partNNNN.parquet`` per backend/model, run and
+    flush. A Parquet file is only readable once closed, so every flush
+    writes a complete part file before its results are committed; read the
+    parts of a run together, e.g. ``pyarrow.parquet.read_table(directory)``.
+    Requires pyarrow (``pip install llm-pipeline[parquet]``).
+    """
+
+    suffix = "parquet"
+
+    def __init__(self, output_dir: Path, **kwargs):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(
+                "The parquet output format requires pyarrow "
+                "(pip install llm-pipeline[parquet])"
+            ) from e
+
+        super().__init__(output_dir, **kwargs)
+        self._pa, self._pq = pa, pq
+        self._parts: Dict[Path, int] = {}
+        self._stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self._schema = pa.schema(
+            [
+                ("run_id", pa.string()),
+                ("backend", pa.string()),
+                ("model", pa.string()),
+                ("prompt", pa.string()),
+                ("system", pa.string()),
+                ("response", pa.string()),
+                ("prompt_tokens", pa.int64()),
+                ("response_tokens", pa.int64()),
+                ("prompt_eval_duration_ns", pa.int64()),
+                ("eval_duration_ns", pa.int64()),
+                ("load_duration_ns", pa.int64()),
+                ("total_duration_ns", pa.int64()),
+                ("wall_time_s", pa.float64()),
+                ("stats_json", pa.string()),
+            ]
+        )
+
+    def _shard_path(self, backend, model):
+        path = super()._shard_path(backend, model)
+        return path.with_name(f"results-{self._stamp}")
+
+    def _encode(self, record):
+        # Uncompressed size: string bytes plus 8 per numeric column
+        size = sum(
+            len(v.encode("utf-8")) if isinstance(v, str) else 8
+            for v in record.values()
+            if v is not None
+        )
+        return record, size
+
+    def _write_rows(self, path, rows):
+        part = self._parts.get(path, 0)
+        self._parts[path] = part + 1
+        self._pq.write_table(
+            self._pa.Table.from_pylist(rows, schema=self._schema),
+            path.with_name(f"{path.name}.part{part:04d}.parquet"),
+        )
+
+
+OUTPUT_FORMATS = {
+    "txt": TextResultSink,
+    "jsonl": JsonlResultSink,
+    "parquet": ParquetResultSink,
+}
+
+
+def make_sink(output_format: str, output_dir: Path, **kwargs) -> ResultSink:
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return OUTPUT_FORMATS[output_format](output_dir, **kwargs)
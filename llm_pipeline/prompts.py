@@ -1,18 +1,203 @@
+import json
+import mmap
+import re
+import sys
+import threading
+from collections import OrderedDict
+from itertools import chain
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List
 
 PROMPT_SEPARATOR = "\n---\n"
 
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+
+# Record ids become part of run_ids and so of output file names
+_RECORD_ID = re.compile(r"[A-Za-z0-9._-]+")
+
+# Prompt files up to MEMO_MAX_BYTES are parsed once and kept in memory, up
+# to MEMO_TOTAL_BYTES of parsed records in all (several times the size of
+# the file); larger files are always streamed
+MEMO_MAX_BYTES = 4 * 1024 * 1024
+MEMO_TOTAL_BYTES = 32 * 1024 * 1024
+
+# (resolved path, whole_documents) -> ((mtime_ns, size), records, memory)
+_memo: "OrderedDict[tuple[str, bool], tuple[tuple[int, int], tuple, int]]" = (
+    OrderedDict()
+)
+_memo_bytes = 0
+_memo_lock = threading.Lock()
+
+
+def _has_separator(path: Path) -> bool:
+    # mmap lets us search multi-GB files without reading them into memory
+    if path.stat().st_size == 0:
+        return False
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return m.find(PROMPT_SEPARATOR.strip().encode()) != -1
+
+
+def _iter_separated(path: Path) -> Iterator[str]:
+    separator = PROMPT_SEPARATOR.lstrip("\n")
+    lines: List[str] = []
+
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line == separator:
+                prompt = "".join(lines).strip()
+                if prompt:
+                    yield prompt
+                lines = []
+            else:
+                lines.append(line)
+
+    prompt = "".join(lines).strip()
+    if prompt:
+        yield prompt
+
+
+def _iter_lines(path: Path) -> Iterator[str]:
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: invalid JSON ({e})") from e
+            if not isinstance(record, dict) or "prompt" not in record:
+                raise ValueError(f"{path}:{lineno}: record has no 'prompt' field")
+            if "id" in record:
+                record_id = str(record["id"])
+                if not _RECORD_ID.fullmatch(record_id) or ".." in record_id:
+                    raise ValueError(
+                        f"{path}:{lineno}: invalid id {record_id!r} (use letters, "
+                        "digits, '.', '_' and '-', without '..')"
+                    )
+            yield record
+
+
+def iter_prompt_records(
+    path: Path, whole_documents: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield prompt records from a prompt file.
+
+    Supported formats:
+    - ``.jsonl``/``.ndjson``: one JSON object per line with a ``prompt`` field
+      and optional ``id``, ``system``, ``temperature`` and ``options``
+    - text containing ``---`` separator lines: one prompt per block
+    - any other text: one prompt per non-empty line, or the whole file as
+      one prompt with ``whole_documents`` (for long documents)
+
+    Every record is a dict with at least a ``prompt`` key.
+    """
+    if path.suffix.lower() in JSONL_SUFFIXES:
+        yield from _iter_jsonl(path)
+        return
+
+    if whole_documents or _has_separator(path):
+        prompts = _iter_separated(path)
+    else:
+        prompts = _iter_lines(path)
+    for prompt in prompts:
+        yield {"prompt": prompt}
+
+
+def iter_numbered_prompts(
+    prompt_id: str, records: Iterator[Dict[str, Any]]
+) -> Iterator[tuple[str, Dict[str, Any]]]:
+    """
+    Pair each record with its run_id.
+
+    A single prompt keeps the bare prompt_id; multiple prompts are numbered
+    ``<prompt_id>-<n>`` from 1, unless the record carries its own ``id``.
+    Only one record of lookahead is needed to tell the two cases apart.
+    """
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return
+    second = next(records, None)
+
+    if second is None:
+        run_id = f"{prompt_id}-{first['id']}" if "id" in first else prompt_id
+        yield run_id, first
+        return
+
+    for idx, record in enumerate(chain([first, second], records), start=1):
+        suffix = record["id"] if "id" in record else idx
+        yield f"{prompt_id}-{suffix}", record
+
+
+def _records_size(records: tuple) -> int:
+    """Approximate memory held by parsed records, in bytes."""
+    size = sys.getsizeof(records)
+    for record in records:
+        size += sys.getsizeof(record)
+        for key, value in record.items():
+            size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+
+def load_prompt_records(
+    path: Path, whole_documents: bool = False
+) -> Iterable[Dict[str, Any]]:
+    """
+    Prompt records of ``path``, memoized by path and modification time.
+
+    Prompt definitions (and models) sharing a file read and split it once;
+    a file that changed on disk is read again. The returned records are
+    shared between callers and must not be modified. Files larger than
+    MEMO_MAX_BYTES are not kept: they are streamed with iter_prompt_records.
+    The least recently used files are dropped once the parsed records
+    kept exceed MEMO_TOTAL_BYTES.
+    """
+    global _memo_bytes
+
+    st = path.stat()
+    key = (str(path.resolve()), whole_documents)
+    version = (st.st_mtime_ns, st.st_size)
+
+    with _memo_lock:
+        hit = _memo.get(key)
+        if hit is not None and hit[0] == version:
+            _memo.move_to_end(key)
+            return hit[1]
+
+    if st.st_size > MEMO_MAX_BYTES:
+        return iter_prompt_records(path, whole_documents)
+
+    records = tuple(iter_prompt_records(path, whole_documents))
+    size = _records_size(records)
+
+    with _memo_lock:
+        stale = _memo.pop(key, None)
+        if stale is not None:
+            _memo_bytes -= stale[2]
+        if size > MEMO_TOTAL_BYTES:
+            return records
+        _memo[key] = (version, records, size)
+        _memo_bytes += size
+        while _memo_bytes > MEMO_TOTAL_BYTES:
+            _memo_bytes -= _memo.popitem(last=False)[1][2]
+
+    return records
+
 
 def load_prompts_from_file(path: Path) -> List[str]:
-    text = path.read_text(encoding="utf-8").strip()
-    if PROMPT_SEPARATOR.strip() in text:
-        return [p.strip() for p in text.split(PROMPT_SEPARATOR) if p.strip()]
-    return [line.strip() for line in text.splitlines() if line.strip()]
+    return [record["prompt"] for record in load_prompt_records(path)]
 
 
 def resolve_prompt(prompt_id: str, prompt_registry: dict) -> dict:
     if prompt_id not in prompt_registry:
         raise KeyError(f"Prompt '{prompt_id}' not found in [prompts]")
     return prompt_registry[prompt_id]
-
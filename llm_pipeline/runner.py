@@ -1,34 +1,85 @@
-import sys
+import asyncio
+import contextlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from itertools import groupby, islice, product
 from pathlib import Path
+from time import perf_counter
+from typing import Callable, Iterable, Iterator
 
-from .prompts import resolve_prompt, load_prompts_from_file
-from .output import save_result
+from .cache import cache_key
+from .chunking import chunk_budget, estimate_tokens, split_into_chunks
+from .metrics import result_metrics
+from .output import ResultSink, TextResultSink, plain_stats
+from .prompts import iter_numbered_prompts, load_prompt_records, resolve_prompt
 
+# Prompts handed to run_prompts_batch per call; the backend sorts within this
+# window by length, so it bounds memory without giving up much padding
+BATCH_WINDOW = 256
 
-def run_model_prompts(
+# Distinct generations remembered for deduplication, with their results;
+# a prompt repeated after more than this many others is generated again
+DEDUP_WINDOW = 1024
+
+
+def _sweep_points(sweep: dict | None) -> list[tuple[dict, list]]:
+    """
+    Expand a prompt definition's ``sweep`` table, e.g.
+    ``{temperature = [0.2, 0.7], seed = [1, 2, 3]}``, into its points.
+
+    Returns one ``(point, seeds)`` pair per combination of the keys other
+    than ``seed``: seeds vary innermost, so all samples of one prompt and
+    setting are adjacent and batching backends can generate them together.
+    """
+    if not sweep:
+        return [({}, [None])]
+    if not isinstance(sweep, dict):
+        raise ValueError("sweep must be a table of value lists")
+
+    axes = {
+        key: values if isinstance(values, list) else [values]
+        for key, values in sweep.items()
+    }
+    if not all(axes.values()):
+        raise ValueError("sweep values must not be empty")
+
+    seeds = axes.pop("seed", [None])
+    return [
+        (dict(zip(axes, values)), seeds)
+        for values in product(*axes.values())
+    ]
+
+
+def _sweep_label(sweep: dict, point: dict) -> str:
+    """``temperature=0.2,seed=1``, in the order of the ``sweep`` table."""
+    return ",".join(f"{key}={point[key]}" for key in sweep)
+
+
+def _iter_jobs(
     *,
-    backend,
     model_cfg: dict,
     prompt_registry: dict,
-    stream: bool,
-    output_dir: Path,
-    backend_name: str,
-    filter_prompt: str | None = None,
+    filter_prompt: str | None,
     logger,
-):
-    model_name = model_cfg["name"]
-
-    # Ensure model exists / is downloaded
-    try:
-        backend.ensure_model(model_name)
-    except Exception as e:
-        logger.error("Failed to prepare model '%s': %s", model_name, e)
-        return
+) -> Iterator[dict]:
+    """
+    Lazily expand a model's prompt IDs into one job per prompt text.
 
+    Prompt files are memoized (see load_prompt_records), so IDs sharing a
+    file read it once; files too large to keep are streamed. A ``sweep``
+    in the prompt definition runs every prompt once per sweep point, under
+    ``<run_id>@<label>`` (see _sweep_label); sweep values take precedence
+    over the prompt's own temperature and options.
+    """
+    model_name = model_cfg["name"]
     prompt_ids = model_cfg.get("prompts", [])
 
-    logger.info("=== Model: %s ===", model_name)
-
     for prompt_id in prompt_ids:
         if filter_prompt and filter_prompt not in prompt_id:
             continue
@@ -46,6 +97,7 @@ def run_model_prompts(
             **model_cfg.get("options", {}),
             **pdef.get("options", {}),
         }
+        long_document = pdef.get("long_document")
 
         logger.info(
             "Running prompt '%s' on model '%s' with options: %s",
@@ -55,42 +107,1338 @@ def run_model_prompts(
         )
 
         # Load prompt text(s)
+        prompt_file = None
         if "prompt_file" in pdef:
             prompt_file = Path(pdef["prompt_file"])
             if not prompt_file.exists():
                 logger.error("Prompt file not found: %s", prompt_file)
                 continue
-            prompts = load_prompts_from_file(prompt_file)
+
+        try:
+            sweep = pdef.get("sweep")
+            for point, seeds in _sweep_points(sweep):
+                if prompt_file is not None:
+                    records = load_prompt_records(
+                        prompt_file, whole_documents=long_document is not None
+                    )
+                else:
+                    records = [{"prompt": pdef["prompt"]}]
+
+                for run_id, record in iter_numbered_prompts(prompt_id, records):
+                    for seed in seeds:
+                        # JSONL records may override the prompt definition
+                        job = dict(
+                            run_id=run_id,
+                            prompt_text=record["prompt"],
+                            system=record.get("system", system),
+                            temperature=record.get("temperature", temperature),
+                            options={**options, **record.get("options", {})},
+                            long_document=long_document,
+                        )
+                        if sweep:
+                            job = _apply_sweep_point(
+                                job, sweep, {**point, "seed": seed}
+                            )
+                        yield job
+        except ValueError as e:
+            logger.error("Error reading prompts for '%s': %s", prompt_id, e)
+
+
+def _apply_sweep_point(job: dict, sweep: dict, point: dict) -> dict:
+    label = _sweep_label(sweep, point)
+    overrides = {
+        key: value
+        for key, value in point.items()
+        if key != "temperature" and key in sweep
+    }
+    return {
+        **job,
+        "run_id": f"{job['run_id']}@{label}",
+        "temperature": point.get("temperature", job["temperature"]),
+        "options": {**job["options"], **overrides},
+    }
+
+
+def _cache_lookup(
+    cache,
+    *,
+    backend_name: str,
+    model_key: str,
+    prompt_text: str,
+    system: str | None,
+    temperature: float | None,
+    options: dict,
+):
+    if cache is None:
+        return None, None
+
+    key = cache_key(
+        backend=backend_name,
+        model=model_key,
+        prompt=prompt_text,
+        system=system,
+        temperature=temperature,
+        options=options,
+    )
+    return key, cache.get(key)
+
+
+def _handle_result(
+    *,
+    result: dict,
+    model_name: str,
+    run_id: str,
+    prompt_text: str,
+    system: str | None,
+    sink: ResultSink,
+    backend_name: str,
+    logger,
+    manifest=None,
+    input_hash: str | None = None,
+    metrics=None,
+    queue_wait_s: float | None = None,
+    shared: "_Shared | None" = None,
+):
+    """
+    Save a result under ``run_id`` and, with ``shared``, under the run_ids
+    of the duplicates that joined it while it ran. The copies count as
+    cached in ``metrics``, since nothing was generated for them.
+    """
+    logger.info("Result [%s]:\n%s", run_id, result["text"])
+
+    fanout = shared.settle(result) if shared is not None else ()
+    for rid in (run_id, *fanout):
+        if rid != run_id:
+            logger.info("Result [%s] shared with '%s'", rid, run_id)
+
+        on_commit = None
+        if manifest is not None:
+            def on_commit(rid=rid):
+                manifest.record(backend_name, model_name, rid, input_hash)
+
+        bytes_written = sink.write(
+            backend=backend_name,
+            model=model_name,
+            prompt_id=rid,
+            prompt=prompt_text,
+            system=system,
+            result=result,
+            on_commit=on_commit,
+        )
+
+        if metrics is not None:
+            recorded = result_metrics(
+                result, queue_wait_s=queue_wait_s, bytes_written=bytes_written
+            )
+            recorded["cached"] = recorded["cached"] or rid != run_id
+            metrics.record(backend_name, model_name, recorded)
+
+
+def _record_failure(
+    metrics, backend_name: str, model_name: str, shared: "_Shared | None" = None
+) -> None:
+    fanout = shared.settle(None) if shared is not None else ()
+    if metrics is not None:
+        for _ in range(1 + len(fanout)):
+            metrics.record_failure(backend_name, model_name)
+
+
+def _generate(
+    *,
+    backend,
+    model_name: str,
+    run_id: str,
+    prompt_text: str,
+    system: str | None,
+    temperature: float | None,
+    options: dict,
+    stream: bool,
+    backend_name: str,
+    logger,
+    cache=None,
+    model_key: str | None = None,
+) -> dict:
+    """Return the cached result for a prompt, or generate and cache it."""
+    key, result = _cache_lookup(
+        cache,
+        backend_name=backend_name,
+        model_key=model_key or model_name,
+        prompt_text=prompt_text,
+        system=system,
+        temperature=temperature,
+        options=options,
+    )
+
+    if result is not None:
+        logger.info("Cache hit for '%s'", run_id)
+        return result
+
+    result = backend.run_prompt(
+        model=model_name,
+        prompt=prompt_text,
+        system=system,
+        temperature=temperature,
+        options=options,
+        stream=stream,
+    )
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+
+async def _agenerate(
+    *,
+    backend,
+    model_name: str,
+    run_id: str,
+    prompt_text: str,
+    system: str | None,
+    temperature: float | None,
+    options: dict,
+    stream: bool,
+    backend_name: str,
+    logger,
+    cache=None,
+    model_key: str | None = None,
+    slots: asyncio.Semaphore | None = None,
+) -> dict:
+    key, result = _cache_lookup(
+        cache,
+        backend_name=backend_name,
+        model_key=model_key or model_name,
+        prompt_text=prompt_text,
+        system=system,
+        temperature=temperature,
+        options=options,
+    )
+
+    if result is not None:
+        logger.info("Cache hit for '%s'", run_id)
+        return result
+
+    async with slots or contextlib.nullcontext():
+        result = await backend.arun_prompt(
+            model=model_name,
+            prompt=prompt_text,
+            system=system,
+            temperature=temperature,
+            options=options,
+            stream=stream,
+        )
+    if cache is not None:
+        await asyncio.to_thread(cache.put, key, result)
+    return result
+
+
+# -------------------------
+# Long documents
+# -------------------------
+DEFAULT_MAP_PROMPT = "{text}"
+DEFAULT_REDUCE_PROMPT = (
+    "The following are {parts} partial analyses of consecutive parts of one "
+    "document. Combine them into a single, coherent analysis of the whole "
+    "document.\n\n{text}"
+)
+
+
+def _fill(template: str, **values) -> str:
+    # Not str.format: templates may contain literal braces (e.g. JSON)
+    for name, value in values.items():
+        template = template.replace(f"{{{name}}}", str(value))
+    return template
+
+
+class _LongDocumentPlan:
+    """
+    How a long prompt is split and recombined.
+
+    ``settings`` is a prompt definition's ``long_document`` table:
+    ``max_tokens`` (default: what fits in ``num_ctx`` next to the response),
+    ``map_prompt`` with ``{text}``, ``{part}`` and ``{parts}`` placeholders,
+    and ``reduce_prompt``/``reduce_system`` with ``{text}`` and ``{parts}``.
+    """
+
+    def __init__(
+        self, *, backend, model_name, prompt_text, system, options, settings
+    ):
+        count_tokens = getattr(backend, "count_tokens", None)
+        self.count = (
+            (lambda text: count_tokens(model_name, text))
+            if count_tokens is not None
+            else estimate_tokens
+        )
+        self.map_prompt = settings.get("map_prompt", DEFAULT_MAP_PROMPT)
+        self.reduce_prompt = settings.get("reduce_prompt", DEFAULT_REDUCE_PROMPT)
+        self.system = system
+        self.reduce_system = settings.get("reduce_system", system)
+
+        overhead = self.count(system or "") + self.count(
+            _fill(self.map_prompt, text="", part=0, parts=0)
+        )
+        self.max_tokens = settings.get("max_tokens") or chunk_budget(
+            options, overhead
+        )
+        self.chunks = split_into_chunks(prompt_text, self.max_tokens, self.count)
+
+    def map_jobs(self, run_id: str) -> list[tuple[str, str, str | None]]:
+        n = len(self.chunks)
+        return [
+            (
+                f"{run_id}-part{k:03d}",
+                _fill(self.map_prompt, text=chunk, part=k, parts=n),
+                self.system,
+            )
+            for k, chunk in enumerate(self.chunks, start=1)
+        ]
+
+    def _reduce_input(self, texts: list[str]) -> str:
+        n = len(texts)
+        combined = "\n\n".join(
+            f"Part {k} of {n}:\n{text.strip()}"
+            for k, text in enumerate(texts, start=1)
+        )
+        return _fill(self.reduce_prompt, text=combined, parts=n)
+
+    def _fits(self, texts: list[str]) -> bool:
+        return self.count(self._reduce_input(texts)) <= self.max_tokens
+
+    def reduce_jobs(
+        self, run_id: str, texts: list[str], round_: int
+    ) -> list[tuple[str, str, str | None]] | None:
+        """
+        Intermediate reduce prompts over groups of partial results, or None
+        when they all fit in one final reduce.
+        """
+        if len(texts) <= 1 or self._fits(texts):
+            return None
+
+        groups, current = [], []
+        for text in texts:
+            if current and not self._fits(current + [text]):
+                groups.append(current)
+                current = []
+            current.append(text)
+        groups.append(current)
+
+        # Partial results too long to pair up: reducing cannot shrink them
+        if len(groups) == len(texts):
+            return None
+
+        return [
+            (
+                f"{run_id}-reduce{round_}-{k:03d}",
+                self._reduce_input(group),
+                self.reduce_system,
+            )
+            for k, group in enumerate(groups, start=1)
+        ]
+
+    def final_job(self, texts: list[str]) -> tuple[str, str | None]:
+        return self._reduce_input(texts), self.reduce_system
+
+    def result(self, final: dict, partials: list[dict], rounds: int, start: float):
+        stats = plain_stats(final["stats"])
+        stats["long_document"] = {
+            "chunks": len(self.chunks),
+            "max_tokens": self.max_tokens,
+            "reduce_rounds": rounds,
+            "map_prompt_tokens": sum(
+                plain_stats(r["stats"]).get("prompt_eval_count") or 0
+                for r in partials
+            ),
+            "map_generated_tokens": sum(
+                plain_stats(r["stats"]).get("eval_count") or 0 for r in partials
+            ),
+        }
+        return {
+            "text": final["text"],
+            "stats": stats,
+            "wall_time_s": perf_counter() - start,
+        }
+
+
+def _run_long_document(
+    *,
+    backend,
+    model_name: str,
+    run_id: str,
+    prompt_text: str,
+    system: str | None,
+    temperature: float | None,
+    options: dict,
+    stream: bool,
+    settings: dict,
+    sink: ResultSink,
+    backend_name: str,
+    logger,
+    cache=None,
+    model_key: str | None = None,
+    metrics=None,
+    pool=None,
+) -> dict:
+    """
+    Map-reduce a prompt that exceeds the context window.
+
+    The text is split into token-budgeted chunks, each chunk is run (on
+    ``pool`` when given, or as one batch on batching backends) and saved as
+    ``<run_id>-partNNN``, and the partial results are combined by reduce
+    prompts, in rounds if they do not fit one context. Returns the final
+    result; the caller saves it under ``run_id``.
+    """
+    start = perf_counter()
+    generation = dict(
+        backend=backend,
+        model_name=model_name,
+        temperature=temperature,
+        options=options,
+        stream=stream,
+        backend_name=backend_name,
+        logger=logger,
+        cache=cache,
+        model_key=model_key,
+    )
+
+    plan = _LongDocumentPlan(
+        backend=backend,
+        model_name=model_name,
+        prompt_text=prompt_text,
+        system=system,
+        options=options,
+        settings=settings,
+    )
+    if len(plan.chunks) <= 1:
+        return _generate(
+            run_id=run_id, prompt_text=prompt_text, system=system, **generation
+        )
+
+    logger.info(
+        "Split '%s' into %d chunk(s) of at most %d tokens",
+        run_id,
+        len(plan.chunks),
+        plan.max_tokens,
+    )
+
+    def run_stage(jobs):
+        if getattr(backend, "supports_batching", False) and not stream:
+            results = _generate_batch(jobs, **generation)
         else:
-            prompts = [pdef["prompt"]]
+            def run(job):
+                rid, text, sys_prompt = job
+                return _generate(
+                    run_id=rid, prompt_text=text, system=sys_prompt, **generation
+                )
+
+            results = list(pool.map(run, jobs) if pool is not None else map(run, jobs))
+
+        for (rid, text, sys_prompt), result in zip(jobs, results):
+            _handle_result(
+                result=result,
+                model_name=model_name,
+                run_id=rid,
+                prompt_text=text,
+                system=sys_prompt,
+                sink=sink,
+                backend_name=backend_name,
+                logger=logger,
+                metrics=metrics,
+            )
+        return results
+
+    partials = run_stage(plan.map_jobs(run_id))
+    texts = [r["text"] for r in partials]
+
+    rounds = 0
+    while (jobs := plan.reduce_jobs(run_id, texts, rounds + 1)) is not None:
+        rounds += 1
+        texts = [r["text"] for r in run_stage(jobs)]
+
+    final_prompt, final_system = plan.final_job(texts)
+    final = _generate(
+        run_id=run_id, prompt_text=final_prompt, system=final_system, **generation
+    )
+    return plan.result(final, partials, rounds + 1, start)
+
+
+def _generate_batch(
+    jobs: list[tuple[str, str, str | None]],
+    *,
+    backend,
+    model_name: str,
+    temperature: float | None,
+    options: dict,
+    stream: bool,
+    backend_name: str,
+    logger,
+    cache=None,
+    model_key: str | None = None,
+) -> list[dict]:
+    """Cached results for ``jobs``, generating the rest in one batch call."""
+    lookups = [
+        _cache_lookup(
+            cache,
+            backend_name=backend_name,
+            model_key=model_key or model_name,
+            prompt_text=text,
+            system=sys_prompt,
+            temperature=temperature,
+            options=options,
+        )
+        for _, text, sys_prompt in jobs
+    ]
+    results = [result for _, result in lookups]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    if missing:
+        generated = backend.run_prompts_batch(
+            model=model_name,
+            prompts=[jobs[i][1] for i in missing],
+            # All jobs of one stage share the system prompt
+            system=jobs[missing[0]][2],
+            temperature=temperature,
+            options=options,
+            stream=stream,
+        )
+        for i, result in zip(missing, generated):
+            results[i] = result
+            if cache is not None:
+                cache.put(lookups[i][0], result)
 
-        for idx, prompt_text in enumerate(prompts, start=1):
-            run_id = f"{prompt_id}-{idx}" if len(prompts) > 1 else prompt_id
+    return results
 
-            logger.info("--- Prompt: %s ---", run_id)
 
-            try:
-                result = backend.run_prompt(
-                    model=model_name,
-                    prompt=prompt_text,
-                    system=system,
-                    temperature=temperature,
-                    options=options,
-                    stream=stream,
+async def _arun_long_document(
+    *,
+    backend,
+    model_name: str,
+    run_id: str,
+    prompt_text: str,
+    system: str | None,
+    temperature: float | None,
+    options: dict,
+    stream: bool,
+    settings: dict,
+    sink: ResultSink,
+    backend_name: str,
+    logger,
+    cache=None,
+    model_key: str | None = None,
+    metrics=None,
+    slots: asyncio.Semaphore | None = None,
+) -> dict:
+    """Asyncio counterpart of _run_long_document; chunks share ``slots``."""
+    start = perf_counter()
+    generation = dict(
+        backend=backend,
+        model_name=model_name,
+        temperature=temperature,
+        options=options,
+        stream=stream,
+        backend_name=backend_name,
+        logger=logger,
+        cache=cache,
+        model_key=model_key,
+        slots=slots,
+    )
+
+    plan = await asyncio.to_thread(
+        _LongDocumentPlan,
+        backend=backend,
+        model_name=model_name,
+        prompt_text=prompt_text,
+        system=system,
+        options=options,
+        settings=settings,
+    )
+    if len(plan.chunks) <= 1:
+        return await _agenerate(
+            run_id=run_id, prompt_text=prompt_text, system=system, **generation
+        )
+
+    logger.info(
+        "Split '%s' into %d chunk(s) of at most %d tokens",
+        run_id,
+        len(plan.chunks),
+        plan.max_tokens,
+    )
+
+    async def run_stage(jobs):
+        results = await asyncio.gather(
+            *(
+                _agenerate(
+                    run_id=rid, prompt_text=text, system=sys_prompt, **generation
                 )
+                for rid, text, sys_prompt in jobs
+            )
+        )
+        for (rid, text, sys_prompt), result in zip(jobs, results):
+            await asyncio.to_thread(
+                _handle_result,
+                result=result,
+                model_name=model_name,
+                run_id=rid,
+                prompt_text=text,
+                system=sys_prompt,
+                sink=sink,
+                backend_name=backend_name,
+                logger=logger,
+                metrics=metrics,
+            )
+        return results
+
+    partials = await run_stage(plan.map_jobs(run_id))
+    texts = [r["text"] for r in partials]
+
+    rounds = 0
+    while (jobs := plan.reduce_jobs(run_id, texts, rounds + 1)) is not None:
+        rounds += 1
+        texts = [r["text"] for r in await run_stage(jobs)]
+
+    final_prompt, final_system = plan.final_job(texts)
+    final = await _agenerate(
+        run_id=run_id, prompt_text=final_prompt, system=final_system, **generation
+    )
+    return plan.result(final, partials, rounds + 1, start)
+
+
+def _run_job(
+    *,
+    backend,
+    model_name: str,
+    run_id: str,
+    prompt_text: str,
+    system: str | None,
+    temperature: float | None,
+    options: dict,
+    stream: bool,
+    sink: ResultSink,
+    backend_name: str,
+    logger,
+    cache=None,
+    model_key: str | None = None,
+    manifest=None,
+    input_hash: str | None = None,
+    metrics=None,
+    queued_at: float | None = None,
+    long_document: dict | None = None,
+    shared: "_Shared | None" = None,
+    pool=None,
+) -> bool:
+    logger.info("--- Prompt: %s ---", run_id)
+    queue_wait_s = perf_counter() - queued_at if queued_at is not None else None
+
+    try:
+        if long_document is not None:
+            result = _run_long_document(
+                backend=backend,
+                model_name=model_name,
+                run_id=run_id,
+                prompt_text=prompt_text,
+                system=system,
+                temperature=temperature,
+                options=options,
+                stream=stream,
+                settings=long_document,
+                sink=sink,
+                backend_name=backend_name,
+                logger=logger,
+                cache=cache,
+                model_key=model_key,
+                metrics=metrics,
+                pool=pool,
+            )
+        else:
+            result = _generate(
+                backend=backend,
+                model_name=model_name,
+                run_id=run_id,
+                prompt_text=prompt_text,
+                system=system,
+                temperature=temperature,
+                options=options,
+                stream=stream,
+                backend_name=backend_name,
+                logger=logger,
+                cache=cache,
+                model_key=model_key,
+            )
+
+        _handle_result(
+            result=result,
+            model_name=model_name,
+            run_id=run_id,
+            prompt_text=prompt_text,
+            system=system,
+            sink=sink,
+            backend_name=backend_name,
+            logger=logger,
+            manifest=manifest,
+            input_hash=input_hash,
+            metrics=metrics,
+            queue_wait_s=queue_wait_s,
+            shared=shared,
+        )
+
+    except Exception as e:
+        logger.error("Error running prompt '%s': %s", run_id, e)
+        _record_failure(metrics, backend_name, model_name, shared)
+        return False
+
+    return True
+
 
-                logger.info("Result:\n%s", result["text"])
+async def _arun_job(
+    *,
+    backend,
+    model_name: str,
+    run_id: str,
+    prompt_text: str,
+    system: str | None,
+    temperature: float | None,
+    options: dict,
+    stream: bool,
+    sink: ResultSink,
+    backend_name: str,
+    logger,
+    cache=None,
+    model_key: str | None = None,
+    manifest=None,
+    input_hash: str | None = None,
+    metrics=None,
+    queued_at: float | None = None,
+    long_document: dict | None = None,
+    shared: "_Shared | None" = None,
+    slots: asyncio.Semaphore | None = None,
+) -> bool:
+    logger.info("--- Prompt: %s ---", run_id)
+    queue_wait_s = perf_counter() - queued_at if queued_at is not None else None
+
+    try:
+        if long_document is not None:
+            result = await _arun_long_document(
+                backend=backend,
+                model_name=model_name,
+                run_id=run_id,
+                prompt_text=prompt_text,
+                system=system,
+                temperature=temperature,
+                options=options,
+                stream=stream,
+                settings=long_document,
+                sink=sink,
+                backend_name=backend_name,
+                logger=logger,
+                cache=cache,
+                model_key=model_key,
+                metrics=metrics,
+                slots=slots,
+            )
+        else:
+            result = await _agenerate(
+                backend=backend,
+                model_name=model_name,
+                run_id=run_id,
+                prompt_text=prompt_text,
+                system=system,
+                temperature=temperature,
+                options=options,
+                stream=stream,
+                backend_name=backend_name,
+                logger=logger,
+                cache=cache,
+                model_key=model_key,
+                slots=slots,
+            )
+
+        await asyncio.to_thread(
+            _handle_result,
+            result=result,
+            model_name=model_name,
+            run_id=run_id,
+            prompt_text=prompt_text,
+            system=system,
+            sink=sink,
+            backend_name=backend_name,
+            logger=logger,
+            manifest=manifest,
+            input_hash=input_hash,
+            metrics=metrics,
+            queue_wait_s=queue_wait_s,
+            shared=shared,
+        )
+
+    except Exception as e:
+        logger.error("Error running prompt '%s': %s", run_id, e)
+        _record_failure(metrics, backend_name, model_name, shared)
+        return False
+
+    return True
+
+
+def _run_batched(
+    *,
+    backend,
+    jobs: Iterable[dict],
+    model_name: str,
+    stream: bool,
+    sink: ResultSink,
+    backend_name: str,
+    logger,
+    cache=None,
+    model_key: str | None = None,
+    manifest=None,
+    metrics=None,
+) -> Iterator[bool]:
+    """
+    Send consecutive jobs that share system/temperature/options to the
+    backend's run_prompts_batch, at most BATCH_WINDOW prompts per call.
+    Yields one success flag per job.
+
+    On backends that ``supports_samples``, jobs differing only in their
+    seed (a seed sweep) are batched too: each prompt is generated once per
+    seed as samples of the same call, each drawn from its own seed.
+    """
+    samples_ok = getattr(backend, "supports_samples", False)
+
+    def fail(job, e):
+        logger.error("Error running prompt '%s': %s", job["run_id"], e)
+        _record_failure(metrics, backend_name, model_name, job.get("shared"))
+        return False
+
+    def save(job, result, started=None):
+        queued_at = job.get("queued_at")
+        try:
+            _handle_result(
+                result=result,
+                model_name=model_name,
+                run_id=job["run_id"],
+                prompt_text=job["prompt_text"],
+                system=job["system"],
+                sink=sink,
+                backend_name=backend_name,
+                logger=logger,
+                manifest=manifest,
+                input_hash=job.get("input_hash"),
+                metrics=metrics,
+                queue_wait_s=(
+                    started - queued_at
+                    if started is not None and queued_at is not None
+                    else None
+                ),
+                shared=job.get("shared"),
+            )
+        except Exception as e:
+            return fail(job, e)
+        return True
 
-                save_result(
-                    output_dir=output_dir,
-                    backend=backend_name,
-                    model=model_name,
-                    prompt_id=run_id,
-                    prompt=prompt_text,
-                    system=system,
-                    result=result,
+    def uncached():
+        # Cached results are saved up front and left out of the batches
+        for job in jobs:
+            if job.get("long_document") is not None:
+                # Its chunks are batched on their own
+                cached_ok.append(
+                    _run_job(
+                        **job,
+                        backend=backend,
+                        model_name=model_name,
+                        stream=stream,
+                        sink=sink,
+                        backend_name=backend_name,
+                        logger=logger,
+                        cache=cache,
+                        model_key=model_key,
+                        manifest=manifest,
+                        metrics=metrics,
+                    )
                 )
+                continue
+
+            key, result = _cache_lookup(
+                cache,
+                backend_name=backend_name,
+                model_key=model_key or model_name,
+                prompt_text=job["prompt_text"],
+                system=job["system"],
+                temperature=job["temperature"],
+                options=job["options"],
+            )
+            if result is None:
+                yield job, key
+                continue
+            logger.info("Cache hit for '%s'", job["run_id"])
+            cached_ok.append(save(job, result))
+
+    def settings(item):
+        job = item[0]
+        options = job["options"]
+        if samples_ok:
+            options = {k: v for k, v in options.items() if k != "seed"}
+        return (
+            job["system"],
+            job["temperature"],
+            sorted(options.items()),
+        )
+
+    def calls(window):
+        """Split a window into (jobs, samples) calls, one per list of seeds."""
+        if len({job["options"].get("seed") for job, _ in window}) <= 1:
+            return [(window, 1)]
+
+        by_prompt: dict[str, list] = {}
+        for item in window:
+            by_prompt.setdefault(item[0]["prompt_text"], []).append(item)
+
+        by_seeds: dict[tuple, list] = {}
+        for items in by_prompt.values():
+            seeds = tuple(job["options"].get("seed") for job, _ in items)
+            by_seeds.setdefault(seeds, []).extend(items)
+        return [(items, len(seeds)) for seeds, items in by_seeds.items()]
+
+    def run(items, samples):
+        first = items[0][0]
+        logger.info(
+            "--- Batch: %s .. %s (%d prompt(s) x %d sample(s)) ---",
+            first["run_id"],
+            items[-1][0]["run_id"],
+            len(items) // samples,
+            samples,
+        )
+
+        started = perf_counter()
+        try:
+            results = backend.run_prompts_batch(
+                model=model_name,
+                # Items are prompt-major: every sample of a prompt in a row
+                prompts=[job["prompt_text"] for job, _ in items[::samples]],
+                system=first["system"],
+                temperature=first["temperature"],
+                options=first["options"],
+                stream=stream,
+                **(
+                    {"seeds": [job["options"]["seed"] for job, _ in items[:samples]]}
+                    if samples > 1
+                    else {}
+                ),
+            )
+        except Exception as e:
+            for job, _ in items:
+                yield fail(job, e)
+            return
+
+        for (job, key), result in zip(items, results):
+            if cache is not None:
+                cache.put(key, result)
+            yield save(job, result, started)
+
+    cached_ok: list[bool] = []
+    pending = uncached()
+
+    for _, group in groupby(pending, key=settings):
+        while window := list(islice(group, BATCH_WINDOW)):
+            yield from cached_ok
+            cached_ok.clear()
+
+            for items, samples in calls(window):
+                yield from run(items, samples)
+
+    yield from cached_ok
+
+
+def _run_threaded(
+    jobs: Iterable[dict], *, concurrency: int, **common
+) -> Iterator[bool]:
+    """
+    Run jobs on a thread pool, submitting lazily so that only a bounded
+    number of jobs are queued at any time. Yields one success flag per job.
+    """
+    limit = concurrency * 2
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = set()
+        for job in jobs:
+            if job.get("long_document") is not None:
+                # Run from this thread with the chunks on the shared pool,
+                # so no more than `concurrency` prompts are ever in flight
+                yield _run_job(**job, **common, pool=pool)
+                continue
+            if len(in_flight) >= limit:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from (f.result() for f in done)
+            in_flight.add(pool.submit(_run_job, **job, **common))
+
+        yield from (f.result() for f in as_completed(in_flight))
+
+
+def _model_key(backend, model_name: str) -> str:
+    """Model identity used in cache keys (e.g. the Ollama digest)."""
+    fingerprint = getattr(backend, "model_fingerprint", None)
+    if fingerprint is None:
+        return model_name
+    try:
+        return fingerprint(model_name)
+    except Exception:
+        return model_name
+
+
+def _input_hash(job: dict, *, backend_name: str, model_name: str) -> str:
+    """Everything that determines a job's result; equal hashes, same work."""
+    options = job["options"]
+    if job.get("long_document") is not None:
+        options = {**options, "long_document": job["long_document"]}
+    return cache_key(
+        backend=backend_name,
+        model=model_name,
+        prompt=job["prompt_text"],
+        system=job["system"],
+        temperature=job["temperature"],
+        options=options,
+    )
+
+
+class _Shared:
+    """
+    One distinct generation and the duplicates that want its result.
+
+    Duplicates found while the generation runs join it and are saved with
+    its result; once it has settled, the outcome is kept for duplicates
+    found later, which share its result or its failure.
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.run_ids: list[str] = []
+        self.done = False
+        self.result: dict | None = None
+        self._lock = threading.Lock()
+
+    def join(self, run_id: str) -> bool:
+        """Wait on the generation; False once it has settled."""
+        with self._lock:
+            if not self.done:
+                self.run_ids.append(run_id)
+            return not self.done
+
+    def settle(self, result: dict | None) -> list[str]:
+        """Record the outcome (None: failed); returns the joined run_ids."""
+        with self._lock:
+            self.done = True
+            if result is not None:
+                self.result = {
+                    **result,
+                    "stats": {**plain_stats(result.get("stats")), "cached": True},
+                }
+            return self.run_ids
+
+
+def _save_duplicate(
+    job: dict,
+    shared: _Shared,
+    *,
+    model_name: str,
+    sink: ResultSink,
+    backend_name: str,
+    logger,
+    manifest=None,
+    metrics=None,
+) -> None:
+    """Save the settled outcome of ``shared`` for a later duplicate ``job``."""
+    if shared.result is None:
+        logger.error(
+            "Prompt '%s' failed as its duplicate '%s'", job["run_id"], shared.run_id
+        )
+        _record_failure(metrics, backend_name, model_name)
+        return
+
+    logger.info("Result [%s] shared with '%s'", job["run_id"], shared.run_id)
+    try:
+        _handle_result(
+            result=shared.result,
+            model_name=model_name,
+            run_id=job["run_id"],
+            prompt_text=job["prompt_text"],
+            system=job["system"],
+            sink=sink,
+            backend_name=backend_name,
+            logger=logger,
+            manifest=manifest,
+            input_hash=job["input_hash"],
+            metrics=metrics,
+        )
+    except Exception as e:
+        logger.error("Error saving prompt '%s': %s", job["run_id"], e)
+        _record_failure(metrics, backend_name, model_name)
+
+
+def _pending_jobs(
+    jobs: Iterable[dict],
+    *,
+    manifest,
+    backend_name: str,
+    model_name: str,
+    counts: dict,
+    save_duplicate: Callable[[dict, _Shared], None],
+    on_dispatched: Callable[[], None] | None = None,
+) -> Iterator[dict]:
+    """
+    Tag jobs with their input hash and drop those already completed, or
+    duplicating one already handed out.
+
+    Several prompt IDs may name the same file, and a file may repeat a
+    prompt; each distinct generation is run once, under its first run_id,
+    and saved for the others too. Each job handed out carries the _Shared
+    its duplicates join while it runs; those found after it settled are
+    passed to ``save_duplicate``. Only the last DEDUP_WINDOW generations
+    are remembered, so jobs are still read as they are dispatched.
+
+    ``queued_at`` marks when a job is handed to the dispatcher, so queue
+    wait covers the time it spends behind other in-flight prompts.
+    ``on_dispatched`` is called once the last job has been handed out,
+    while it may still be running.
+    """
+    seen: "OrderedDict[str, _Shared]" = OrderedDict()
+
+    for job in jobs:
+        job["input_hash"] = input_hash = _input_hash(
+            job, backend_name=backend_name, model_name=model_name
+        )
+        if manifest is not None and manifest.should_skip(
+            backend_name, model_name, job["run_id"], input_hash
+        ):
+            counts["skipped"] += 1
+            continue
+
+        shared = seen.get(input_hash)
+        if shared is not None:
+            counts["deduplicated"] += 1
+            seen.move_to_end(input_hash)
+            if not shared.join(job["run_id"]):
+                save_duplicate(job, shared)
+            continue
+
+        job["shared"] = seen[input_hash] = _Shared(job["run_id"])
+        if len(seen) > DEDUP_WINDOW:
+            seen.popitem(last=False)
+
+        counts["total"] += 1
+        job["queued_at"] = perf_counter()
+        yield job
+
+    if on_dispatched is not None:
+        on_dispatched()
+
+
+def _log_summary(counts: dict, model_name: str, logger):
+    if counts["deduplicated"]:
+        logger.info(
+            "Deduplicated '%s': %d prompt(s) reused an identical prompt's result",
+            model_name,
+            counts["deduplicated"],
+        )
+    if counts["skipped"]:
+        logger.info(
+            "Resumed '%s': skipped %d completed prompt(s)",
+            model_name,
+            counts["skipped"],
+        )
+    if counts["failed"]:
+        logger.warning(
+            "%d of %d prompt(s) failed for model '%s'",
+            counts["failed"],
+            counts["total"],
+            model_name,
+        )
+
+
+def run_model_prompts(
+    *,
+    backend,
+    model_cfg: dict,
+    prompt_registry: dict,
+    stream: bool,
+    output_dir: Path,
+    backend_name: str,
+    filter_prompt: str | None = None,
+    concurrency: int = 1,
+    cache=None,
+    manifest=None,
+    sink: ResultSink | None = None,
+    metrics=None,
+    on_dispatched: Callable[[], None] | None = None,
+    model_ready: bool = False,
+    logger,
+):
+    model_name = model_cfg["name"]
+
+    # Ensure model exists / is downloaded, unless the scheduler has
+    # already warmed it
+    try:
+        if not model_ready:
+            backend.ensure_model(model_name)
+    except Exception as e:
+        logger.error("Failed to prepare model '%s': %s", model_name, e)
+        return
+
+    logger.info("=== Model: %s ===", model_name)
+
+    if sink is None:
+        sink = TextResultSink(output_dir)
+
+    counts = {"total": 0, "skipped": 0, "failed": 0, "deduplicated": 0}
+    jobs = _pending_jobs(
+        _iter_jobs(
+            model_cfg=model_cfg,
+            prompt_registry=prompt_registry,
+            filter_prompt=filter_prompt,
+            logger=logger,
+        ),
+        manifest=manifest,
+        backend_name=backend_name,
+        model_name=model_name,
+        counts=counts,
+        save_duplicate=lambda job, shared: _save_duplicate(
+            job,
+            shared,
+            model_name=model_name,
+            sink=sink,
+            backend_name=backend_name,
+            logger=logger,
+            manifest=manifest,
+            metrics=metrics,
+        ),
+        on_dispatched=on_dispatched,
+    )
+    common = dict(
+        backend=backend,
+        model_name=model_name,
+        stream=stream,
+        sink=sink,
+        backend_name=backend_name,
+        logger=logger,
+        cache=cache,
+        model_key=_model_key(backend, model_name) if cache is not None else None,
+        manifest=manifest,
+        metrics=metrics,
+    )
+
+    # -------------------------
+    # Dispatch
+    # -------------------------
+    # Batches are generated whole; streaming (for time-to-first-token and
+    # inter-token latency) runs prompt by prompt
+    if getattr(backend, "supports_batching", False) and not stream:
+        outcomes = _run_batched(jobs=jobs, **common)
+    elif concurrency <= 1:
+        outcomes = (_run_job(**job, **common) for job in jobs)
+    else:
+        logger.info(
+            "Dispatching prompts for '%s' with concurrency %d",
+            model_name,
+            concurrency,
+        )
+        outcomes = _run_threaded(jobs, concurrency=concurrency, **common)
+
+    counts["failed"] = sum(not ok for ok in outcomes)
+
+    _log_summary(counts, model_name, logger)
+
+
+async def arun_model_prompts(
+    *,
+    backend,
+    model_cfg: dict,
+    prompt_registry: dict,
+    stream: bool,
+    output_dir: Path,
+    backend_name: str,
+    filter_prompt: str | None = None,
+    concurrency: int = 1,
+    cache=None,
+    manifest=None,
+    sink: ResultSink | None = None,
+    metrics=None,
+    on_dispatched: Callable[[], None] | None = None,
+    model_ready: bool = False,
+    logger,
+):
+    """
+    Asyncio counterpart of run_model_prompts.
+
+    ``concurrency`` worker tasks pull jobs from the shared job stream, so at
+    most that many requests are in flight and jobs are only materialised as
+    workers become free.
+    """
+    model_name = model_cfg["name"]
+
+    try:
+        if not model_ready:
+            await asyncio.to_thread(backend.ensure_model, model_name)
+    except Exception as e:
+        logger.error("Failed to prepare model '%s': %s", model_name, e)
+        return
+
+    logger.info("=== Model: %s ===", model_name)
+
+    if sink is None:
+        sink = TextResultSink(output_dir)
+
+    counts = {"total": 0, "skipped": 0, "failed": 0, "deduplicated": 0}
+    jobs = _pending_jobs(
+        _iter_jobs(
+            model_cfg=model_cfg,
+            prompt_registry=prompt_registry,
+            filter_prompt=filter_prompt,
+            logger=logger,
+        ),
+        manifest=manifest,
+        backend_name=backend_name,
+        model_name=model_name,
+        counts=counts,
+        save_duplicate=lambda job, shared: _save_duplicate(
+            job,
+            shared,
+            model_name=model_name,
+            sink=sink,
+            backend_name=backend_name,
+            logger=logger,
+            manifest=manifest,
+            metrics=metrics,
+        ),
+        on_dispatched=on_dispatched,
+    )
+
+    logger.info(
+        "Dispatching prompts for '%s' asynchronously with concurrency %d",
+        model_name,
+        concurrency,
+    )
+
+    model_key = None
+    if cache is not None:
+        model_key = await asyncio.to_thread(_model_key, backend, model_name)
+
+    # Held around each request, so chunks of long documents share the
+    # concurrency limit with the other workers
+    slots = asyncio.Semaphore(max(concurrency, 1))
+
+    async def worker():
+        # next() on the shared generator never awaits, so workers cannot
+        # interleave inside it
+        for job in jobs:
+            ok = await _arun_job(
+                **job,
+                backend=backend,
+                model_name=model_name,
+                stream=stream,
+                sink=sink,
+                backend_name=backend_name,
+                logger=logger,
+                cache=cache,
+                model_key=model_key,
+                manifest=manifest,
+                metrics=metrics,
+                slots=slots,
+            )
+            counts["failed"] += not ok
 
-            except Exception as e:
-                logger.error("Error running prompt '%s': %s", run_id, e)
+    await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
 
+    _log_summary(counts, model_name, logger)
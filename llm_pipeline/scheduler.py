@@ -0,0 +1,200 @@
+"""
+Model-affinity scheduling of a whole config.
+
+Every ``[[models]]`` entry becomes a unit of work, and entries for the
+same model are run back to back so the server loads each model once. Each
+model is warmed (loaded with ``keep_alive``) before its first prompt, and
+the next model is prefetched while the current one finishes: as soon as its
+last prompt has been dispatched, or when it starts on backends that check
+memory before prefetching. With ``parallel_models`` > 1, that many models
+run at once; memory is not checked for them, so this is for servers known
+to have room for several.
+
+Warm-up is timed separately from generation and recorded in RunMetrics as
+the ``warm_s``/``load_s``/``warm_wait_s``/``run_s`` phases.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, List
+
+from .runner import arun_model_prompts, run_model_prompts
+
+logger = logging.getLogger(__name__)
+
+
+def group_by_model(models: List[dict]) -> List[List[dict]]:
+    """Model entries grouped by name, in order of first appearance."""
+    groups: dict[str, List[dict]] = {}
+    for model_cfg in models:
+        groups.setdefault(model_cfg["name"], []).append(model_cfg)
+    return list(groups.values())
+
+
+class ModelScheduler:
+    def __init__(
+        self,
+        models: List[dict],
+        *,
+        backend,
+        backend_name: str,
+        prewarm: bool = True,
+        parallel_models: int = 1,
+        metrics=None,
+        logger=logger,
+    ):
+        self.groups = group_by_model(models)
+        self.backend = backend
+        self.backend_name = backend_name
+        self.prewarm = prewarm
+        self.parallel_models = max(parallel_models, 1)
+        self.metrics = metrics
+        self.logger = logger
+
+        # Index of the next group to start; groups before it are running
+        # or done
+        self._next = 0
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # Warm-up
+    # -------------------------
+    def _take_next(self) -> List[dict] | None:
+        with self._lock:
+            if self._next >= len(self.groups):
+                return None
+            group = self.groups[self._next]
+            self._next += 1
+            return group
+
+    def _prefetch_next(self) -> None:
+        """Start loading the next group's model, if there is one."""
+        if not self.prewarm:
+            return
+        with self._lock:
+            if self._next >= len(self.groups):
+                return
+            name = self.groups[self._next][0]["name"]
+
+        self.logger.info("Prefetching next model '%s'", name)
+        try:
+            self.backend.prefetch_model(name)
+        except Exception as e:
+            self.logger.warning("Could not prefetch model '%s': %s", name, e)
+
+    def _warm(self, name: str) -> bool:
+        """
+        Ensure and load the model before its first prompt; returns whether
+        it is ready, so the runner need not ensure it again.
+        """
+        warm_model = getattr(self.backend, "warm_model", None)
+        if warm_model is None or not self.prewarm:
+            return False
+
+        start = perf_counter()
+        try:
+            self.backend.ensure_model(name)
+            timings = warm_model(name) or {}
+        except Exception as e:
+            # run_model_prompts reports the model as failed if it is unusable
+            self.logger.warning("Could not warm model '%s': %s", name, e)
+            return False
+        waited = perf_counter() - start
+
+        self.logger.info(
+            "Model '%s' ready after %.1f s (warm-up %.1f s, server load %.1f s)",
+            name,
+            waited,
+            timings.get("warm_s", waited),
+            timings.get("load_s", 0.0),
+        )
+        if self.metrics is not None:
+            self.metrics.record_phase(
+                self.backend_name, name, warm_wait_s=waited, **timings
+            )
+        return True
+
+    def _record_run(self, name: str, start: float) -> None:
+        if self.metrics is not None:
+            self.metrics.record_phase(
+                self.backend_name, name, run_s=perf_counter() - start
+            )
+
+    # -------------------------
+    # Execution
+    # -------------------------
+    def _run_group(self, group: List[dict], run: Callable, run_kwargs: dict):
+        name = group[0]["name"]
+        ready = self._warm(name)
+        if getattr(self.backend, "prefetch_ahead", False):
+            self._prefetch_next()
+
+        start = perf_counter()
+        for i, model_cfg in enumerate(group):
+            last = i == len(group) - 1
+            run(
+                model_cfg=model_cfg,
+                model_ready=ready,
+                on_dispatched=self._prefetch_next if last else None,
+                **run_kwargs,
+            )
+        self._record_run(name, start)
+
+    def run(self, run_kwargs: dict) -> None:
+        """Run every model with run_model_prompts(**run_kwargs)."""
+
+        def worker():
+            while (group := self._take_next()) is not None:
+                self._run_group(group, run_model_prompts, run_kwargs)
+
+        if self.parallel_models == 1:
+            worker()
+            return
+
+        self.logger.info("Running up to %d models at once", self.parallel_models)
+        with ThreadPoolExecutor(
+            max_workers=self.parallel_models, thread_name_prefix="model"
+        ) as pool:
+            for future in [pool.submit(worker) for _ in range(self.parallel_models)]:
+                future.result()
+
+    async def arun(self, run_kwargs: dict) -> None:
+        """Asyncio counterpart of run, using arun_model_prompts."""
+
+        async def run_group(group):
+            name = group[0]["name"]
+            ready = await asyncio.to_thread(self._warm, name)
+            if getattr(self.backend, "prefetch_ahead", False):
+                await asyncio.to_thread(self._prefetch_next)
+
+            # on_dispatched is called from the job stream on the event loop,
+            # so the prefetch is started on a thread rather than awaited
+            prefetches = []
+
+            def prefetch():
+                prefetches.append(
+                    asyncio.ensure_future(asyncio.to_thread(self._prefetch_next))
+                )
+
+            start = perf_counter()
+            for i, model_cfg in enumerate(group):
+                last = i == len(group) - 1
+                await arun_model_prompts(
+                    model_cfg=model_cfg,
+                    model_ready=ready,
+                    on_dispatched=prefetch if last else None,
+                    **run_kwargs,
+                )
+            await asyncio.gather(*prefetches)
+            self._record_run(name, start)
+
+        async def worker():
+            while (group := self._take_next()) is not None:
+                await run_group(group)
+
+        if self.parallel_models > 1:
+            self.logger.info("Running up to %d models at once", self.parallel_models)
+        await asyncio.gather(*(worker() for _ in range(self.parallel_models)))
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The fake Ollama server lives with the benchmarks, which use it too
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
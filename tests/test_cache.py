@@ -0,0 +1,59 @@
+import os
+from pathlib import Path
+
+from llm_pipeline.cache import EVICT_TO_FRACTION, ResponseCache, cache_key
+
+
+def _key(**overrides):
+    params = dict(
+        backend="ollama",
+        model="llama3:8b",
+        prompt="Hello",
+        system=None,
+        temperature=None,
+        options={"seed": 1},
+    )
+    params.update(overrides)
+    return cache_key(**params)
+
+
+def test_cache_key_normalizes_temperature():
+    assert _key(temperature=0.2) == _key(options={"seed": 1, "temperature": 0.2})
+    assert _key(temperature=0.2) != _key(temperature=0.7)
+    assert _key() != _key(model="llama3:8b@sha256:abc")
+
+
+def test_cache_hit_miss_and_refresh(tmp_path: Path):
+    cache = ResponseCache(tmp_path)
+    key = _key()
+
+    assert cache.get(key) is None
+    cache.put(key, {"text": "hi", "stats": {"eval_count": 1}, "wall_time_s": 0.5})
+
+    hit = cache.get(key)
+    assert hit["text"] == "hi"
+    assert hit["stats"]["cached"] is True
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    refreshed = ResponseCache(tmp_path, refresh=True)
+    assert refreshed.get(key) is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path):
+    cache = ResponseCache(tmp_path, max_bytes=13_000)
+    keys = [_key(prompt=str(i)) for i in range(3)]
+
+    for i, key in enumerate(keys):
+        cache.put(key, {"text": "x" * 4_000, "stats": {}, "wall_time_s": 0.0})
+        path = cache._path(key)
+        os.utime(path, (i, i))
+
+    cache.get(keys[0])  # refreshes entry 0, leaving entry 1 as the oldest
+    cache.put(_key(prompt="new"), {"text": "x" * 4_000, "stats": {}, "wall_time_s": 0.0})
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    # Evicted to the low-water mark, leaving room for the next entry
+    assert cache._size <= cache.max_bytes * EVICT_TO_FRACTION
+    cache.put(_key(prompt="next"), {"text": "x", "stats": {}, "wall_time_s": 0.0})
+    assert cache.get(keys[0]) is not None
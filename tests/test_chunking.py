@@ -0,0 +1,63 @@
+import random
+
+from llm_pipeline.chunking import (
+    DEFAULT_NUM_CTX,
+    chunk_budget,
+    estimate_tokens,
+    split_into_chunks,
+)
+
+
+def test_chunks_keep_paragraphs_together():
+    paragraphs = [f"Paragraph {i}. " + "Revenue grew. " * 10 for i in range(20)]
+    text = "\n\n".join(paragraphs)
+
+    chunks = split_into_chunks(text, max_tokens=100)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c) <= 100 for c in chunks)
+    # Nothing is lost and no paragraph is split across chunks
+    assert "\n\n".join(chunks) == "\n\n".join(p.strip() for p in paragraphs)
+
+
+def test_single_line_text_splits_on_sentences():
+    text = " ".join(f"Sentence {i} is about margins." for i in range(200))
+
+    chunks = split_into_chunks(text, max_tokens=50)
+
+    assert all(estimate_tokens(c) <= 50 for c in chunks)
+    assert all(c.endswith(".") for c in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_no_chunk_exceeds_budget():
+    rng = random.Random(0)
+    for _ in range(100):
+        words = [
+            "".join(rng.choice("ab.") for _ in range(rng.randrange(1, 40)))
+            + ("\n\n" if rng.random() < 0.05 else "")
+            for _ in range(rng.randrange(1, 400))
+        ]
+        max_tokens = rng.randrange(5, 80)
+        chunks = split_into_chunks(" ".join(words), max_tokens)
+        assert all(estimate_tokens(c) <= max_tokens for c in chunks)
+
+
+def test_custom_token_counter():
+    text = " ".join(["word"] * 100)
+    calls = []
+
+    def count(t):
+        calls.append(t)
+        return len(t.split())
+
+    chunks = split_into_chunks(text, 10, count_tokens=count)
+    assert calls
+    assert all(0 < len(c.split()) <= 10 for c in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_chunk_budget():
+    assert chunk_budget({}) == DEFAULT_NUM_CTX - 512
+    assert chunk_budget({"num_ctx": 8192, "num_predict": 1024}, 100) == 7068
+    assert chunk_budget({"num_ctx": 512, "num_predict": 1024}) == 128
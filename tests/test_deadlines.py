@@ -0,0 +1,254 @@
+import asyncio
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+from time import perf_counter, sleep
+
+import pytest
+from fake_ollama import FakeOllamaServer
+
+from llm_pipeline.backends.ollama_backend import OllamaBackend
+from llm_pipeline.deadlines import MIN_SAMPLES, RequestPolicy
+
+MODEL = "fake:latest"
+
+
+def test_policy_learns_per_prompt_length():
+    policy = RequestPolicy(hedge_percentile=50, deadline_factor=3, min_deadline_s=1)
+    assert policy.hedge_after(MODEL, 100) is None
+    assert policy.deadline(MODEL, 100) is None
+
+    for _ in range(MIN_SAMPLES):
+        policy.observe(MODEL, 100, 2.0)
+        policy.observe(MODEL, 5000, 20.0)
+
+    assert policy.hedge_after(MODEL, 100) == pytest.approx(2.0, rel=0.1)
+    assert policy.deadline(MODEL, 100) == pytest.approx(6.0, rel=0.1)
+    assert policy.hedge_after(MODEL, 5000) == pytest.approx(20.0, rel=0.1)
+    # Unseen lengths fall back to the model's overall distribution
+    assert policy.hedge_after(MODEL, 10) is not None
+    assert policy.hedge_after("other", 100) is None
+
+
+def test_policy_can_be_disabled_and_backoff_is_jittered():
+    policy = RequestPolicy(hedge_percentile=None, deadline_factor=0)
+    for _ in range(MIN_SAMPLES):
+        policy.observe(MODEL, 10, 1.0)
+    assert policy.hedge_after(MODEL, 10) is None
+    assert policy.deadline(MODEL, 10) is None
+
+    policy = RequestPolicy(retry_backoff_s=1.0, max_backoff_s=3.0)
+    delays = [policy.backoff(5) for _ in range(100)]
+    assert all(0 <= d <= 3.0 for d in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.fixture
+def server():
+    with FakeOllamaServer(latency_s=0.01, response_tokens=4) as server:
+        yield server
+
+
+def _run(backend, prompt: str) -> dict:
+    return backend.run_prompt(
+        model=MODEL,
+        prompt=prompt,
+        system=None,
+        temperature=None,
+        options=None,
+        stream=False,
+    )
+
+
+async def _arun(backend, prompt: str) -> dict:
+    return await backend.arun_prompt(
+        model=MODEL,
+        prompt=prompt,
+        system=None,
+        temperature=None,
+        options=None,
+        stream=False,
+    )
+
+
+def _warm_up(backend) -> None:
+    for _ in range(MIN_SAMPLES):
+        assert _run(backend, "fast")["stats"]["attempt"] == 1
+
+
+@pytest.fixture
+def other_server():
+    with FakeOllamaServer(latency_s=0.01, response_tokens=4) as server:
+        yield server
+
+
+def _hedging(*servers, **kwargs) -> OllamaBackend:
+    return OllamaBackend(
+        host=[s.url for s in servers],
+        hedge_percentile=95,
+        deadline_factor=3,
+        min_deadline_s=5,
+        **kwargs,
+    )
+
+
+def test_slow_request_is_hedged_to_another_host(server, other_server):
+    backend = _hedging(server, other_server)
+    _warm_up(backend)
+
+    server.stall_next("slow", 1.0)
+    result = _run(backend, "slow")
+
+    assert result["wall_time_s"] < 0.9
+    assert result["stats"]["attempt"] == 2
+    assert result["stats"]["hedged"] is True
+    assert result["host"] == other_server.url
+
+
+def test_slow_request_is_hedged_async(server, other_server):
+    backend = _hedging(server, other_server)
+    _warm_up(backend)
+
+    async def main():
+        try:
+            server.stall_next("slow", 1.0)
+            return await _arun(backend, "slow")
+        finally:
+            await backend.aclose()
+
+    result = asyncio.run(main())
+    assert result["wall_time_s"] < 0.9
+    assert (result["stats"]["attempt"], result["stats"]["hedged"]) == (2, True)
+    assert result["host"] == other_server.url
+
+
+def test_no_hedging_by_default_or_on_a_single_host(server):
+    backend = OllamaBackend(host=server.url)
+    assert backend.policy.hedge_quantile is None
+    assert backend.policy.deadline_factor is None
+
+    backend = _hedging(server)
+    _warm_up(backend)
+    server.stall_next("slow", 0.5)
+    requests = server.requests
+    result = _run(backend, "slow")
+
+    assert result["stats"]["hedged"] is False
+    assert server.requests == requests + 1
+
+
+def test_abandoned_attempt_is_not_sent(server, other_server, monkeypatch):
+    backend = _hedging(server, other_server, adaptive_concurrency=True)
+    _warm_up(backend)
+
+    # The hedge waits for a slot on the other host until after the first
+    # attempt has won
+    limiter = backend._limiter(backend.hosts[1], MODEL)
+    acquire = limiter.acquire
+
+    def slow_acquire():
+        sleep(0.6)
+        acquire()
+
+    monkeypatch.setattr(limiter, "acquire", slow_acquire)
+    server.stall_next("slow", 0.3)
+    result = _run(backend, "slow")
+    assert result["host"] == server.url
+    assert result["stats"]["hedged"] is True
+
+    sleep(0.6)
+    assert other_server.requests == 0
+    assert limiter.in_flight == 0
+    assert [h.outstanding for h in backend.hosts] == [0, 0]
+
+
+def test_missed_deadline_is_retried(server):
+    backend = OllamaBackend(
+        host=server.url,
+        deadline_factor=3,
+        min_deadline_s=0.2,
+        retry_backoff_s=0.01,
+    )
+    _warm_up(backend)
+
+    server.stall_next("slow", 1.0)
+    result = _run(backend, "slow")
+
+    assert result["wall_time_s"] < 0.9
+    assert result["stats"]["attempt"] == 2
+    assert result["stats"]["retries"] == 1
+    assert result["stats"]["hedged"] is False
+
+
+def test_stalled_attempt_does_not_block_exit(server):
+    # The backend runs in a child process, which must exit while its
+    # abandoned attempt is still waiting on the stalled server
+    script = textwrap.dedent(
+        f"""
+        from llm_pipeline.backends.ollama_backend import OllamaBackend
+        from llm_pipeline.deadlines import DeadlineExceeded, MIN_SAMPLES
+
+        backend = OllamaBackend(
+            host={server.url!r}, deadline_factor=3, min_deadline_s=0.5, max_retries=0
+        )
+        kwargs = dict(system=None, temperature=None, options=None, stream=False)
+        for _ in range(MIN_SAMPLES):
+            backend.run_prompt(model={MODEL!r}, prompt="fast", **kwargs)
+        try:
+            backend.run_prompt(model={MODEL!r}, prompt="stuck", **kwargs)
+        except DeadlineExceeded:
+            print("deadline")
+        """
+    )
+    server.stall_next("stuck", 20)
+
+    start = perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=Path(__file__).resolve().parents[1],
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "deadline"
+    assert perf_counter() - start < 10
+
+
+def test_failures_retried_with_backoff(server, monkeypatch):
+    backend = OllamaBackend(host=server.url, max_retries=3)
+    delays = []
+
+    def backoff(retry):
+        delays.append(retry)
+        # The server comes back during the second wait
+        if retry == 1:
+            server.down = False
+        return 0.0
+
+    monkeypatch.setattr(backend.policy, "backoff", backoff)
+    server.down = True
+
+    result = _run(backend, "hello")
+
+    assert delays == [0, 1]
+    assert result["stats"]["retries"] == 2
+    assert result["text"]
+
+
+def test_errors_not_retried_when_not_transient(server, monkeypatch):
+    backend = OllamaBackend(host=server.url)
+    delays = []
+    monkeypatch.setattr(backend.policy, "backoff", delays.append)
+    with pytest.raises(Exception, match="not found"):
+        backend.run_prompt(
+            model="missing:latest",
+            prompt="hi",
+            system=None,
+            temperature=None,
+            options=None,
+            stream=False,
+        )
+    assert delays == []
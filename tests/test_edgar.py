@@ -0,0 +1,177 @@
+import multiprocessing
+import os
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("bs4")
+
+from llm_pipeline.edgar import cli
+from llm_pipeline.edgar.cli import EXTRACTED, FAILED, MISSING, process_directory
+from llm_pipeline.edgar.extract import (
+    extract_mda_from_file,
+    extract_mda_section,
+    fast_html_to_text,
+    html_to_text,
+    soup_html_to_text,
+)
+from llm_pipeline.edgar.sections import SectionIndex
+from llm_pipeline.edgar.submission import (
+    index_documents,
+    open_submission,
+    select_documents,
+)
+
+MDA_BODY = "Revenue increased due to higher volumes. " * 20
+
+FILING = f"""
+<html><body>
+<p>ITEM 1. Business</p><p>We make things.</p>
+<p>ITEM 7. Management's Discussion and Analysis</p>
+<p>{MDA_BODY}</p>
+<p>ITEM 8. Financial Statements</p>
+</body></html>
+"""
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_process_directory(tmp_path: Path, workers: int):
+    src = tmp_path / "filings"
+    src.mkdir()
+    (src / "a.txt").write_text(FILING, encoding="utf-8")
+    (src / "b.txt").write_text(FILING, encoding="utf-8")
+    (src / "c.txt").write_text("<html><body>No sections</body></html>", encoding="utf-8")
+    (src / "d.txt").write_text("", encoding="utf-8")
+
+    out = tmp_path / "out"
+    summary = process_directory(src, out, model="llama3", workers=workers)
+
+    assert summary == {EXTRACTED: 2, MISSING: 1, FAILED: 1}
+    mda = (out / "a_MD-and-A.txt").read_text(encoding="utf-8")
+    assert mda.startswith("ITEM 7.")
+    assert "Revenue increased" in mda
+
+
+def test_process_directory_survives_a_dead_worker(tmp_path: Path, monkeypatch):
+    # Workers are forked, so they inherit the patch
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("needs the fork start method")
+    process_file = cli.process_file
+
+    def crash_on_b(input_file, *args, **kwargs):
+        if input_file.stem == "b":
+            os._exit(1)
+        return process_file(input_file, *args, **kwargs)
+
+    monkeypatch.setattr(cli, "process_file", crash_on_b)
+
+    src = tmp_path / "filings"
+    src.mkdir()
+    for name in "abcde":
+        (src / f"{name}.txt").write_text(FILING, encoding="utf-8")
+
+    summary = process_directory(src, tmp_path / "out", model="llama3", workers=2)
+
+    assert summary == {EXTRACTED: 4, FAILED: 1}
+    assert not (tmp_path / "out" / "b_MD-and-A.txt").exists()
+
+
+def test_fast_html_to_text_matches_soup(tmp_path: Path):
+    path = tmp_path / "filing.txt"
+    path.write_text(
+        FILING.replace("<p>ITEM 1.", "<script>var x = 1;</script><p>ITEM 1.")
+        .replace("We make things.", "We <b>make</b> th&amp;ings.")
+        .replace("<body>", "<body><ix:header><ix:hidden>FACT</ix:hidden></ix:header>"),
+        encoding="utf-8",
+    )
+
+    fast = fast_html_to_text(path)
+    soup = soup_html_to_text(path)
+
+    assert "FACT" not in fast
+    assert "var x" not in fast
+    assert " ".join(fast.split()) == " ".join(soup.replace("FACT", "").split())
+    assert extract_mda_section(fast) == extract_mda_section(soup)
+
+
+def _submission(*documents: tuple[str, str]) -> str:
+    parts = ["<SEC-DOCUMENT>0000000000-24-000001.txt\n<SEC-HEADER>\n</SEC-HEADER>\n"]
+    for seq, (doc_type, body) in enumerate(documents, start=1):
+        parts.append(
+            f"<DOCUMENT>\n<TYPE>{doc_type}\n<SEQUENCE>{seq}\n"
+            f"<FILENAME>doc{seq}.htm\n<TEXT>\n{body}\n</TEXT>\n</DOCUMENT>\n"
+        )
+    parts.append("</SEC-DOCUMENT>\n")
+    return "".join(parts)
+
+
+def test_index_documents(tmp_path: Path):
+    path = tmp_path / "submission.txt"
+    path.write_text(
+        _submission(("10-K", FILING), ("EX-13", "<p>exhibit</p>"), ("GRAPHIC", "begin 644 x.jpg")),
+        encoding="utf-8",
+    )
+
+    with open_submission(path) as data:
+        docs = index_documents(data)
+        assert [d.type for d in docs] == ["10-K", "EX-13", "GRAPHIC"]
+        assert docs[1].filename == "doc2.htm"
+        assert bytes(data[docs[1].start:docs[1].end]).strip() == b"<p>exhibit</p>"
+        assert [d.type for d in select_documents(docs, ("EX-*",))] == ["EX-13"]
+
+
+def test_html_to_text_parses_only_primary_document(tmp_path: Path):
+    decoy = "<p>ITEM 7. Exhibit decoy</p><p>ITEM 8.</p>"
+    path = tmp_path / "submission.txt"
+    path.write_text(
+        _submission(("EX-99", decoy), ("10-K", FILING), ("EX-13", "<p>annual report</p>")),
+        encoding="utf-8",
+    )
+
+    text = html_to_text(path)
+    assert "Revenue increased" in text
+    assert "decoy" not in text
+    assert "annual report" not in text
+
+    assert "annual report" in html_to_text(path, ("10-K", "EX-13"))
+    assert extract_mda_from_file(path).startswith("ITEM 7. Management")
+
+
+def test_section_index_skips_table_of_contents():
+    body = "Revenue grew. " * 50
+    text = (
+        "TABLE OF CONTENTS Item 1A. Risk Factors 12 Item 7. MD&A 30 "
+        "Item 7A. Market Risk 44 Item 8. Financial Statements 45 "
+        "ITEM 1A.\nRISK FACTORS Our business is risky. "
+        f"ITEM 7. MANAGEMENT'S DISCUSSION {body} as discussed in Item 8 below. {body} "
+        "ITEM 7A. QUANTITATIVE DISCLOSURES rates. ITEM 8. STATEMENTS"
+    )
+    index = SectionIndex(text)
+
+    mda = extract_mda_section(text, index)
+    assert mda.startswith("ITEM 7. MANAGEMENT'S")
+    assert mda.endswith(body.strip())
+    assert "discussed in Item 8 below" in mda
+
+    assert index.section("1a") == "ITEM 1A. RISK FACTORS Our business is risky."
+    assert index.section("7A") == "ITEM 7A. QUANTITATIVE DISCLOSURES rates."
+    assert index.section("9") is None
+
+
+def test_section_index_ignores_in_body_cross_references():
+    body = "Revenue grew. " * 50
+    text = (
+        "ITEM 1. BUSINESS We sell things, see Part II, Item 7 of this report. "
+        "More business. ITEM 1A. RISK FACTORS Risky. "
+        f"ITEM 7. MANAGEMENT'S DISCUSSION {body}"
+        "ITEM 7A. MARKET RISK Rates. ITEM 15. EXHIBITS List of exhibits."
+    )
+    index = SectionIndex(text)
+
+    assert index.section("7").startswith("ITEM 7. MANAGEMENT'S")
+    assert index.section("1") == (
+        "ITEM 1. BUSINESS We sell things, see Part II, Item 7 of this report. "
+        "More business."
+    )
+    # The last item runs to the end of the filing
+    assert index.section("15") == "ITEM 15. EXHIBITS List of exhibits."
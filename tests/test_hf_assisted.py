@@ -0,0 +1,83 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from llm_pipeline.cli import _assistant_models
+
+
+def test_assistant_models_conflicts():
+    models = [
+        {"name": "big", "assistant_model": "small"},
+        {"name": "big", "assistant_model": "small", "prompts": ["p"]},
+        {"name": "other"},
+    ]
+    assert _assistant_models(models) == {"big": "small"}
+
+    with pytest.raises(ValueError, match="Conflicting assistant_model"):
+        _assistant_models(models + [{"name": "big", "assistant_model": "tiny"}])
+
+
+def test_assistant_must_share_the_vocabulary(monkeypatch):
+    hf_backend = pytest.importorskip("llm_pipeline.backends.hf_backend")
+
+    def tokenizer(vocab):
+        return SimpleNamespace(get_vocab=lambda: vocab)
+
+    monkeypatch.setattr(
+        hf_backend.AutoTokenizer,
+        "from_pretrained",
+        staticmethod(lambda name: tokenizer({"a": 0, "b": 1})),
+    )
+    with pytest.raises(ValueError, match="does not share the tokenizer"):
+        hf_backend.HuggingFaceBackend._load_assistant(
+            None, "small", "big", tokenizer({"a": 0, "c": 1})
+        )
+
+
+class _Module:
+    def __init__(self, name_or_path=""):
+        self.name_or_path = name_or_path
+
+    def register_forward_pre_hook(self, hook):
+        return SimpleNamespace(remove=lambda: None)
+
+    register_forward_hook = register_forward_pre_hook
+
+
+def test_draft_stats():
+    hf_backend = pytest.importorskip("llm_pipeline.backends.hf_backend")
+
+    draft = hf_backend._DraftStats(_Module(), _Module("small"), threading.Lock())
+    draft.passes = {"model": 4, "assistant": 12}
+    draft.pass_s = [0.5, 0.1, 0.1, 0.1]
+
+    stats = draft.stats(10, 1.0)
+    assert stats["assistant_model"] == "small"
+    assert (stats["draft_tokens"], stats["accepted_tokens"]) == (12, 6)
+    assert stats["acceptance_rate"] == pytest.approx(0.5)
+    # Prefill plus nine decode passes alone, against 1 s assisted
+    assert stats["speedup_estimate"] == pytest.approx(1.4)
+
+    assert hf_backend._DraftStats(_Module(), _Module(), threading.Lock()).stats(
+        0, 1.0
+    )["acceptance_rate"] is None
+
+
+def test_assisted_generation_serialized_per_model():
+    hf_backend = pytest.importorskip("llm_pipeline.backends.hf_backend")
+
+    lock = threading.Lock()
+    model, assistant = _Module(), _Module()
+    entered = threading.Event()
+
+    def other():
+        with hf_backend._DraftStats(model, assistant, lock):
+            entered.set()
+
+    with hf_backend._DraftStats(model, assistant, lock):
+        thread = threading.Thread(target=other)
+        thread.start()
+        assert not entered.wait(0.1)
+    thread.join()
+    assert entered.is_set()
@@ -0,0 +1,137 @@
+import pytest
+
+pytest.importorskip("llm_pipeline.backends.hf_backend")
+
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+from llm_pipeline.backends import hf_backend
+
+WORDS = "the a cat dog sat ran on under mat rug and then it was red blue".split()
+SAMPLING = {"do_sample": True, "temperature": 1.5, "max_new_tokens": 8}
+GREEDY = {"do_sample": False, "max_new_tokens": 6}
+
+
+def _tokenizer():
+    vocab = {"[PAD]": 0, "[EOS]": 1, "[UNK]": 2}
+    vocab.update({word: i for i, word in enumerate(WORDS, start=len(vocab))})
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        pad_token="[PAD]",
+        eos_token="[EOS]",
+        unk_token="[UNK]",
+    )
+
+
+def _model(seed: int):
+    torch.manual_seed(seed)
+    config = GPT2Config(
+        vocab_size=len(WORDS) + 3,
+        n_positions=64,
+        n_embd=32,
+        n_layer=2,
+        n_head=2,
+        pad_token_id=0,
+        bos_token_id=1,
+        # Never stop early, so every row generates max_new_tokens
+        eos_token_id=None,
+    )
+    return GPT2LMHeadModel(config).eval()
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    # A tiny random model, "loaded" through the real _load_pipeline
+    weights = {"main": _model(0), "draft": _model(1)}
+    monkeypatch.setattr(
+        hf_backend.AutoTokenizer, "from_pretrained", lambda name: _tokenizer()
+    )
+    monkeypatch.setattr(
+        hf_backend.AutoModelForCausalLM,
+        "from_pretrained",
+        lambda name, **kwargs: weights[name],
+    )
+    return hf_backend.HuggingFaceBackend(device="cpu", max_memory_gb=1)
+
+
+def _texts(results):
+    return [r["text"] for r in results]
+
+
+def test_batches_are_left_padded(backend):
+    backend.batch_size = 2
+    prompts = ["the cat sat on the mat", "a dog", "it was red and then blue", "cat"]
+
+    batched = backend.run_prompts_batch(model="main", prompts=prompts, options=GREEDY)
+
+    assert backend._get_pipeline("main").tokenizer.padding_side == "left"
+    # Padding leaves greedy output unchanged, and results keep prompt order
+    assert _texts(batched) == [
+        backend.run_prompt(model="main", prompt=p, options=GREEDY)["text"]
+        for p in prompts
+    ]
+    assert [r["stats"]["prompt_eval_count"] for r in batched] == [6, 2, 6, 1]
+
+
+def test_samples_are_prompt_major_and_seeded_per_row(backend):
+    prompts = ["the cat sat", "a dog ran"]
+    seeds = [11, 12, 13]
+
+    results = backend.run_prompts_batch(
+        model="main", prompts=prompts, options=SAMPLING, seeds=seeds
+    )
+
+    assert len(results) == len(prompts) * len(seeds)
+    for i in range(len(prompts)):
+        for sample, seed in enumerate(seeds):
+            stats = results[i * len(seeds) + sample]["stats"]
+            assert (stats["sample"], stats["samples"], stats["seed"]) == (
+                sample + 1,
+                3,
+                seed,
+            )
+    assert len(set(_texts(results[:3]))) > 1
+
+    # A sample depends on its own seed only, not on the rest of the batch
+    alone = backend.run_prompts_batch(
+        model="main", prompts=prompts[1:], options=SAMPLING, seeds=[13, 11]
+    )
+    assert _texts(alone) == [results[5]["text"], results[3]["text"]]
+
+    backend.batch_size = 3
+    again = backend.run_prompts_batch(
+        model="main", prompts=prompts, options=SAMPLING, seeds=seeds
+    )
+    assert _texts(again) == _texts(results)
+
+
+def test_greedy_samples_repeat_one_generation(backend):
+    results = backend.run_prompts_batch(
+        model="main", prompts=["the cat"], options=GREEDY, seeds=[1, 2]
+    )
+    assert results[0]["text"] == results[1]["text"]
+    assert [r["stats"]["seed"] for r in results] == [1, 2]
+
+
+def test_assisted_batch_is_prompt_major_and_seeded(backend):
+    backend.assistant_models = {"main": "draft"}
+    prompts = ["the cat sat", "a dog ran"]
+
+    results = backend.run_prompts_batch(
+        model="main", prompts=prompts, options=SAMPLING, seeds=[5, 6]
+    )
+
+    assert [(r["stats"]["sample"], r["stats"]["seed"]) for r in results] == [
+        (1, 5),
+        (2, 6),
+        (1, 5),
+        (2, 6),
+    ]
+    assert all("assisted" in r["stats"] for r in results)
+    single = backend.run_prompt(
+        model="main", prompt=prompts[1], options={**SAMPLING, "seed": 6}
+    )
+    assert results[3]["text"] == single["text"]
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+from llm_pipeline.backends.hf_profile import PerformanceProfile, parse_cpu_list
+
+
+def test_parse_cpu_list():
+    assert parse_cpu_list("0-3, 8") == [0, 1, 2, 3, 8]
+    assert parse_cpu_list([2, 1, 2]) == [1, 2]
+    with pytest.raises(ValueError):
+        parse_cpu_list("a-b")
+    with pytest.raises(ValueError):
+        parse_cpu_list("")
+
+
+def test_cpu_preset_with_overrides():
+    profile = PerformanceProfile(device="cpu", profile="cpu", compile=False)
+    assert profile.dtype == "auto"
+    assert profile.attn_implementation == "sdpa"
+    assert profile.cache_implementation == "static"
+    assert profile.compile is False
+
+    plain = PerformanceProfile(device="cpu", cpu_affinity="0-1")
+    assert (plain.dtype, plain.compile, plain.cache_implementation) == (
+        None,
+        False,
+        None,
+    )
+    assert plain.cpu_affinity == [0, 1]
+
+
+def test_int8_quantization_loads_float32_on_cpu_only():
+    profile = PerformanceProfile(device="cpu", profile="cpu", quantize="int8")
+    assert profile.dtype == "float32"
+
+    with pytest.raises(ValueError):
+        PerformanceProfile(device="cuda", quantize="int8")
+    with pytest.raises(ValueError):
+        PerformanceProfile(device="cpu", quantize="int4")
+    with pytest.raises(ValueError):
+        PerformanceProfile(device="cpu", profile="turbo")
+
+
+def test_fingerprint_covers_profile_and_assistant():
+    hf_backend = pytest.importorskip("llm_pipeline.backends.hf_backend")
+
+    model_obj = SimpleNamespace(config=SimpleNamespace(_commit_hash="abc"))
+
+    def backend(dtype, assistant_models):
+        backend = object.__new__(hf_backend.HuggingFaceBackend)
+        backend.assistant_models = assistant_models
+        backend.performance = SimpleNamespace(settings=lambda m: {"dtype": dtype})
+        backend._get_pipeline = lambda model: SimpleNamespace(model=model_obj)
+        return backend
+
+    base = backend("float32", {}).model_fingerprint("m")
+    assert base.startswith("m@")
+    assert backend("float32", {}).model_fingerprint("m") == base
+    assert backend("bfloat16", {}).model_fingerprint("m") != base
+    assert backend("float32", {"m": "draft"}).model_fingerprint("m") != base
+    model_obj.config._commit_hash = "def"
+    assert backend("float32", {}).model_fingerprint("m") != base
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+
+import pytest
+
+from llm_pipeline import limiter as limiter_module
+from llm_pipeline.limiter import AdaptiveLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(limiter_module, "perf_counter", clock)
+    return clock
+
+
+def _window(limiter, clock, *, tokens_per_s, queue_s=0.0, server_s=1.0):
+    """Complete one decision window with the limiter saturated."""
+    n = max(limiter.limit, limiter_module.MIN_WINDOW)
+    clock.now += 1.0
+    for _ in range(n):
+        if not limiter.in_flight:
+            for _ in range(limiter.limit):
+                limiter.acquire()
+        limiter.release(
+            tokens=round(tokens_per_s / n),
+            wall_s=server_s + queue_s,
+            server_s=server_s,
+        )
+    while limiter.in_flight:
+        limiter.release()
+
+
+def test_slow_start_then_additive_increase(clock):
+    limiter = AdaptiveLimiter("m", max_limit=16)
+
+    _window(limiter, clock, tokens_per_s=10)
+    assert limiter.limit == 2
+    _window(limiter, clock, tokens_per_s=20)
+    assert limiter.limit == 4
+
+    # A flat window ends slow start and keeps the limit
+    _window(limiter, clock, tokens_per_s=20)
+    assert limiter.limit == 4
+    _window(limiter, clock, tokens_per_s=30)
+    assert limiter.limit == 5
+
+
+def test_backs_off_on_queueing_delay(clock):
+    limiter = AdaptiveLimiter("m", initial=8)
+
+    _window(limiter, clock, tokens_per_s=100, queue_s=0.0)
+    assert limiter.limit == 16
+    _window(limiter, clock, tokens_per_s=100, queue_s=2.0)
+    assert limiter.limit == 12
+    # Slow start is over; probing resumes one request at a time
+    _window(limiter, clock, tokens_per_s=200, queue_s=0.0)
+    assert limiter.limit == 13
+
+
+def test_overload_backs_off_once_per_window(clock):
+    limiter = AdaptiveLimiter("m", initial=8)
+    for _ in range(3):
+        limiter.acquire()
+    for _ in range(3):
+        limiter.release(overloaded=True)
+    assert limiter.limit == 6
+    assert limiter.in_flight == 0
+
+
+def test_waiters_woken_in_order():
+    limiter = AdaptiveLimiter("m", initial=1)
+    limiter.acquire()
+
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.05)
+
+    limiter.release()
+    assert acquired.wait(1)
+    thread.join()
+    assert limiter.in_flight == 1
+
+
+def test_async_waiters():
+    async def main():
+        limiter = AdaptiveLimiter("m", initial=2)
+        active = 0
+        peak = 0
+
+        async def task():
+            nonlocal active, peak
+            await limiter.aacquire()
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            limiter.release()
+
+        await asyncio.gather(*(task() for _ in range(10)))
+
+        # A cancelled waiter gives its place back
+        await limiter.aacquire()
+        await limiter.aacquire()
+        waiting = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        limiter.release()
+        limiter.release()
+        return peak, limiter.in_flight
+
+    assert asyncio.run(main()) == (2, 0)
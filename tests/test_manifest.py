@@ -0,0 +1,32 @@
+from pathlib import Path
+
+from llm_pipeline.manifest import RunManifest
+
+
+def test_manifest_roundtrip(tmp_path: Path):
+    path = tmp_path / "manifest.jsonl"
+
+    manifest = RunManifest(path)
+    manifest.record("ollama", "llama3", "p-1", "abc")
+    manifest.record("ollama", "llama3", "p-2", "def")
+    manifest.record("ollama", "llama3", "p-2", "xyz")
+    manifest.close()
+
+    # Simulate a job killed mid-write
+    with path.open("a", encoding="utf-8") as f:
+        f.write('{"backend": "ollama", "mod')
+
+    resumed = RunManifest(path, resume=True)
+    assert resumed.should_skip("ollama", "llama3", "p-1", "abc")
+    assert not resumed.should_skip("ollama", "llama3", "p-1", "changed")
+    assert resumed.should_skip("ollama", "llama3", "p-2", "xyz")
+    assert not resumed.should_skip("ollama", "llama3", "p-3", "abc")
+    # Recorded on a line of its own, not glued to the partial one
+    resumed.record("ollama", "llama3", "p-3", "abc")
+    resumed.close()
+
+    fresh = RunManifest(path)
+    assert fresh.is_complete("ollama", "llama3", "p-1", "abc")
+    assert not fresh.should_skip("ollama", "llama3", "p-1", "abc")
+    assert fresh.is_complete("ollama", "llama3", "p-3", "abc")
+    fresh.close()
@@ -0,0 +1,106 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from llm_pipeline.metrics import Histogram, RunMetrics, result_metrics
+
+
+def test_histogram_quantiles_within_one_bucket():
+    rng = random.Random(0)
+    values = sorted(rng.lognormvariate(0, 1) for _ in range(10_000))
+
+    h = Histogram()
+    for v in values:
+        h.observe(v)
+
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        assert h.quantile(q) == pytest.approx(exact, rel=0.1)
+
+    assert h.count == len(values)
+    assert h.quantile(1.0) == values[-1]
+
+
+def test_histogram_empty_and_overflow():
+    h = Histogram(low=1, high=8)
+    assert h.quantile(0.5) is None
+
+    h.observe(1000)
+    assert h.quantile(0.99) == 1000
+
+
+def test_result_metrics_from_ollama_stats():
+    m = result_metrics(
+        {
+            "text": "hi",
+            "stats": {
+                "prompt_eval_count": 100,
+                "prompt_eval_duration": 500_000_000,
+                "load_duration": 250_000_000,
+                "eval_count": 40,
+                "eval_duration": 2_000_000_000,
+            },
+            "wall_time_s": 3.0,
+        },
+        queue_wait_s=0.5,
+        bytes_written=123,
+    )
+
+    assert m["ttft_s"] == pytest.approx(0.75)
+    assert m["prompt_tokens_per_s"] == pytest.approx(200)
+    assert m["generation_tokens_per_s"] == pytest.approx(20)
+    assert m["latency_s"] == 3.0
+    assert m["queue_wait_s"] == 0.5
+    assert m["bytes_written"] == 123
+
+
+def test_result_metrics_prefers_measured_ttft():
+    m = result_metrics(
+        {
+            "text": "hi",
+            "stats": {"time_to_first_token_s": 0.1, "prompt_eval_duration": 9},
+            "wall_time_s": 1.0,
+        }
+    )
+    assert m["ttft_s"] == 0.1
+    assert m["generation_tokens_per_s"] is None
+
+
+def _result(wall_time_s, cached=False):
+    return {
+        "text": "x",
+        "stats": {"eval_count": 10, "eval_duration": 1_000_000_000, "cached": cached},
+        "wall_time_s": wall_time_s,
+    }
+
+
+def test_run_metrics_reports(tmp_path: Path):
+    metrics = RunMetrics()
+    for i in range(1, 101):
+        metrics.record("ollama", "llama3:8b", result_metrics(_result(i / 100)))
+    metrics.record("ollama", "llama3:8b", result_metrics(_result(99, cached=True)))
+    metrics.record_failure("ollama", "llama3:8b")
+
+    metrics.write_json(tmp_path / "metrics.json")
+    summary = json.loads((tmp_path / "metrics.json").read_text())
+    (entry,) = summary["models"]
+
+    assert entry["completed"] == 101
+    assert entry["cached"] == 1
+    assert entry["failed"] == 1
+    assert entry["generated_tokens"] == 1000
+    # The cached result is not counted as a 99 s generation
+    assert entry["latency_s"]["max"] == 1.0
+    assert entry["latency_s"]["p50"] == pytest.approx(0.5, rel=0.1)
+
+    metrics.write_prometheus(tmp_path / "metrics.prom")
+    text = (tmp_path / "metrics.prom").read_text()
+    labels = 'backend="ollama",model="llama3:8b"'
+
+    assert f'llm_pipeline_prompts_total{{{labels},status="failed"}} 1' in text
+    assert f'llm_pipeline_latency_seconds_bucket{{{labels},le="+Inf"}} 100' in text
+    assert f'llm_pipeline_latency_seconds_bucket{{{labels},le="0.512"}} 51' in text
+    assert f'llm_pipeline_generation_tokens_per_s{{{labels},quantile="0.5"}} 10' in text
+    assert "# TYPE llm_pipeline_latency_seconds histogram" in text
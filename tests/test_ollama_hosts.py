@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import socket
+from pathlib import Path
+
+import pytest
+from fake_ollama import FakeOllamaServer
+
+from llm_pipeline.backends.ollama_backend import OllamaBackend, parse_hosts
+from llm_pipeline.metrics import RunMetrics
+from llm_pipeline.runner import arun_model_prompts, run_model_prompts
+
+logger = logging.getLogger(__name__)
+
+MODEL = "fake:latest"
+
+
+@pytest.fixture
+def servers():
+    servers = [
+        FakeOllamaServer(latency_s=0.02, response_tokens=8).start()
+        for _ in range(2)
+    ]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def _closed_port_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def _run(tmp_path: Path, backend, *, n_prompts=40, use_async=False) -> RunMetrics:
+    prompt_file = tmp_path / "prompts.txt"
+    prompt_file.write_text(
+        "\n".join(f"prompt {i}" for i in range(n_prompts)), encoding="utf-8"
+    )
+    metrics = RunMetrics()
+    kwargs = dict(
+        backend=backend,
+        model_cfg={"name": MODEL, "prompts": ["p"]},
+        prompt_registry={"p": {"prompt_file": str(prompt_file)}},
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="ollama",
+        concurrency=12,
+        metrics=metrics,
+        logger=logger,
+    )
+    if use_async:
+        asyncio.run(arun_model_prompts(**kwargs))
+    else:
+        run_model_prompts(**kwargs)
+    return metrics
+
+
+def _hosts(metrics: RunMetrics) -> dict:
+    return {h["host"]: h["completed"] for h in metrics.summary()["hosts"]}
+
+
+def test_parse_hosts():
+    assert parse_hosts("http://a:1, http://b:2,") == ["http://a:1", "http://b:2"]
+    assert parse_hosts(["http://a:1", "http://a:1"]) == ["http://a:1"]
+    with pytest.raises(ValueError):
+        parse_hosts("")
+
+
+def test_least_outstanding_with_model_affinity():
+    backend = OllamaBackend(host="http://a:1,http://b:2")
+    a, b = backend.hosts
+
+    # New work for a model stays on the host serving it...
+    assert backend._acquire("m", []) is a
+    assert backend._acquire("m", []) is a
+    # ...until that host is AFFINITY_REQUESTS busier than the others
+    a.outstanding = 4
+    assert backend._acquire("m", []) is a
+    assert backend._acquire("m", []) is b
+    # A different model goes to the least busy host
+    assert backend._acquire("other", []) is b
+    b.healthy = False
+    assert backend._acquire("other", []) is a
+
+
+def test_requests_spread_over_hosts(tmp_path: Path, servers):
+    backend = OllamaBackend(host=[s.url for s in servers])
+
+    metrics = _run(tmp_path, backend)
+
+    served = _hosts(metrics)
+    assert sum(served.values()) == 40
+    assert set(served) == {s.url for s in servers}
+    assert all(s.requests > 0 for s in servers)
+
+
+def test_failover_from_host_that_stops_responding(tmp_path: Path, servers):
+    up, down = servers
+    backend = OllamaBackend(host=[down.url, up.url])
+    backend.ensure_model(MODEL)
+    down.down = True
+
+    metrics = _run(tmp_path, backend, use_async=True)
+
+    (entry,) = metrics.summary()["models"]
+    assert (entry["completed"], entry["failed"]) == (40, 0)
+    assert _hosts(metrics) == {up.url: 40}
+    assert not backend.hosts[0].healthy
+
+
+def test_unreachable_host_skipped_at_health_check(tmp_path: Path, servers):
+    backend = OllamaBackend(host=[_closed_port_url(), servers[0].url])
+
+    metrics = _run(tmp_path, backend, n_prompts=5)
+
+    assert _hosts(metrics) == {servers[0].url: 5}
+
+
+def test_all_hosts_down_raises():
+    backend = OllamaBackend(host=[_closed_port_url()])
+    with pytest.raises(ConnectionError):
+        backend.ensure_model(MODEL)
+
+
+def test_adaptive_concurrency_backs_off_to_server_parallelism(tmp_path: Path):
+    with FakeOllamaServer(
+        parallel=2, latency_s=0.02, tokens_per_s=1000, response_tokens=20
+    ) as server:
+        backend = OllamaBackend(host=server.url, adaptive_concurrency=True)
+        metrics = _run(tmp_path, backend, n_prompts=80)
+
+    (entry,) = metrics.summary()["models"]
+    assert entry["completed"] == 80
+    (limiter,) = backend._limiters.values()
+    # The runner allows 12 in flight, but the server only runs 2 at once
+    assert limiter.limit <= 4
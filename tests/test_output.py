@@ -0,0 +1,151 @@
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from llm_pipeline.output import (
+    JsonlResultSink,
+    TextResultSink,
+    make_sink,
+    save_result,
+)
+
+RESULT = {
+    "text": "hello",
+    "stats": {
+        "response": "hello",
+        "prompt_eval_count": 3,
+        "eval_count": 2,
+        "eval_duration": 1_500_000,
+        "total_duration": 4_000_000,
+    },
+    "wall_time_s": 0.25,
+}
+
+
+def _write(sink, run_id, on_commit=None):
+    sink.write(
+        backend="ollama",
+        model="llama3:8b",
+        prompt_id=run_id,
+        prompt="Say hello",
+        system=None,
+        result=RESULT,
+        on_commit=on_commit,
+    )
+
+
+def test_text_sink_commits_immediately(tmp_path: Path):
+    committed = []
+    sink = TextResultSink(tmp_path)
+    _write(sink, "p1", on_commit=lambda: committed.append("p1"))
+
+    assert committed == ["p1"]
+    report = (tmp_path / "ollama" / "llama3:8b" / "p1.txt").read_text()
+    assert "- Response tokens: 2" in report
+    assert "Time to first token" not in report
+
+
+def test_text_report_includes_streaming_latency(tmp_path: Path):
+    result = {
+        **RESULT,
+        "stats": {
+            **RESULT["stats"],
+            "time_to_first_token_s": 0.12,
+            "inter_token_latency_s": 0.015,
+        },
+    }
+    save_result(
+        backend="huggingface",
+        model="gpt2",
+        prompt_id="p1",
+        prompt="Say hello",
+        system=None,
+        result=result,
+        output_dir=tmp_path,
+    )
+
+    report = (tmp_path / "huggingface" / "gpt2" / "p1.txt").read_text()
+    assert "- Time to first token: 120.0 ms" in report
+    assert "- Per-token latency: 15.0 ms" in report
+
+
+def test_jsonl_sink_buffers_until_flush(tmp_path: Path):
+    committed = []
+    sink = JsonlResultSink(tmp_path, flush_every=2, flush_interval_s=3600)
+    path = tmp_path / "ollama" / "llama3:8b" / "results.jsonl"
+
+    _write(sink, "p1", on_commit=lambda: committed.append("p1"))
+    assert committed == []
+
+    _write(sink, "p2", on_commit=lambda: committed.append("p2"))
+    _write(sink, "p3", on_commit=lambda: committed.append("p3"))
+    assert committed == ["p1", "p2"]
+
+    sink.close()
+    assert committed == ["p1", "p2", "p3"]
+
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [row["run_id"] for row in rows] == ["p1", "p2", "p3"]
+    assert rows[0]["response_tokens"] == 2
+    assert rows[0]["eval_duration_ns"] == 1_500_000
+    assert "response" not in json.loads(rows[0]["stats_json"])
+
+
+def test_parquet_sink(tmp_path: Path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    sink = make_sink("parquet", tmp_path, flush_every=1)
+    _write(sink, "p1")
+    _write(sink, "p2")
+    sink.close()
+
+    # One complete part file per flush
+    parts = sorted((tmp_path / "ollama" / "llama3:8b").glob("results-*.parquet"))
+    assert [p.name.split(".")[-2] for p in parts] == ["part0000", "part0001"]
+    table = pq.read_table(tmp_path / "ollama" / "llama3:8b")
+    assert table.num_rows == 2
+    assert str(table.schema.field("prompt_tokens").type) == "int64"
+    assert table.column("wall_time_s").to_pylist() == [0.25, 0.25]
+
+
+def test_parquet_committed_rows_survive_a_kill(tmp_path: Path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    # The process dies without closing the sink
+    script = textwrap.dedent(
+        f"""
+        import os
+        from pathlib import Path
+        from llm_pipeline.output import make_sink
+
+        out = Path({str(tmp_path)!r})
+        sink = make_sink("parquet", out, flush_every=2)
+        for run_id in ("p1", "p2", "p3"):
+            sink.write(
+                backend="ollama",
+                model="llama3:8b",
+                prompt_id=run_id,
+                prompt="Say hello",
+                system=None,
+                result={{"text": "hi", "stats": {{}}, "wall_time_s": 0.25}},
+                on_commit=lambda run_id=run_id: print(run_id, flush=True),
+            )
+        os._exit(1)
+        """
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=Path(__file__).resolve().parents[1],
+        capture_output=True,
+        text=True,
+    )
+    assert proc.returncode == 1, proc.stderr
+
+    committed = proc.stdout.split()
+    assert committed == ["p1", "p2"]
+    table = pq.read_table(tmp_path / "ollama" / "llama3:8b")
+    assert table.column("run_id").to_pylist() == committed
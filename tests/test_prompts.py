@@ -1,10 +1,17 @@
+import json
+import os
 from pathlib import Path
+
 import pytest
 
-from ollama_runner.prompts import (
+from llm_pipeline import prompts as prompts_module
+from llm_pipeline.prompts import (
+    PROMPT_SEPARATOR,
+    iter_numbered_prompts,
+    iter_prompt_records,
+    load_prompt_records,
     load_prompts_from_file,
     resolve_prompt,
-    PROMPT_SEPARATOR,
 )
 
 
@@ -27,6 +34,126 @@ def test_load_multiple_prompts_with_separator(tmp_path: Path):
     assert prompts == ["One", "Two", "Three"]
 
 
+def test_load_line_per_prompt(tmp_path: Path):
+    p = tmp_path / "prompt.txt"
+    p.write_text("  One\n\nTwo  \nThree\n", encoding="utf-8")
+
+    assert load_prompts_from_file(p) == ["One", "Two", "Three"]
+
+
+def test_separator_blocks_keep_newlines(tmp_path: Path):
+    p = tmp_path / "prompt.txt"
+    p.write_text("line 1\nline 2\n---\n\nSecond\n---\n", encoding="utf-8")
+
+    assert load_prompts_from_file(p) == ["line 1\nline 2", "Second"]
+
+
+def test_whole_documents_keep_lines_together(tmp_path: Path):
+    p = tmp_path / "prompt.txt"
+    p.write_text("Para 1\n\nPara 2\n---\nDoc 2\n", encoding="utf-8")
+    single = tmp_path / "single.txt"
+    single.write_text("Para 1\nPara 2\n", encoding="utf-8")
+
+    assert [r["prompt"] for r in iter_prompt_records(p, whole_documents=True)] == [
+        "Para 1\n\nPara 2",
+        "Doc 2",
+    ]
+    assert list(iter_prompt_records(single, whole_documents=True)) == [
+        {"prompt": "Para 1\nPara 2"}
+    ]
+
+
+def test_iter_prompt_records_is_lazy(tmp_path: Path):
+    p = tmp_path / "prompt.txt"
+    p.write_text("One\nTwo\n", encoding="utf-8")
+
+    records = iter_prompt_records(p)
+    assert next(records) == {"prompt": "One"}
+
+
+def test_jsonl_records(tmp_path: Path):
+    p = tmp_path / "prompts.jsonl"
+    p.write_text(
+        '{"prompt": "One", "id": "a", "system": "Be brief"}\n'
+        "\n"
+        '{"prompt": "Two", "options": {"seed": 3}}\n',
+        encoding="utf-8",
+    )
+
+    records = list(iter_prompt_records(p))
+    assert records[0]["system"] == "Be brief"
+    assert records[1]["options"] == {"seed": 3}
+
+    run_ids = [run_id for run_id, _ in iter_numbered_prompts("p", records)]
+    assert run_ids == ["p-a", "p-2"]
+
+
+def test_jsonl_record_without_prompt(tmp_path: Path):
+    p = tmp_path / "prompts.jsonl"
+    p.write_text('{"text": "One"}\n', encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(iter_prompt_records(p))
+
+
+@pytest.mark.parametrize("record_id", ["../x", "a/b", "..", "", "a b", "é"])
+def test_jsonl_record_ids_are_safe_file_names(tmp_path: Path, record_id: str):
+    p = tmp_path / "prompts.jsonl"
+    p.write_text(
+        json.dumps({"prompt": "One", "id": 7}) + "\n"
+        + json.dumps({"prompt": "Two", "id": record_id}) + "\n",
+        encoding="utf-8",
+    )
+
+    with pytest.raises(ValueError, match=":2: invalid id"):
+        list(iter_prompt_records(p))
+
+
+def test_numbering_single_and_multiple():
+    single = list(iter_numbered_prompts("p", [{"prompt": "x"}]))
+    assert [run_id for run_id, _ in single] == ["p"]
+
+    many = list(iter_numbered_prompts("p", iter([{"prompt": "x"}, {"prompt": "y"}])))
+    assert [run_id for run_id, _ in many] == ["p-1", "p-2"]
+
+
+def test_prompt_files_memoized_by_mtime(tmp_path: Path, monkeypatch):
+    p = tmp_path / "prompts.txt"
+    p.write_text("One\nTwo\n", encoding="utf-8")
+
+    first = load_prompt_records(p)
+    assert load_prompt_records(p) is first
+    # Read as one document, the same file is a different entry
+    assert [r["prompt"] for r in load_prompt_records(p, whole_documents=True)] == [
+        "One\nTwo"
+    ]
+
+    p.write_text("Three\n", encoding="utf-8")
+    os.utime(p, ns=(0, p.stat().st_mtime_ns + 1))
+    assert [r["prompt"] for r in load_prompt_records(p)] == ["Three"]
+
+    monkeypatch.setattr(prompts_module, "MEMO_MAX_BYTES", 1)
+    streamed = load_prompt_records(tmp_path / "prompts.txt", whole_documents=True)
+    assert not isinstance(streamed, tuple)
+
+
+def test_prompt_memo_budgets_parsed_records(tmp_path: Path, monkeypatch):
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    a.write_text("x\n" * 100, encoding="utf-8")
+    b.write_text("y\n" * 100, encoding="utf-8")
+    records = load_prompt_records(a)
+    # Parsed records take far more memory than the file
+    assert prompts_module._records_size(records) > 10 * a.stat().st_size
+
+    monkeypatch.setattr(
+        prompts_module, "MEMO_TOTAL_BYTES", prompts_module._records_size(records)
+    )
+    assert load_prompt_records(a) is load_prompt_records(a)
+    load_prompt_records(b)
+    # Only one of the two fits, so the older one was dropped
+    assert load_prompt_records(a) is not records
+
+
 def test_resolve_prompt_success():
     registry = {"p1": {"prompt": "Hi"}}
     assert resolve_prompt("p1", registry)["prompt"] == "Hi"
@@ -0,0 +1,63 @@
+import threading
+
+from llm_pipeline.backends.residency import ModelResidency
+
+SIZES = {"a": 40, "b": 40, "c": 40}
+
+
+def _residency(budget: int, loads: list):
+    def loader(name):
+        loads.append(name)
+        return {"name": name}
+
+    return ModelResidency(
+        loader=loader,
+        footprint=lambda obj: SIZES[obj["name"]],
+        estimate=lambda name: SIZES[name],
+        budget_bytes=budget,
+    )
+
+
+def test_get_loads_once_and_evicts_lru():
+    loads = []
+    residency = _residency(100, loads)
+
+    residency.get("a")
+    residency.get("b")
+    residency.get("a")  # "b" is now least recently used
+    residency.get("c")
+
+    assert loads == ["a", "b", "c"]
+    assert list(residency._resident) == ["a", "c"]
+    assert residency.resident_bytes == 80
+
+
+def test_prefetch_only_when_it_fits():
+    loads = []
+    residency = _residency(100, loads)
+
+    residency.get("a")
+    assert residency.prefetch("b")
+    assert residency.get("b") == {"name": "b"}
+    assert not residency.prefetch("c")
+    assert loads == ["a", "b"]
+
+
+def test_concurrent_get_loads_once():
+    gate = threading.Event()
+    loads = []
+
+    def loader(name):
+        loads.append(name)
+        gate.wait(1)
+        return name
+
+    residency = ModelResidency(loader=loader, footprint=lambda obj: 1)
+    threads = [threading.Thread(target=residency.get, args=("a",)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert loads == ["a"]
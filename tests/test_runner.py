@@ -0,0 +1,499 @@
+import asyncio
+import logging
+import threading
+from pathlib import Path
+
+from llm_pipeline.cache import ResponseCache
+from llm_pipeline.manifest import RunManifest
+from llm_pipeline.metrics import RunMetrics
+from llm_pipeline.runner import arun_model_prompts, run_model_prompts
+
+logger = logging.getLogger(__name__)
+
+
+class DummyBackend:
+    def __init__(self, fail_on: str | None = None):
+        self.fail_on = fail_on
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def ensure_model(self, model: str) -> None:
+        pass
+
+    def run_prompt(self, *, model, prompt, system, temperature, options, stream):
+        with self.lock:
+            self.calls.append(prompt)
+        if prompt == self.fail_on:
+            raise RuntimeError("boom")
+        return {"text": prompt.upper(), "stats": {}, "wall_time_s": 0.0}
+
+
+def _write_prompts(tmp_path: Path, prompts: list[str]) -> Path:
+    p = tmp_path / "prompts.txt"
+    p.write_text("\n".join(prompts), encoding="utf-8")
+    return p
+
+
+def test_run_model_prompts_concurrent(tmp_path: Path):
+    prompts = [f"prompt {i}" for i in range(20)]
+    prompt_file = _write_prompts(tmp_path, prompts)
+    backend = DummyBackend(fail_on="prompt 3")
+    metrics = RunMetrics()
+
+    run_model_prompts(
+        backend=backend,
+        model_cfg={"name": "dummy", "prompts": ["p"]},
+        prompt_registry={"p": {"prompt_file": str(prompt_file)}},
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="ollama",
+        concurrency=4,
+        metrics=metrics,
+        logger=logger,
+    )
+
+    assert sorted(backend.calls) == sorted(prompts)
+
+    (entry,) = metrics.summary()["models"]
+    assert (entry["completed"], entry["failed"]) == (19, 1)
+    assert entry["queue_wait_s"]["count"] == 19
+    assert entry["bytes_written"] > 0
+
+    written = sorted(p.name for p in (tmp_path / "out" / "ollama" / "dummy").iterdir())
+    expected = sorted(f"p-{i}.txt" for i in range(1, 21) if i != 4)
+    assert written == expected
+    assert "PROMPT 9" in (tmp_path / "out" / "ollama" / "dummy" / "p-10.txt").read_text()
+
+
+class AsyncDummyBackend(DummyBackend):
+    async def aclose(self) -> None:
+        pass
+
+    async def arun_prompt(self, **kwargs):
+        await asyncio.sleep(0)
+        return self.run_prompt(**kwargs)
+
+
+def test_arun_model_prompts(tmp_path: Path):
+    prompts = [f"prompt {i}" for i in range(10)]
+    prompt_file = _write_prompts(tmp_path, prompts)
+    backend = AsyncDummyBackend(fail_on="prompt 0")
+
+    asyncio.run(
+        arun_model_prompts(
+            backend=backend,
+            model_cfg={"name": "dummy", "prompts": ["p"]},
+            prompt_registry={"p": {"prompt_file": str(prompt_file)}},
+            stream=False,
+            output_dir=tmp_path / "out",
+            backend_name="ollama",
+            concurrency=3,
+            logger=logger,
+        )
+    )
+
+    assert sorted(backend.calls) == sorted(prompts)
+    written = list((tmp_path / "out" / "ollama" / "dummy").iterdir())
+    assert len(written) == 9
+
+
+class BatchDummyBackend(DummyBackend):
+    supports_batching = True
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def run_prompts_batch(self, *, model, prompts, system, temperature, options, stream):
+        self.batches.append(list(prompts))
+        return [{"text": p.upper(), "stats": {}, "wall_time_s": 0.0} for p in prompts]
+
+
+def test_run_model_prompts_batched(tmp_path: Path):
+    prompt_file = _write_prompts(tmp_path, ["a", "b", "c"])
+    backend = BatchDummyBackend()
+
+    run_model_prompts(
+        backend=backend,
+        model_cfg={"name": "dummy", "prompts": ["p", "q"]},
+        prompt_registry={
+            "p": {"prompt_file": str(prompt_file)},
+            "q": {"prompt": "d", "temperature": 0.5},
+        },
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="huggingface",
+        logger=logger,
+    )
+
+    assert backend.batches == [["a", "b", "c"], ["d"]]
+    model_dir = tmp_path / "out" / "huggingface" / "dummy"
+    assert "Response:\nB\n" in (model_dir / "p-2.txt").read_text()
+    assert "Response:\nD\n" in (model_dir / "q.txt").read_text()
+
+
+class StreamingBatchBackend(BatchDummyBackend):
+    def __init__(self):
+        super().__init__()
+        self.streamed = []
+
+    def stream_prompt(self, *, model, prompt, system, temperature, options):
+        self.streamed.append(prompt)
+        yield {"response": prompt.upper(), "done": False}
+        yield {
+            "response": "",
+            "done": True,
+            "time_to_first_token_s": 0.01,
+            "inter_token_latency_s": 0.001,
+        }
+
+    def run_prompt(self, *, model, prompt, system, temperature, options, stream):
+        if not stream:
+            return super().run_prompt(
+                model=model,
+                prompt=prompt,
+                system=system,
+                temperature=temperature,
+                options=options,
+                stream=stream,
+            )
+        chunks = list(
+            self.stream_prompt(
+                model=model,
+                prompt=prompt,
+                system=system,
+                temperature=temperature,
+                options=options,
+            )
+        )
+        text = "".join(c["response"] for c in chunks)
+        return {"text": text, "stats": chunks[-1], "wall_time_s": 0.0}
+
+
+def test_streaming_bypasses_batching(tmp_path: Path):
+    prompt_file = _write_prompts(tmp_path, ["a", "b"])
+    backend = StreamingBatchBackend()
+    metrics = RunMetrics()
+
+    run_model_prompts(
+        backend=backend,
+        model_cfg={"name": "dummy", "prompts": ["p"]},
+        prompt_registry={"p": {"prompt_file": str(prompt_file)}},
+        stream=True,
+        output_dir=tmp_path / "out",
+        backend_name="huggingface",
+        metrics=metrics,
+        logger=logger,
+    )
+
+    assert backend.batches == []
+    assert backend.streamed == ["a", "b"]
+    (entry,) = metrics.summary()["models"]
+    assert entry["ttft_s"]["count"] == 2
+    text = (tmp_path / "out" / "huggingface" / "dummy" / "p-1.txt").read_text()
+    assert "Time to first token" in text
+
+
+def test_duplicate_prompts_generated_once(tmp_path: Path):
+    prompt_file = _write_prompts(tmp_path, ["a", "b", "a"])
+    kwargs = dict(
+        model_cfg={"name": "dummy", "prompts": ["p", "q", "r"]},
+        prompt_registry={
+            "p": {"prompt_file": str(prompt_file)},
+            "q": {"prompt_file": str(prompt_file)},
+            "r": {"prompt_file": str(prompt_file), "system": "Be brief."},
+        },
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="ollama",
+        logger=logger,
+    )
+    metrics = RunMetrics()
+    manifest = RunManifest(tmp_path / "manifest.jsonl")
+
+    backend = DummyBackend()
+    run_model_prompts(
+        backend=backend, concurrency=3, manifest=manifest, metrics=metrics, **kwargs
+    )
+    manifest.close()
+
+    # One generation per prompt text and system prompt
+    assert sorted(backend.calls) == ["a", "a", "b", "b"]
+    model_dir = tmp_path / "out" / "ollama" / "dummy"
+    written = sorted(p.name for p in model_dir.iterdir())
+    assert written == sorted(f"{x}-{i}.txt" for x in "pqr" for i in (1, 2, 3))
+    assert "Response:\nA\n" in (model_dir / "q-3.txt").read_text()
+
+    (entry,) = metrics.summary()["models"]
+    assert (entry["completed"], entry["cached"]) == (9, 5)
+
+    # Every run_id was recorded, so a resumed run has nothing left to do
+    manifest = RunManifest(tmp_path / "manifest.jsonl", resume=True)
+    backend = DummyBackend()
+    run_model_prompts(backend=backend, manifest=manifest, **kwargs)
+    manifest.close()
+    assert backend.calls == []
+
+
+def test_duplicate_prompts_async_and_batched(tmp_path: Path):
+    prompt_file = _write_prompts(tmp_path, ["a", "a", "b"])
+    kwargs = dict(
+        model_cfg={"name": "dummy", "prompts": ["p", "q"]},
+        prompt_registry={
+            "p": {"prompt_file": str(prompt_file)},
+            "q": {"prompt_file": str(prompt_file)},
+        },
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="ollama",
+        logger=logger,
+    )
+
+    backend = AsyncDummyBackend(fail_on="b")
+    metrics = RunMetrics()
+    asyncio.run(
+        arun_model_prompts(backend=backend, concurrency=2, metrics=metrics, **kwargs)
+    )
+    assert sorted(backend.calls) == ["a", "b"]
+    (entry,) = metrics.summary()["models"]
+    # The failure counts once for each run_id that wanted it
+    assert (entry["completed"], entry["failed"]) == (4, 2)
+
+    backend = BatchDummyBackend()
+    run_model_prompts(backend=backend, **kwargs)
+    assert backend.batches == [["a", "b"]]
+    written = list((tmp_path / "out" / "ollama" / "dummy").iterdir())
+    assert len(written) == 6
+
+
+def test_duplicates_found_while_streaming(tmp_path: Path, monkeypatch):
+    import llm_pipeline.prompts
+    import llm_pipeline.runner
+
+    # Too large to memoize: the file is streamed
+    monkeypatch.setattr(llm_pipeline.prompts, "MEMO_MAX_BYTES", 0)
+    read = []
+
+    def load_prompt_records(path, whole_documents=False):
+        for record in llm_pipeline.prompts.load_prompt_records(path, whole_documents):
+            read.append(record["prompt"])
+            yield record
+
+    monkeypatch.setattr(llm_pipeline.runner, "load_prompt_records", load_prompt_records)
+
+    prompts = ["a", "b", "a", "c", "b", "d"]
+    prompt_file = _write_prompts(tmp_path, prompts)
+    backend = DummyBackend()
+    first_dispatch = []
+    run_prompt = backend.run_prompt
+
+    def recording_run_prompt(**kwargs):
+        if not first_dispatch:
+            first_dispatch.append(len(read))
+        return run_prompt(**kwargs)
+
+    backend.run_prompt = recording_run_prompt
+    metrics = RunMetrics()
+
+    run_model_prompts(
+        backend=backend,
+        model_cfg={"name": "dummy", "prompts": ["p"]},
+        prompt_registry={"p": {"prompt_file": str(prompt_file)}},
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="ollama",
+        metrics=metrics,
+        logger=logger,
+    )
+
+    assert first_dispatch[0] < len(prompts)
+    assert backend.calls == ["a", "b", "c", "d"]
+    model_dir = tmp_path / "out" / "ollama" / "dummy"
+    assert "Response:\nB\n" in (model_dir / "p-5.txt").read_text()
+    (entry,) = metrics.summary()["models"]
+    assert (entry["completed"], entry["cached"]) == (6, 2)
+
+
+class RecordingBackend(DummyBackend):
+    def run_prompt(self, *, model, prompt, system, temperature, options, stream):
+        seed = options.get("seed")
+        with self.lock:
+            self.calls.append((prompt, temperature, seed))
+        text = f"{prompt} t={temperature} s={seed}"
+        return {"text": text, "stats": {}, "wall_time_s": 0.0}
+
+
+def _sweep_kwargs(tmp_path: Path):
+    prompt_file = _write_prompts(tmp_path, ["a", "b"])
+    return dict(
+        model_cfg={"name": "dummy", "prompts": ["p"], "options": {"top_k": 5}},
+        prompt_registry={
+            "p": {
+                "prompt_file": str(prompt_file),
+                "temperature": 1.0,
+                "sweep": {"temperature": [0.2, 0.7], "seed": [1, 2, 3]},
+            }
+        },
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="ollama",
+        logger=logger,
+    )
+
+
+def test_sweep_runs_every_point(tmp_path: Path):
+    backend = RecordingBackend()
+    run_model_prompts(backend=backend, concurrency=4, **_sweep_kwargs(tmp_path))
+
+    assert sorted(backend.calls) == sorted(
+        (p, t, s) for p in "ab" for t in (0.2, 0.7) for s in (1, 2, 3)
+    )
+    model_dir = tmp_path / "out" / "ollama" / "dummy"
+    written = sorted(p.name for p in model_dir.iterdir())
+    assert len(written) == 12
+    assert "p-2@temperature=0.7,seed=3.txt" in written
+    result = (model_dir / "p-2@temperature=0.7,seed=3.txt").read_text()
+    assert "b t=0.7 s=3" in result
+
+
+class SamplingBackend(BatchDummyBackend):
+    supports_samples = True
+
+    def run_prompts_batch(
+        self, *, model, prompts, system, temperature, options, stream, seeds=None
+    ):
+        seeds = seeds or [options.get("seed")]
+        self.batches.append((list(prompts), temperature, seeds))
+        return [
+            {"text": f"{p} t={temperature} seed {s}", "stats": {}, "wall_time_s": 0.0}
+            for p in prompts
+            for s in seeds
+        ]
+
+
+def test_sweep_seeds_generated_as_samples(tmp_path: Path):
+    backend = SamplingBackend()
+    run_model_prompts(backend=backend, **_sweep_kwargs(tmp_path))
+
+    # One call per temperature: both prompts, three samples each
+    assert backend.batches == [
+        (["a", "b"], 0.2, [1, 2, 3]),
+        (["a", "b"], 0.7, [1, 2, 3]),
+    ]
+    model_dir = tmp_path / "out" / "ollama" / "dummy"
+    result = (model_dir / "p-2@temperature=0.2,seed=2.txt").read_text()
+    assert "b t=0.2 seed 2" in result
+
+
+def test_run_model_prompts_uses_cache(tmp_path: Path):
+    prompt_file = _write_prompts(tmp_path, ["a", "b"])
+    cache = ResponseCache(tmp_path / "cache")
+    kwargs = dict(
+        model_cfg={"name": "dummy", "prompts": ["p"]},
+        prompt_registry={"p": {"prompt_file": str(prompt_file)}},
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="ollama",
+        cache=cache,
+        logger=logger,
+    )
+
+    first = DummyBackend()
+    run_model_prompts(backend=first, **kwargs)
+    second = DummyBackend()
+    run_model_prompts(backend=second, **kwargs)
+
+    assert sorted(first.calls) == ["a", "b"]
+    assert second.calls == []
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_run_model_prompts_resume(tmp_path: Path):
+    prompt_file = _write_prompts(tmp_path, ["a", "b", "c"])
+    kwargs = dict(
+        model_cfg={"name": "dummy", "prompts": ["p"]},
+        prompt_registry={"p": {"prompt_file": str(prompt_file)}},
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="ollama",
+        logger=logger,
+    )
+
+    manifest = RunManifest(tmp_path / "manifest.jsonl")
+    run_model_prompts(backend=DummyBackend(fail_on="b"), manifest=manifest, **kwargs)
+    manifest.close()
+
+    prompt_file.write_text("a\nb\nC", encoding="utf-8")
+
+    manifest = RunManifest(tmp_path / "manifest.jsonl", resume=True)
+    backend = DummyBackend()
+    run_model_prompts(backend=backend, manifest=manifest, **kwargs)
+    manifest.close()
+
+    assert sorted(backend.calls) == ["C", "b"]
+
+
+def _long_document_kwargs(tmp_path: Path):
+    # One line, as extracted MD&A is: chunks must split on sentences
+    document = " ".join(f"Sentence {i} about revenue." for i in range(100))
+    path = tmp_path / "mda.txt"
+    path.write_text(document, encoding="utf-8")
+
+    return dict(
+        model_cfg={"name": "dummy", "prompts": ["mda"]},
+        prompt_registry={
+            "mda": {
+                "prompt_file": str(path),
+                "long_document": {
+                    "max_tokens": 200,
+                    "map_prompt": "Part {part}/{parts}: {text}",
+                    "reduce_prompt": "Combine {parts}: {text}",
+                },
+            }
+        },
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="ollama",
+        logger=logger,
+    )
+
+
+def _check_long_document(tmp_path: Path, calls: list[str]):
+    maps = [c for c in calls if c.startswith("Part ")]
+    reduces = [c for c in calls if c.startswith("Combine ")]
+
+    assert len(maps) == 4
+    assert all(len(c) <= 200 * 4 + 20 for c in maps)
+    assert len(reduces) == 1 and reduces[0].startswith("Combine 4: Part 1 of 4:")
+
+    model_dir = tmp_path / "out" / "ollama" / "dummy"
+    written = sorted(p.name for p in model_dir.iterdir())
+    assert written == [f"mda-part{k:03d}.txt" for k in range(1, 5)] + ["mda.txt"]
+    assert "Response:\nCOMBINE 4" in (model_dir / "mda.txt").read_text()
+
+
+def test_long_document_map_reduce(tmp_path: Path):
+    backend = DummyBackend()
+    run_model_prompts(
+        backend=backend, concurrency=4, **_long_document_kwargs(tmp_path)
+    )
+    _check_long_document(tmp_path, backend.calls)
+
+
+def test_long_document_map_reduce_async(tmp_path: Path):
+    backend = AsyncDummyBackend()
+    asyncio.run(
+        arun_model_prompts(
+            backend=backend, concurrency=4, **_long_document_kwargs(tmp_path)
+        )
+    )
+    _check_long_document(tmp_path, backend.calls)
+
+
+def test_long_document_map_reduce_batched(tmp_path: Path):
+    backend = BatchDummyBackend()
+    run_model_prompts(backend=backend, **_long_document_kwargs(tmp_path))
+
+    batched = [p for batch in backend.batches for p in batch]
+    _check_long_document(tmp_path, batched + backend.calls)
+    assert len(backend.batches[0]) == 4
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+
+from llm_pipeline.backends.base import LLMBackend
+from llm_pipeline.metrics import RunMetrics
+from llm_pipeline.scheduler import ModelScheduler, group_by_model
+
+logger = logging.getLogger(__name__)
+
+
+class WarmingBackend(LLMBackend):
+    def __init__(self, prefetch_ahead: bool = False):
+        self.prefetch_ahead = prefetch_ahead
+        self.events = []
+        self.ensured = Counter()
+        self.prefetch_threads = set()
+        self.lock = threading.Lock()
+
+    def _log(self, *event):
+        with self.lock:
+            self.events.append(event)
+
+    def ensure_model(self, model: str) -> None:
+        with self.lock:
+            self.ensured[model] += 1
+
+    def prefetch_model(self, model: str) -> None:
+        self.prefetch_threads.add(threading.current_thread())
+        self._log("prefetch", model)
+
+    def warm_model(self, model: str) -> dict:
+        self._log("warm", model)
+        return {"load_s": 1.0, "warm_s": 1.5}
+
+    def run_prompt(self, *, model, prompt, system, temperature, options, stream):
+        self._log("run", model)
+        return {"text": prompt, "stats": {}, "wall_time_s": 0.0}
+
+
+def _run_kwargs(tmp_path: Path, backend, metrics) -> dict:
+    prompt_file = tmp_path / "prompts.txt"
+    prompt_file.write_text("one\ntwo", encoding="utf-8")
+    return dict(
+        backend=backend,
+        prompt_registry={"p": {"prompt_file": str(prompt_file)}},
+        stream=False,
+        output_dir=tmp_path / "out",
+        backend_name="ollama",
+        metrics=metrics,
+        logger=logger,
+    )
+
+
+def _models(*names):
+    return [{"name": name, "prompts": ["p"]} for name in names]
+
+
+def test_group_by_model_keeps_first_appearance_order():
+    groups = group_by_model(_models("a", "b", "a", "c", "b"))
+    assert [[m["name"] for m in g] for g in groups] == [
+        ["a", "a"],
+        ["b", "b"],
+        ["c"],
+    ]
+
+
+def test_models_warmed_once_and_next_prefetched_after_dispatch(tmp_path: Path):
+    backend = WarmingBackend()
+    metrics = RunMetrics()
+
+    ModelScheduler(
+        _models("a", "b", "a"),
+        backend=backend,
+        backend_name="ollama",
+        metrics=metrics,
+        logger=logger,
+    ).run(_run_kwargs(tmp_path, backend, metrics))
+
+    # "a" runs both its entries before "b" is loaded, and "b" is prefetched
+    # only once the last prompt of "a" has been dispatched
+    events = backend.events
+    assert events[0] == ("warm", "a")
+    assert [e for e in events if e[0] == "run"] == [("run", "a")] * 4 + [
+        ("run", "b")
+    ] * 2
+    prefetch = events.index(("prefetch", "b"))
+    assert events.index(("warm", "b")) == prefetch + 1
+    assert events[:prefetch].count(("run", "a")) >= 3
+
+    phases = {e["model"]: e["phases_s"] for e in metrics.summary()["models"]}
+    assert phases["a"]["load_s"] == 1.0
+    assert phases["a"]["warm_s"] == 1.5
+    assert {"warm_wait_s", "run_s"} <= set(phases["b"])
+    # Warming ensures each model once, for all its entries
+    assert backend.ensured == {"a": 1, "b": 1}
+
+
+def test_prefetch_ahead_and_prewarm_off(tmp_path: Path):
+    backend = WarmingBackend(prefetch_ahead=True)
+    ModelScheduler(
+        _models("a", "b"), backend=backend, backend_name="hf", logger=logger
+    ).run(_run_kwargs(tmp_path, backend, None))
+    assert backend.events[:2] == [("warm", "a"), ("prefetch", "b")]
+
+    backend = WarmingBackend()
+    ModelScheduler(
+        _models("a", "b"),
+        backend=backend,
+        backend_name="ollama",
+        prewarm=False,
+        logger=logger,
+    ).run(_run_kwargs(tmp_path, backend, None))
+    assert {event[0] for event in backend.events} == {"run"}
+    assert backend.ensured == {"a": 1, "b": 1}
+
+
+def test_parallel_models(tmp_path: Path):
+    backend = WarmingBackend()
+    scheduler = ModelScheduler(
+        _models("a", "b", "c"),
+        backend=backend,
+        backend_name="ollama",
+        parallel_models=2,
+        logger=logger,
+    )
+    scheduler.run(_run_kwargs(tmp_path, backend, None))
+
+    runs = [model for kind, model in backend.events if kind == "run"]
+    assert sorted(runs) == ["a", "a", "b", "b", "c", "c"]
+    assert sorted(m for kind, m in backend.events if kind == "warm") == [
+        "a",
+        "b",
+        "c",
+    ]
+
+
+def test_arun(tmp_path: Path):
+    backend = WarmingBackend()
+    metrics = RunMetrics()
+    asyncio.run(
+        ModelScheduler(
+            _models("a", "b"),
+            backend=backend,
+            backend_name="ollama",
+            metrics=metrics,
+            logger=logger,
+        ).arun(_run_kwargs(tmp_path, backend, metrics))
+    )
+
+    assert [e for e in backend.events if e[0] == "warm"] == [
+        ("warm", "a"),
+        ("warm", "b"),
+    ]
+    assert ("prefetch", "b") in backend.events
+    assert threading.main_thread() not in backend.prefetch_threads
+    assert backend.ensured == {"a": 1, "b": 1}
+    assert sum(e["completed"] for e in metrics.summary()["models"]) == 4
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+HEAVY_MODULES = ["torch", "transformers", "ollama"]
+
+
+def _loaded_after(code: str) -> list[str]:
+    script = (
+        "import sys\n"
+        f"{code}\n"
+        f"print('\\n' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    loaded = out.stdout.splitlines()[-1]
+    return [m for m in loaded.split(",") if m]
+
+
+def test_import_cli_does_not_load_backends():
+    assert _loaded_after("import llm_pipeline.cli") == []
+
+
+def test_help_does_not_load_backends():
+    code = (
+        "sys.argv = ['llm-pipeline', '--help']\n"
+        "from llm_pipeline.cli import main\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass"
+    )
+    assert _loaded_after(code) == []